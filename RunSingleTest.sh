@@ -12,8 +12,8 @@ case=$2
 #...Current home location
 TESTHOME=$(pwd)
 
-#...Run the test using python
-python3 $TESTHOME/test_runner/test_runner.py \
+#...Run the test using python (through the harness daemon when one is running)
+python3 $TESTHOME/test_runner/harness_client.py \
     --bin $adcirc_path \
     --tolerance $err \
     --test-root $TESTHOME \
@@ -0,0 +1,196 @@
+from typing import Tuple
+
+import numpy as np
+
+# Named mesh sizes accepted by the benchmark runner
+MESH_SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "5m": 5_000_000}
+
+
+def grid_mesh(node_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a rectangular mesh of triangles with about the requested number of nodes
+
+    Args:
+        node_count: Approximate number of nodes
+
+    Returns:
+        Tuple of (nodes with columns x, y, depth, elements with one based node numbers)
+    """
+    nx = max(2, int(np.ceil(np.sqrt(node_count))))
+    ny = max(2, int(np.ceil(node_count / nx)))
+
+    x, y = np.meshgrid(np.linspace(-80.0, -70.0, nx), np.linspace(25.0, 35.0, ny))
+    depth = 10.0 + 5.0 * np.sin(x / 2.0) * np.cos(y / 3.0)
+    nodes = np.column_stack([x.ravel(), y.ravel(), depth.ravel()])
+
+    # Two triangles per grid cell
+    index = np.arange(nx * ny).reshape((ny, nx))
+    lower_left = index[:-1, :-1].ravel()
+    lower_right = index[:-1, 1:].ravel()
+    upper_left = index[1:, :-1].ravel()
+    upper_right = index[1:, 1:].ravel()
+    elements = np.concatenate(
+        [
+            np.column_stack([lower_left, lower_right, upper_right]),
+            np.column_stack([lower_left, upper_right, upper_left]),
+        ]
+    )
+    return nodes, elements + 1
+
+
+def write_mesh(filename: str, nodes: np.ndarray, elements: np.ndarray) -> None:
+    """
+    Write a mesh in fort.14 format, without boundaries
+
+    Args:
+        filename: Name of the mesh file
+        nodes: Nodes with columns x, y, depth
+        elements: Elements with one based node numbers
+    """
+    node_ids = np.arange(1, len(nodes) + 1)
+    element_ids = np.arange(1, len(elements) + 1)
+    with open(filename, "w") as f:
+        f.write("synthetic benchmark mesh\n")
+        f.write(f"{len(elements)} {len(nodes)}\n")
+        np.savetxt(f, np.column_stack([node_ids, nodes]), fmt="%d %.8f %.8f %.4f")
+        np.savetxt(
+            f,
+            np.column_stack([element_ids, np.full(len(elements), 3), elements]),
+            fmt="%d",
+        )
+        f.write("0\n0\n0\n0\n")
+
+
+def write_full_output(
+    filename: str, values: np.ndarray, time_interval: float = 3600.0
+) -> None:
+    """
+    Write an ascii output file with full data
+
+    Args:
+        filename: Name of the output file
+        values: Array of values with shape (snap_count, node_count, n_values)
+        time_interval: Seconds between snaps
+    """
+    snap_count, node_count, n_values = values.shape
+    node_ids = np.arange(1, node_count + 1)
+    fmt = "%8d" + " %20.10E" * n_values
+    with open(filename, "w") as f:
+        f.write("synthetic benchmark output\n")
+        f.write(
+            f"{snap_count:6d}{node_count:11d} {time_interval:16.9E}{100:9d}{n_values:6d}"
+            " FileFmtVersion:    1050624\n"
+        )
+        for snap in range(snap_count):
+            f.write(f" {time_interval * (snap + 1):20.10E}{100 * (snap + 1):12d}\n")
+            np.savetxt(f, np.column_stack([node_ids, values[snap]]), fmt=fmt)
+
+
+def write_sparse_output(
+    filename: str,
+    values: np.ndarray,
+    fill_value: float = -99999.0,
+    time_interval: float = 3600.0,
+) -> None:
+    """
+    Write an ascii output file with sparse data. Nodes holding the fill value
+    in every column are left out of each snap.
+
+    Args:
+        filename: Name of the output file
+        values: Array of values with shape (snap_count, node_count, n_values)
+        fill_value: Value of the nodes that are not written
+        time_interval: Seconds between snaps
+    """
+    snap_count, node_count, n_values = values.shape
+    fmt = "%8d" + " %20.10E" * n_values
+    with open(filename, "w") as f:
+        f.write("synthetic benchmark output\n")
+        f.write(
+            f"{snap_count:6d}{node_count:11d} {time_interval:16.9E}{100:9d}{n_values:6d}"
+            " FileFmtVersion:    1050624\n"
+        )
+        for snap in range(snap_count):
+            written = np.flatnonzero(np.any(values[snap] != fill_value, axis=1))
+            f.write(
+                f" {time_interval * (snap + 1):20.10E}{100 * (snap + 1):12d}"
+                f"{len(written):8d} {fill_value}\n"
+            )
+            np.savetxt(f, np.column_stack([written + 1, values[snap][written]]), fmt=fmt)
+
+
+def write_netcdf_output(
+    filename: str,
+    nodes: np.ndarray,
+    elements: np.ndarray,
+    values: np.ndarray,
+    time_interval: float = 3600.0,
+) -> None:
+    """
+    Write a netcdf water level output file (fort.63.nc layout)
+
+    Args:
+        filename: Name of the output file
+        nodes: Nodes with columns x, y, depth
+        elements: Elements with one based node numbers
+        values: Array of water levels with shape (snap_count, node_count)
+        time_interval: Seconds between snaps
+    """
+    import xarray as xr
+
+    times = np.arange(1, values.shape[0] + 1) * time_interval
+    dataset = xr.Dataset(
+        {
+            "x": ("node", nodes[:, 0]),
+            "y": ("node", nodes[:, 1]),
+            "depth": ("node", nodes[:, 2]),
+            "element": (("nele", "nvertex"), elements),
+            "zeta": (("time", "node"), values),
+        },
+        coords={"time": times},
+    )
+    dataset.to_netcdf(filename)
+
+
+def water_levels(
+    node_count: int, snap_count: int, seed: int = 0, dry_fraction: float = 0.0
+) -> np.ndarray:
+    """
+    Generate smooth water levels with random noise
+
+    Args:
+        node_count: Number of nodes
+        snap_count: Number of snaps
+        seed: Seed of the random generator
+        dry_fraction: Fraction of the nodes set to the -99999 fill value
+
+    Returns:
+        Array with shape (snap_count, node_count)
+    """
+    rng = np.random.default_rng(seed)
+    phase = np.linspace(0.0, 8.0 * np.pi, node_count)
+    values = np.stack(
+        [np.sin(phase + snap) for snap in range(snap_count)]
+    ) + 0.01 * rng.standard_normal((snap_count, node_count))
+    if dry_fraction > 0.0:
+        dry = rng.random(node_count) < dry_fraction
+        values[:, dry] = -99999.0
+    return values
+
+
+def perturb(values: np.ndarray, magnitude: float, seed: int = 1) -> np.ndarray:
+    """
+    Add uniform noise to a copy of an array, leaving fill values unchanged
+
+    Args:
+        values: Array of values
+        magnitude: Largest absolute change
+        seed: Seed of the random generator
+
+    Returns:
+        Perturbed copy of the array
+    """
+    rng = np.random.default_rng(seed)
+    perturbed = values + rng.uniform(-magnitude, magnitude, values.shape)
+    perturbed[values == -99999.0] = -99999.0
+    return perturbed
@@ -0,0 +1,275 @@
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Number of snaps in the synthetic time series output files
+SNAP_COUNT = 3
+
+# Tolerance of the comparisons, the test data differs from the control by less
+TOLERANCE = 1e-5
+
+# Benchmarks keyed by name, holding the setup function and the largest mesh size
+# (in nodes) the benchmark is run for
+BENCHMARKS: Dict[str, Tuple[Callable, Optional[int]]] = {}
+
+
+def benchmark(name: str, max_nodes: Optional[int] = None):
+    """
+    Register a benchmark. The decorated function receives the BenchmarkData of
+    a mesh size, does any untimed setup and returns the function that is timed.
+
+    Args:
+        name: Name of the benchmark
+        max_nodes: Largest mesh size the benchmark is run for (optional)
+    """
+
+    def register(setup: Callable) -> Callable:
+        BENCHMARKS[name] = (setup, max_nodes)
+        return setup
+
+    return register
+
+
+class BenchmarkData:
+    """
+    Synthetic files of one mesh size, generated on first use and kept in a
+    directory so that later runs reuse them
+    """
+
+    def __init__(self, directory: str, node_count: int):
+        """
+        Initialize the data
+
+        Args:
+            directory: Directory holding the files of this size
+            node_count: Approximate number of nodes of the mesh
+        """
+        import os
+
+        self.directory = directory
+        self.node_count = node_count
+        self.__mesh = None
+        os.makedirs(directory, exist_ok=True)
+
+    def mesh(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nodes and elements of the mesh
+
+        Returns:
+            Tuple of (nodes with columns x, y, depth, elements with one based node numbers)
+        """
+        from generators import grid_mesh
+
+        if self.__mesh is None:
+            self.__mesh = grid_mesh(self.node_count)
+        return self.__mesh
+
+    def file(self, name: str) -> str:
+        """
+        Get a synthetic file, generating it if it does not exist
+
+        Args:
+            name: Name of the file (fort.14, fort.63, fort.64, sparse.63,
+                control.63.nc, test.63.nc, control_maxele.63, test_maxele.63)
+
+        Returns:
+            Path of the file
+        """
+        import os
+
+        import generators
+
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            return path
+
+        logger.info(f"Generating {path}")
+        nodes, elements = self.mesh()
+        n = len(nodes)
+        temp_path = f"{path}.tmp"
+        if name == "fort.14":
+            generators.write_mesh(temp_path, nodes, elements)
+        elif name == "fort.63":
+            generators.write_full_output(
+                temp_path, generators.water_levels(n, SNAP_COUNT)[:, :, None]
+            )
+        elif name == "fort.64":
+            u = generators.water_levels(n, SNAP_COUNT, seed=2)
+            v = generators.water_levels(n, SNAP_COUNT, seed=3)
+            generators.write_full_output(temp_path, np.stack([u, v], axis=2))
+        elif name == "sparse.63":
+            values = generators.water_levels(n, SNAP_COUNT, dry_fraction=0.9)
+            generators.write_sparse_output(temp_path, values[:, :, None])
+        elif name in ("control.63.nc", "test.63.nc"):
+            values = generators.water_levels(n, SNAP_COUNT, dry_fraction=0.05)
+            if name == "test.63.nc":
+                values = generators.perturb(values, TOLERANCE / 2)
+            generators.write_netcdf_output(temp_path, nodes, elements, values)
+        elif name in ("control_maxele.63", "test_maxele.63"):
+            values = generators.water_levels(n, 1, dry_fraction=0.05)
+            if name == "test_maxele.63":
+                values = generators.perturb(values, TOLERANCE / 2)
+            generators.write_full_output(temp_path, values[:, :, None])
+        else:
+            msg = f"Unknown benchmark file: {name}"
+            raise ValueError(msg)
+        os.replace(temp_path, path)
+        return path
+
+
+def _read_snaps(filename: str) -> int:
+    """
+    Read every snap of an ascii output file with the snap reader of the harness
+
+    Args:
+        filename: Name of the output file
+
+    Returns:
+        Number of snaps read
+    """
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.compression import open_text
+
+    header = AdcircTest._AdcircTest__get_adcirc_header(filename)
+    count = 0
+    with open_text(filename) as f:
+        f.readline()
+        f.readline()
+        while AdcircTest._AdcircTest__read_adcirc_output_snap(f, header) is not None:
+            count += 1
+    return count
+
+
+@benchmark("get_adcirc_header")
+def bench_get_adcirc_header(data: BenchmarkData) -> Callable:
+    from adcirc_test.adcirctest import AdcircTest
+
+    filename = data.file("fort.63")
+    return lambda: AdcircTest._AdcircTest__get_adcirc_header(filename)
+
+
+@benchmark("read_full_snaps")
+def bench_read_full_snaps(data: BenchmarkData) -> Callable:
+    filename = data.file("fort.64")
+    return lambda: _read_snaps(filename)
+
+
+@benchmark("read_sparse_snaps")
+def bench_read_sparse_snaps(data: BenchmarkData) -> Callable:
+    filename = data.file("sparse.63")
+    return lambda: _read_snaps(filename)
+
+
+@benchmark("compare_datasets")
+def bench_compare_datasets(data: BenchmarkData) -> Callable:
+    import xarray as xr
+
+    from adcirc_test.adcirctest import AdcircTest
+    from generators import perturb, water_levels
+
+    values = water_levels(data.node_count, SNAP_COUNT, dry_fraction=0.05)
+    values[values == -99999.0] = np.nan
+    control = xr.Dataset({"zeta": (("time", "node"), values)})
+    test = xr.Dataset({"zeta": (("time", "node"), perturb(values, TOLERANCE / 2))})
+
+    def run():
+        if not AdcircTest._AdcircTest__compare_datasets(control, test, TOLERANCE):
+            msg = "The benchmark datasets differ by more than the tolerance"
+            raise RuntimeError(msg)
+
+    return run
+
+
+@benchmark("compare_files_netcdf")
+def bench_compare_files_netcdf(data: BenchmarkData) -> Callable:
+    from adcirc_test.adcirctest import AdcircTest
+
+    control_file = data.file("control.63.nc")
+    test_file = data.file("test.63.nc")
+
+    def run():
+        if not AdcircTest._AdcircTest__compare_files_netcdf(
+            control_file, test_file, TOLERANCE
+        ):
+            msg = "The benchmark files differ by more than the tolerance"
+            raise RuntimeError(msg)
+
+    return run
+
+
+@benchmark("get_masked_triangulation")
+def bench_get_masked_triangulation(data: BenchmarkData) -> Callable:
+    from matplotlib.tri import Triangulation
+
+    from adcirc_test.adcirctest import AdcircTest
+    from generators import water_levels
+
+    nodes, elements = data.mesh()
+    triangulation = Triangulation(nodes[:, 0], nodes[:, 1], elements - 1)
+    values = water_levels(len(nodes), 1, dry_fraction=0.05)[0]
+    values[values == -99999.0] = np.nan
+    return lambda: AdcircTest.get_masked_triangulation(triangulation, values)
+
+
+@benchmark("read_mesh")
+def bench_read_mesh(data: BenchmarkData) -> Callable:
+    from adcirc_test.session import read_mesh
+
+    filename = data.file("fort.14")
+    return lambda: read_mesh(filename)
+
+
+def _plot_max_files(data: BenchmarkData, renderer: str) -> Callable:
+    """
+    Set up the plot_max_files benchmark of a renderer. Each call starts with an
+    empty geometry cache, so the triangulation is included in the timing.
+
+    Args:
+        data: BenchmarkData of the mesh size
+        renderer: Renderer of the maps (contour, raster)
+
+    Returns:
+        Timed function
+    """
+    import os
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.geometry import MeshGeometryCache
+
+    mesh_file = data.file("fort.14")
+    control_file = data.file("control_maxele.63")
+    test_file = data.file("test_maxele.63")
+    output_directory = os.path.join(data.directory, f"plots_{renderer}")
+    os.makedirs(output_directory, exist_ok=True)
+
+    def run():
+        AdcircTest.plot_max_files(
+            "benchmark",
+            mesh_file,
+            test_file,
+            control_file,
+            output_directory,
+            is_geographic=False,
+            is_global=False,
+            geometry_cache=MeshGeometryCache(),
+            renderer=renderer,
+        )
+
+    return run
+
+
+@benchmark("plot_max_files_contour", max_nodes=1_000_000)
+def bench_plot_max_files_contour(data: BenchmarkData) -> Callable:
+    return _plot_max_files(data, "contour")
+
+
+@benchmark("plot_max_files_raster")
+def bench_plot_max_files_raster(data: BenchmarkData) -> Callable:
+    return _plot_max_files(data, "raster")
@@ -0,0 +1,240 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s :: %(levelname)s :: %(filename)s :: %(funcName)s :: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+
+
+def git_revision(directory: str) -> str:
+    """
+    Get the commit of the repository, marked when the tree has local changes
+
+    Args:
+        directory: Directory inside the repository
+
+    Returns:
+        Short commit hash, with a "-dirty" suffix for modified trees, or "unknown"
+    """
+    import subprocess
+
+    try:
+        result = subprocess.run(
+            ["git", "-C", directory, "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return result.stdout.strip()
+
+
+def run_benchmarks(
+    data_directory: str, sizes: List[str], pattern: Optional[str], repeat: int
+) -> Dict[str, dict]:
+    """
+    Run the benchmarks matching a pattern for each mesh size
+
+    Args:
+        data_directory: Directory holding the synthetic files of each size
+        sizes: Names of the mesh sizes (see MESH_SIZES)
+        pattern: Regular expression selecting the benchmarks by name (optional)
+        repeat: Number of timed calls of each benchmark
+
+    Returns:
+        Dictionary of timings keyed by <benchmark>[<size>]
+    """
+    import gc
+    import os
+    import re
+    import statistics
+    import time
+
+    from generators import MESH_SIZES
+    from harness_benchmarks import BENCHMARKS, BenchmarkData
+
+    results = {}
+    for size in sizes:
+        data = BenchmarkData(os.path.join(data_directory, size), MESH_SIZES[size])
+        for name, (setup, max_nodes) in BENCHMARKS.items():
+            if pattern and not re.search(pattern, name):
+                continue
+            if max_nodes is not None and MESH_SIZES[size] > max_nodes:
+                logger.info(f"Skipping {name} for {size} nodes")
+                continue
+
+            function = setup(data)
+            # One untimed call warms the caches of the operating system and the imports
+            function()
+            times = []
+            for _ in range(repeat):
+                gc.collect()
+                start = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - start)
+
+            key = f"{name}[{size}]"
+            results[key] = {
+                "min_s": min(times),
+                "median_s": statistics.median(times),
+                "repeat": repeat,
+            }
+            logger.info(
+                f"{key}: min={results[key]['min_s']:.4f}s median={results[key]['median_s']:.4f}s"
+            )
+    return results
+
+
+def compare_results(base: dict, new: dict, threshold: float) -> List[str]:
+    """
+    Compare two benchmark result files
+
+    Args:
+        base: Results of the base commit
+        new: Results of the new commit
+        threshold: Relative change of the minimum time reported as a regression
+            or an improvement
+
+    Returns:
+        List of formatted lines
+    """
+    lines = [f"Benchmarks of {new['commit']} relative to {base['commit']} (ratio = new / base):"]
+    for key in sorted(set(base["results"]) & set(new["results"])):
+        base_time = base["results"][key]["min_s"]
+        new_time = new["results"][key]["min_s"]
+        ratio = new_time / base_time if base_time > 0.0 else float("inf")
+        if ratio > 1.0 + threshold:
+            flag = "  SLOWER"
+        elif ratio < 1.0 - threshold:
+            flag = "  faster"
+        else:
+            flag = ""
+        lines.append(
+            f"  {key:40s} {base_time:10.4f}s {new_time:10.4f}s {ratio:6.2f}x{flag}"
+        )
+    return lines
+
+
+def benchmarks_main():
+    """
+    Main entrypoint for the benchmarks of the harness hot paths
+    """
+    import argparse
+    import datetime
+    import json
+    import os
+    import platform
+    import sys
+    import tempfile
+
+    benchmark_directory = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(benchmark_directory, "..", "test_runner"))
+
+    import numpy as np
+
+    from generators import MESH_SIZES
+    from harness_benchmarks import BENCHMARKS
+
+    # The harness logs every file it plots
+    logging.getLogger("adcirc_test").setLevel(logging.WARNING)
+
+    parser = argparse.ArgumentParser(description="ADCIRC Test Suite Harness Benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        help=f"Comma separated mesh sizes to run, from {', '.join(MESH_SIZES)} or all (default: 10k,100k)",
+        default="10k,100k",
+    )
+    parser.add_argument(
+        "--bench", type=str, help="Only run the benchmarks matching this regular expression"
+    )
+    parser.add_argument(
+        "--repeat", type=int, help="Number of timed calls of each benchmark (default: 5)", default=5
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        help="Directory where the synthetic files are generated and kept (default: in the temporary directory)",
+        default=os.path.join(tempfile.gettempdir(), "adcirc_benchmark_data"),
+    )
+    parser.add_argument(
+        "--results-dir",
+        type=str,
+        help="Directory where the results of each commit are written (default: benchmarks/results)",
+        default=os.path.join(benchmark_directory, "results"),
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        nargs="+",
+        metavar="RESULTS",
+        help="Compare a results file with the results of this run, or two results files without running",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Relative change reported as a regression or an improvement (default: 0.1)",
+        default=0.1,
+    )
+    parser.add_argument("--list", action="store_true", help="List the benchmarks")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, max_nodes) in BENCHMARKS.items():
+            limit = f" (up to {max_nodes} nodes)" if max_nodes else ""
+            print(f"{name}{limit}")
+        return
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two results files")
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+    else:
+        sizes = list(MESH_SIZES) if args.sizes == "all" else args.sizes.split(",")
+        for size in sizes:
+            if size not in MESH_SIZES:
+                parser.error(f"Unknown mesh size: {size}")
+
+        commit = git_revision(benchmark_directory)
+        new = {
+            "commit": commit,
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "machine": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+            "results": run_benchmarks(args.data_dir, sizes, args.bench, args.repeat),
+        }
+
+        # Results of earlier runs of the same commit are kept unless they are rerun
+        os.makedirs(args.results_dir, exist_ok=True)
+        results_file = os.path.join(args.results_dir, f"{commit}.json")
+        if os.path.exists(results_file):
+            with open(results_file) as f:
+                previous = json.load(f)
+            previous["results"].update(new["results"])
+            new["results"] = previous["results"]
+        with open(results_file, "w") as f:
+            json.dump(new, f, indent=2)
+        logger.info(f"Wrote the results to {results_file}")
+
+        if not args.compare:
+            return
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+
+    for line in compare_results(base, new, args.threshold):
+        print(line)
+
+
+if __name__ == "__main__":
+    benchmarks_main()
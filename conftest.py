@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_runner"))
+
+# Each entry of test_list.yaml is collected as a case with one item per phase
+pytest_plugins = ["adcirc_test.pytest_plugin"]
+
+# The harness sources and the case directories hold no pytest tests
+collect_ignore = ["test_runner", "adcirc", "adcirc-swan"]
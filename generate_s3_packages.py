@@ -31,12 +31,100 @@ def standard_files() -> list:
     return [
         "test_list.yaml",
         "RunSingleTest.sh",
+        "conftest.py",
         "test_runner/test_runner.py",
+        "test_runner/compress_controls.py",
+        "test_runner/harness_client.py",
+        "test_runner/harness_daemon.py",
+        "test_runner/scale_case.py",
+        "test_runner/update_solutions.py",
         "test_runner/adcirc_test/__init__.py",
+        "test_runner/adcirc_test/abcompare.py",
         "test_runner/adcirc_test/adcirctest.py",
+        "test_runner/adcirc_test/comparison.py",
+        "test_runner/adcirc_test/compression.py",
+        "test_runner/adcirc_test/coverage.py",
+        "test_runner/adcirc_test/daemon.py",
+        "test_runner/adcirc_test/fingerprint.py",
+        "test_runner/adcirc_test/geometry.py",
+        "test_runner/adcirc_test/history.py",
+        "test_runner/adcirc_test/hotstart_cache.py",
+        "test_runner/adcirc_test/impact.py",
+        "test_runner/adcirc_test/logcapture.py",
+        "test_runner/adcirc_test/memory.py",
+        "test_runner/adcirc_test/pipeline.py",
+        "test_runner/adcirc_test/profiling.py",
+        "test_runner/adcirc_test/pytest_plugin.py",
+        "test_runner/adcirc_test/raster.py",
+        "test_runner/adcirc_test/resources.py",
+        "test_runner/adcirc_test/scaling.py",
+        "test_runner/adcirc_test/session.py",
+        "test_runner/adcirc_test/slots.py",
+        "test_runner/adcirc_test/stationplots.py",
+        "test_runner/adcirc_test/watchdog.py",
     ]
 
 
+def control_output_files(test_path: str, output_files: list) -> list:
+    """
+    Get the control files of a test that are compared against the model output. Control
+    files may be stored compressed (i.e. fort.63.zst).
+
+    Args:
+        test_path (str): The path to the test
+        output_files (list): The output files listed for the test in the yaml file
+
+    Returns:
+        list: The paths of the control output files as stored
+    """
+    import os
+    files = []
+    for directory, subdirectories, _ in os.walk(test_path):
+        subdirectories.sort()
+        if os.path.basename(directory) != "control":
+            continue
+        for file in output_files:
+            for suffix in ["", ".zst", ".gz"]:
+                control_file = os.path.join(directory, file + suffix)
+                if os.path.exists(control_file):
+                    files.append(control_file)
+                    break
+    return files
+
+
+def write_control_fingerprints(control_files: list, output_directory: str, quantum: float,
+                               chunk_size: int) -> dict:
+    """
+    Write the fingerprints of the control output files of a test
+
+    Args:
+        control_files (list): The paths of the control output files
+        output_directory (str): The directory where the fingerprints are written
+        quantum (float): The width of the bins used to quantize the values
+        chunk_size (int): The number of nodes summarized by each chunk
+
+    Returns:
+        dict: The path of each fingerprint and its name in the package keyed by the path of its control file
+    """
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_runner"))
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.compression import uncompressed_name
+    from adcirc_test.fingerprint import compute_fingerprint, fingerprint_file, write_fingerprint
+
+    fingerprints = {}
+    for index, control_file in enumerate(control_files):
+        fingerprint = compute_fingerprint(control_file, AdcircTest.ADCIRC_DROP_VARIABLES_LIST, quantum,
+                                          chunk_size)
+        output_name = os.path.join(output_directory, f"{index}_{os.path.basename(fingerprint_file(control_file))}")
+        write_fingerprint(fingerprint, output_name)
+        print(f"   Fingerprint of {control_file}: {os.path.getsize(control_file)} -> "
+              f"{os.path.getsize(output_name)} bytes")
+        fingerprints[control_file] = (output_name, fingerprint_file(uncompressed_name(control_file)))
+    return fingerprints
+
+
 def check_semver(version: str) -> bool:
     """
     Check if the user provided version is a valid semantic version
@@ -64,6 +152,7 @@ def package_adcirc_tests():
     import os
     import tarfile
     import argparse
+    import tempfile
     import boto3
 
     # Get the cli options
@@ -79,6 +168,16 @@ def package_adcirc_tests():
                         default="adcirc-testsuite")
     parser.add_argument("--prefix", type=str, help="The prefix to use when uploading the tarballs (default: adcirc)",
                         default="adcirc")
+    parser.add_argument("--fingerprints", action="store_true",
+                        help="Replace the control output files with fingerprints and package the full control "
+                             "data separately as <test>.control.tar.gz (default: false)", default=False)
+    parser.add_argument("--quantum", type=float,
+                        help="The width of the bins used to quantize the fingerprints. Fingerprints can only "
+                             "pass tests run with a tolerance of at least this value (default: 1e-5)",
+                        default=1e-5)
+    parser.add_argument("--chunk-size", type=int,
+                        help="The number of nodes summarized by each chunk of a fingerprint (default: 4096)",
+                        default=4096)
 
     args = parser.parse_args()
 
@@ -107,19 +206,42 @@ def package_adcirc_tests():
         print(f"Packaging [{test_index + 1}/{len(test_info['tests'])}]: {test_name}")
         test_path = test_info["tests"][test_name]["path"]
         output_name = os.path.join(output_directory, f"{test_name}.tar.gz")
-
-        # Create a tarball of the test and the standard files
-        with tarfile.open(output_name, "w:gz") as tar:
-            for file in standard_files():
-                tar.add(file)
-            tar.add(test_path, arcname=test_path)
+        output_names = [output_name]
+
+        with tempfile.TemporaryDirectory() as fingerprint_directory:
+            fingerprints = {}
+            if args.fingerprints:
+                fingerprints = write_control_fingerprints(
+                    control_output_files(test_path, test_info["tests"][test_name]["output_files"]),
+                    fingerprint_directory, args.quantum, args.chunk_size)
+
+            # Create a tarball of the test and the standard files. The control output
+            # files are replaced by their fingerprints when requested.
+            def exclude_control_outputs(info: tarfile.TarInfo):
+                return None if os.path.normpath(info.name) in fingerprints else info
+
+            with tarfile.open(output_name, "w:gz") as tar:
+                for file in standard_files():
+                    tar.add(file)
+                tar.add(test_path, arcname=test_path, filter=exclude_control_outputs)
+                for fingerprint, arcname in fingerprints.values():
+                    tar.add(fingerprint, arcname=arcname)
+
+            # The full control data is fetched by the test runner relative to the test directory
+            if fingerprints:
+                control_name = os.path.join(output_directory, f"{test_name}.control.tar.gz")
+                with tarfile.open(control_name, "w:gz") as tar:
+                    for control_file in fingerprints:
+                        tar.add(control_file, arcname=os.path.relpath(control_file, test_path))
+                output_names.append(control_name)
 
         # Push the test up to s3
         if args.upload:
-            print(f"   Uploading '{output_name}' to S3 as "
-                  f"'s3://{args.bucket}/{args.prefix}/{version}/{os.path.basename(output_name)}'")
-            s3.upload_file(output_name, args.bucket, f"{args.prefix}/{version}/{os.path.basename(output_name)}")
-            os.remove(output_name)
+            for name in output_names:
+                print(f"   Uploading '{name}' to S3 as "
+                      f"'s3://{args.bucket}/{args.prefix}/{version}/{os.path.basename(name)}'")
+                s3.upload_file(name, args.bucket, f"{args.prefix}/{version}/{os.path.basename(name)}")
+                os.remove(name)
 
     # When we are done, if we were not uploading, we can remove the tarballs directory
     if not args.upload:
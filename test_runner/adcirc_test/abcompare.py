@@ -0,0 +1,142 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Labels of the two builds compared in A/B mode
+AB_BUILDS = ["a", "b"]
+
+# Results of comparing the outputs of the two builds (see AdcircTest.compare_outputs)
+AB_OUTPUT_RESULTS = ["identical", "within_tolerance", "different", "missing"]
+
+
+def model_runtimes(usage: dict) -> Dict[str, float]:
+    """
+    Get the model runtime of each phase of a test
+
+    Args:
+        usage: Resource usage dictionary from AdcircTest.resource_usage()
+
+    Returns:
+        Dictionary of wall times in seconds keyed by phase (coldstart, hotstart)
+    """
+    return {
+        phase: steps["model"]["wall_time_s"]
+        for phase, steps in usage.items()
+        if "model" in steps
+    }
+
+
+def _speedup(time_a: float, time_b: float) -> Optional[float]:
+    """
+    Get the speedup of build B over build A
+
+    Args:
+        time_a: Runtime of build A
+        time_b: Runtime of build B
+
+    Returns:
+        Ratio of the runtimes (greater than 1 when B is faster), or None
+    """
+    if time_b > 0.0:
+        return time_a / time_b
+    return None
+
+
+def summarize_ab_test(
+    usage: Dict[str, dict], status: Dict[str, dict], outputs: dict
+) -> dict:
+    """
+    Summarize the A/B comparison of a test
+
+    Args:
+        usage: Resource usage of each build keyed by build (a, b)
+        status: Status of each build from AdcircTest.run() keyed by build (a, b)
+        outputs: Comparison of the outputs of the builds from AdcircTest.compare_outputs()
+
+    Returns:
+        Dictionary with the control result and model runtimes of each build, the
+        speedup of each phase and overall, and the output comparison
+    """
+    runtimes = {build: model_runtimes(usage[build]) for build in AB_BUILDS}
+    phases = [p for p in runtimes["a"] if p in runtimes["b"]]
+
+    counts = {result: 0 for result in AB_OUTPUT_RESULTS}
+    for phase_results in outputs.values():
+        for result in phase_results.values():
+            counts[result] += 1
+
+    return {
+        "builds": {
+            build: {
+                "passed": status[build]["overall"]["passed"],
+                "model_runtime_s": runtimes[build],
+            }
+            for build in AB_BUILDS
+        },
+        "speedup": {
+            phase: _speedup(runtimes["a"][phase], runtimes["b"][phase])
+            for phase in phases
+        },
+        "total_speedup": _speedup(
+            sum(runtimes["a"][p] for p in phases), sum(runtimes["b"][p] for p in phases)
+        ),
+        "outputs": outputs,
+        "output_counts": counts,
+    }
+
+
+def format_ab_summary(results: Dict[str, dict]) -> List[str]:
+    """
+    Format the A/B comparison of the tests into lines suitable for logging
+
+    Args:
+        results: Dictionary of summaries from summarize_ab_test keyed by test name
+
+    Returns:
+        List of formatted lines
+    """
+    import math
+
+    lines = ["A/B comparison (speedup = model time of A / model time of B):"]
+    speedups = []
+    for test_name, result in results.items():
+        builds = result["builds"]
+        control = "/".join(
+            "pass" if builds[build]["passed"] else "FAIL" for build in AB_BUILDS
+        )
+        counts = result["output_counts"]
+        outputs = ", ".join(
+            f"{counts[r]} {r.replace('_', ' ')}" for r in AB_OUTPUT_RESULTS if counts[r]
+        )
+        lines.append(f"  {test_name}: control A/B {control}, A vs B outputs: {outputs}")
+        for phase, speedup in result["speedup"].items():
+            time_a = builds["a"]["model_runtime_s"][phase]
+            time_b = builds["b"]["model_runtime_s"][phase]
+            speedup_text = f"{speedup:.2f}x" if speedup is not None else "n/a"
+            lines.append(
+                f"    {phase}: A={time_a:.2f}s B={time_b:.2f}s speedup={speedup_text}"
+            )
+        if result["total_speedup"]:
+            speedups.append(result["total_speedup"])
+
+    if len(speedups) > 1:
+        geometric_mean = math.exp(sum(math.log(s) for s in speedups) / len(speedups))
+        lines.append(
+            f"  Geometric mean speedup over {len(speedups)} tests: {geometric_mean:.2f}x"
+        )
+    return lines
+
+
+def write_ab_report(filename: str, results: Dict[str, dict]) -> None:
+    """
+    Write the A/B comparison of the tests run so far to a json file
+
+    Args:
+        filename: Name of the json file
+        results: Dictionary of summaries from summarize_ab_test keyed by test name
+    """
+    import json
+
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2)
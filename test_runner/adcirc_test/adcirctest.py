@@ -1,5 +1,6 @@
 import logging
-from typing import Tuple, Union, ClassVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union, ClassVar
 
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
@@ -7,9 +8,104 @@ import numpy as np
 import xarray as xr
 from matplotlib.tri import Triangulation
 
+from .comparison import compare_sparse_snap, files_identical
+from .compression import find_output_file, open_text
+from .fingerprint import (
+    check_fingerprint,
+    fetch_control_data,
+    fingerprint_file,
+    read_fingerprint,
+)
+from .geometry import MeshGeometry, MeshGeometryCache
+from .hotstart_cache import HotstartCache, clone_file, hotstart_sources, input_snapshot
+from .logcapture import LogCapture
+from .profiling import HarnessProfiler
+from .raster import RENDERERS, RasterWeights
+from .resources import HarnessMonitor, ProcessTreeMonitor
+from .session import (
+    AsciiOutput,
+    OutputDataSession,
+    WarmDataCache,
+    read_adcirc_header,
+    read_full_snap,
+    read_sparse_snap,
+)
+from .slots import RankSlotPool, RankSlots, format_cpu_list
+from .stationplots import failing_stations, plot_stations, station_magnitudes
+from .watchdog import ModelTimeoutError, ModelWatchdog, kill_process_tree
+
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class AdcircTestOptions:
+    """
+    Options of an AdcircTest beyond the test and its tolerance
+
+    Attributes:
+        profiler: Profiler used to wrap each phase of the test (optional)
+        smoke_fraction: Fraction of the run length to simulate in smoke mode. When
+            set, the test must be run in a sandbox (see create_sandbox) and only
+            the leading output snaps are compared against the control (optional)
+        stall_timeout: Seconds without model progress before the run is killed (optional)
+        expected_runtimes: Historical model runtime in seconds for each phase
+            (coldstart, hotstart) used by the watchdog (optional)
+        runtime_factor: Multiple of the historical runtime allowed before the run
+            is killed (optional)
+        station_plot_mode: Station plot mode (individual, pages, pdf)
+        plot_workers: Number of processes used to render the station plots
+        failing_stations_only: Only plot the stations that differ from the
+            control by more than the tolerance
+        geometry_cache: Cache of the mesh geometry used by the plots, shared
+            between tests (optional)
+        renderer: Draw the maps with filled contours (contour) or as images (raster)
+        raster_resolution: Number of pixels along the longest side of the raster images
+        checksum: Pass output files that are bit-identical to the control without
+            a numeric comparison
+        control_url: Base url of the control data tarballs, used when the
+            control files are replaced by fingerprints (optional)
+        warm_cache: Cache holding the control files and meshes between tests,
+            i.e. in the harness daemon (optional)
+        environment: Environment variables added for the model and prep
+            processes, i.e. the GCOV_PREFIX of a coverage run (optional)
+        cpu_pool: Pool of cpus shared with the concurrent tests. A slot is held
+            for each rank while the prep and the model run (optional)
+        pin_cpus: Bind the prep and the model to the cpus held in cpu_pool
+        hotstart_cache: Cache where the hot start files of passed cold starts
+            are stored (optional)
+        hotstart_only: Take the cold start from hotstart_cache when it holds a
+            match for the executables and inputs, and only run the hot start
+        compare: Compare the outputs of each phase against the control files.
+            Runs that regenerate the control files skip the comparison.
+    """
+
+    # Runs
+    profiler: Optional[HarnessProfiler] = None
+    smoke_fraction: Optional[float] = None
+    stall_timeout: Optional[float] = None
+    expected_runtimes: Optional[dict] = None
+    runtime_factor: Optional[float] = None
+    environment: Optional[Dict[str, str]] = None
+    cpu_pool: Optional[RankSlotPool] = None
+    pin_cpus: bool = False
+    hotstart_cache: Optional[HotstartCache] = None
+    hotstart_only: bool = False
+
+    # Comparison against the control files
+    compare: bool = True
+    checksum: bool = True
+    control_url: Optional[str] = None
+    warm_cache: Optional[WarmDataCache] = None
+
+    # Plots
+    station_plot_mode: str = "individual"
+    plot_workers: int = 1
+    failing_stations_only: bool = False
+    geometry_cache: Optional[MeshGeometryCache] = None
+    renderer: str = "contour"
+    raster_resolution: int = 1000
+
+
 class AdcircTest:
     """
     Class to run an ADCIRC test based on a test yaml file
@@ -29,6 +125,9 @@ class AdcircTest:
         "max_nvell",
     ]
 
+    # Files written by adcprep in the run directory
+    PREP_OUTPUT_FILES: ClassVar = ["partmesh.txt", "metis_graph.txt", "fort.80"]
+
     def __init__(
         self,
         test: str,
@@ -37,6 +136,7 @@ class AdcircTest:
         root_dir: str,
         tolerance: float,
         verbose: bool = False,
+        options: Optional[AdcircTestOptions] = None,
     ):
         """
         Initialize the AdcircTest object
@@ -48,7 +148,9 @@ class AdcircTest:
             root_dir: Root directory for the tests
             tolerance: Tolerance for the test results
             verbose: Verbose output
+            options: Options of the runs, comparisons and plots (default: AdcircTestOptions())
         """
+        options = options if options is not None else AdcircTestOptions()
 
         if verbose:
             logger.setLevel(logging.DEBUG)
@@ -64,6 +166,46 @@ class AdcircTest:
         self.__test_directory = self.__find_test_directory()
         self.__is_global = self.__test_yaml.get("global", False)
         self.__is_geographic = self.__test_yaml.get("geographic", False)
+        self.__resources = {}
+        self.__profiler = options.profiler
+        self.__smoke_fraction = options.smoke_fraction
+        self.__source_directory = None
+        self.__stall_timeout = options.stall_timeout
+        self.__expected_runtimes = (
+            options.expected_runtimes if options.expected_runtimes else {}
+        )
+        self.__runtime_factor = options.runtime_factor
+        self.__session = OutputDataSession(
+            self.ADCIRC_DROP_VARIABLES_LIST, warm_cache=options.warm_cache
+        )
+        self.__station_plot_mode = options.station_plot_mode
+        self.__plot_workers = options.plot_workers
+        self.__failing_stations_only = options.failing_stations_only
+        self.__geometry_cache = (
+            options.geometry_cache
+            if options.geometry_cache is not None
+            else MeshGeometryCache()
+        )
+        self.__renderer = options.renderer
+        self.__raster_resolution = options.raster_resolution
+        self.__checksum = options.checksum
+        self.__comparisons = {}
+        self.__control_url = options.control_url
+        self.__control_fetched = False
+        self.__environment = options.environment
+        if options.pin_cpus and options.cpu_pool is None:
+            msg = "Pinning the runs to cpus requires a cpu pool"
+            raise ValueError(msg)
+        self.__cpu_pool = options.cpu_pool
+        self.__pin_cpus = options.pin_cpus
+        self.__prepared = set()
+        if options.hotstart_only and options.hotstart_cache is None:
+            msg = "Hot start only runs require a hot start cache"
+            raise ValueError(msg)
+        self.__hotstart_cache = options.hotstart_cache
+        self.__hotstart_only = options.hotstart_only
+        self.__hotstart_restored = False
+        self.__compare = options.compare
 
         logger.debug(f"AdcircTest object created for test: {test}")
         logger.debug(f"Executable: {self.__executable}")
@@ -77,6 +219,124 @@ class AdcircTest:
         """
         return f"AdcircTest(bin={self.__bin}, tolerance={self.__tolerance}, test={self.__test}, test_yaml={self.__test_yaml})"
 
+    def resource_usage(self) -> dict:
+        """
+        Get the resources used by each phase of the test
+
+        Returns:
+            Dictionary keyed by phase (coldstart, hotstart) and step (adcprep,
+            model, check_results, plot) with wall time, cpu time and peak memory
+        """
+        return self.__resources
+
+    def comparison_methods(self) -> dict:
+        """
+        Get how each output file was compared in each phase of the test
+
+        Returns:
+            Dictionary keyed by phase (coldstart, hotstart) of dictionaries mapping
+            each file to "checksum" (bit-identical), "fingerprint" or "numeric"
+        """
+        return self.__comparisons
+
+    def __record_resources(self, phase: str, step: str, usage: dict) -> None:
+        """
+        Record the resources used by a step of the test
+
+        Args:
+            phase: Phase of the test (coldstart, hotstart)
+            step: Step within the phase
+            usage: Resource usage summary
+        """
+        self.__resources.setdefault(phase, {})[step] = usage
+
+    def __profile_phase(self, phase_name: str):
+        """
+        Get a context manager that profiles a phase of the test when profiling
+        is enabled
+
+        Args:
+            phase_name: Name of the phase
+
+        Returns:
+            Context manager for the phase
+        """
+        from contextlib import nullcontext
+
+        if self.__profiler is None:
+            return nullcontext()
+        return self.__profiler.phase(self.__test, phase_name)
+
+    def __hold_cpus(self, count: Optional[int] = None):
+        """
+        Get a context manager holding cpu slots, one for each rank of the test by default
+
+        Args:
+            count: Number of slots to hold (optional)
+
+        Returns:
+            Context manager yielding the held slots when the runs are pinned to
+            them, otherwise None
+        """
+        from contextlib import contextmanager, nullcontext
+
+        if self.__cpu_pool is None:
+            return nullcontext()
+
+        @contextmanager
+        def hold():
+            with self.__cpu_pool.acquire(count if count else self.ranks) as slots:
+                if not self.__pin_cpus:
+                    yield None
+                    return
+                logger.info(
+                    f"Pinning test {self.__test} to cpus {format_cpu_list(slots.cpus)} "
+                    f"(NUMA nodes {', '.join(str(node) for node in slots.numa_nodes)})"
+                )
+                yield slots
+
+        return hold()
+
+    @staticmethod
+    def __pin_process(pid: int, slots: RankSlots, method: str) -> dict:
+        """
+        Restrict a process, and the processes it starts, to the cpus of the held slots
+
+        Args:
+            pid: Process id
+            slots: Slots held by the test
+            method: How the ranks are bound (mpirun, affinity), recorded with the binding
+
+        Returns:
+            Dictionary describing the binding
+        """
+        import os
+
+        try:
+            os.sched_setaffinity(pid, set(slots.cpus))
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Unable to set the cpu affinity of process {pid}: {e}")
+            if method == "affinity":
+                method = "none"
+        return {
+            "cpus": format_cpu_list(slots.cpus),
+            "numa_nodes": slots.numa_nodes,
+            "method": method,
+        }
+
+    @staticmethod
+    def __get_phase_name(is_hotstart: bool) -> str:
+        """
+        Get the name of the phase used as the key in the status dictionary
+
+        Args:
+            is_hotstart: If the test is a hotstart
+
+        Returns:
+            Name of the phase
+        """
+        return "hotstart" if is_hotstart else "coldstart"
+
     def __find_executable(self) -> Tuple[str, str]:
         """
         Find the executable based on the test yaml file
@@ -138,6 +398,160 @@ class AdcircTest:
         abs_path = os.path.abspath(test_dir)
         return abs_path
 
+    def create_sandbox(self, sandbox_root: str) -> str:
+        """
+        Copy the test into a sandbox directory so that it can be run without
+        modifying the repository. The control directories are linked rather than
+        copied. In smoke mode, the run length of the sandbox is truncated.
+
+        Args:
+            sandbox_root: Directory where the sandbox is created
+
+        Returns:
+            Absolute path to the sandbox
+        """
+        import os
+        import shutil
+
+        if self.__source_directory is not None:
+            msg = f"Test {self.__test} is already running in a sandbox"
+            raise RuntimeError(msg)
+
+        sandbox = os.path.join(os.path.abspath(sandbox_root), self.__test)
+        if os.path.exists(sandbox):
+            shutil.rmtree(sandbox)
+
+        shutil.copytree(
+            self.__test_directory,
+            sandbox,
+            symlinks=True,
+            ignore=shutil.ignore_patterns(
+                "control", "PE[0-9]*", "*.png", "*.pdf", "test.log", "test.log.gz"
+            ),
+        )
+        for directory, subdirectories, _ in os.walk(self.__test_directory):
+            if "control" in subdirectories:
+                control_directory = os.path.join(directory, "control")
+                relative_path = os.path.relpath(control_directory, self.__test_directory)
+                os.symlink(control_directory, os.path.join(sandbox, relative_path))
+            subdirectories[:] = [
+                d for d in subdirectories if d != "control" and not d.startswith("PE")
+            ]
+
+        logger.info(f"Created sandbox for test {self.__test}: {sandbox}")
+        self.__source_directory = self.__test_directory
+        self.__test_directory = sandbox
+
+        if self.__smoke_fraction is not None:
+            self.__truncate_run_length()
+
+        return sandbox
+
+    def remove_sandbox(self) -> None:
+        """
+        Remove the sandbox and point the test back at the repository directory
+
+        Returns:
+            None
+        """
+        import shutil
+
+        if self.__source_directory is None:
+            return
+
+        logger.debug(f"Removing sandbox: {self.__test_directory}")
+        shutil.rmtree(self.__test_directory, ignore_errors=True)
+        self.__test_directory = self.__source_directory
+        self.__source_directory = None
+
+    def __truncate_run_length(self) -> None:
+        """
+        Shorten the run length (RNDAY) in the sandbox copy of the fort.15 for
+        smoke mode
+
+        Returns:
+            None
+        """
+        import os
+        import re
+
+        if self.__source_directory is None:
+            msg = "Smoke mode requires the test to be run in a sandbox"
+            raise RuntimeError(msg)
+
+        test_directory = self.__get_test_directory(self.__has_hotstart(), False)
+        fort15 = os.path.join(test_directory, "fort.15")
+        with open(fort15, "r") as f:
+            lines = f.readlines()
+
+        # The value is in front of the first comment marker and the name of the
+        # parameter after the last one, i.e. "62 ! 62 ! RNDY"
+        rnday_comment = re.compile(r"^\s*RNDA?Y\b", re.IGNORECASE)
+        for i, line in enumerate(lines):
+            if "!" not in line:
+                continue
+            value = line.split("!", 1)[0]
+            comment = line.rsplit("!", 1)[1]
+            if not value.split() or not rnday_comment.match(comment):
+                continue
+            rnday = float(value.split()[0])
+            new_rnday = rnday * self.__smoke_fraction
+            lines[i] = line.replace(value.split()[0], f"{new_rnday:.6f}", 1)
+            logger.info(
+                f"Smoke mode: reduced RNDAY from {rnday} to {new_rnday:.6f} days"
+            )
+            break
+        else:
+            msg = f"Could not locate RNDAY in {fort15}"
+            raise ValueError(msg)
+
+        with open(fort15, "w") as f:
+            f.writelines(lines)
+
+    def __has_hotstart(self) -> bool:
+        """
+        Check if the test has a hotstart portion
+
+        Returns:
+            True if the test has a hotstart portion, False otherwise
+        """
+        return "hotstart" in self.__test_yaml and self.__test_yaml["hotstart"]
+
+    @staticmethod
+    def is_peak_file(file: str) -> bool:
+        """
+        Check if an output file holds peak (max/min) values rather than a time series
+
+        Args:
+            file: Name of the output file
+
+        Returns:
+            True if the file is a max/min file, False otherwise
+        """
+        return "max" in file or "min" in file
+
+    @staticmethod
+    def is_plotted_file(file: str) -> bool:
+        """
+        Check if an output file is plotted after the comparison
+
+        Args:
+            file: Name of the output file
+
+        Returns:
+            True if the file is plotted, False otherwise
+        """
+        return AdcircTest.is_peak_file(file) or "fort.61" in file or "fort.62" in file
+
+    def release(self) -> None:
+        """
+        Release the output data held between the comparison and the plotting
+
+        Returns:
+            None
+        """
+        self.__session.release()
+
     def clean(self) -> None:
         """
         Clean the test directory based on the test yaml file
@@ -146,13 +560,14 @@ class AdcircTest:
             None
         """
         logger.info(f"Cleaning test directory: {self.__test_directory}")
-        if "hotstart" in self.__test_yaml and self.__test_yaml["hotstart"]:
-            coldstart_directory = self.__get_test_directory(True, False)
-            hotstart_directory = self.__get_test_directory(True, True)
-            self.__do_clean(coldstart_directory)
-            self.__do_clean(hotstart_directory)
-        else:
-            self.__do_clean(self.__test_directory)
+        with self.__profile_phase("clean"):
+            if self.__has_hotstart():
+                coldstart_directory = self.__get_test_directory(True, False)
+                hotstart_directory = self.__get_test_directory(True, True)
+                self.__do_clean(coldstart_directory)
+                self.__do_clean(hotstart_directory)
+            else:
+                self.__do_clean(self.__test_directory)
 
     def __do_clean(self, test_directory: str) -> None:
         """
@@ -188,23 +603,134 @@ class AdcircTest:
         """
         status = {"overall": {"passed": False}}
 
-        if "hotstart" in self.__test_yaml and self.__test_yaml["hotstart"]:
-            logger.info("Starting cold-start portion of the test")
-            status["coldstart"] = self.__run_test(has_hotstart=True, is_hotstart=False)
+        if self.__has_hotstart():
+            if self.__hotstart_only and self.__restore_hotstart():
+                status["coldstart"] = {
+                    "complete": False,
+                    "passed": True,
+                    "cached": True,
+                    "failed_files": [],
+                }
+            else:
+                status["coldstart"] = self.run_phase("coldstart")
             if not status["coldstart"]["passed"]:
                 return status
-            self.__copy_hotstart()
-            logger.info("Starting hot-start portion of the test")
-            status["hotstart"] = self.__run_test(has_hotstart=True, is_hotstart=True)
+            if self.__smoke_fraction is not None:
+                logger.info("Smoke mode: skipping hot-start portion of the test")
+                status["hotstart"] = {"complete": False, "passed": True, "failed_files": []}
+                status["overall"]["passed"] = True
+                return status
+            status["hotstart"] = self.run_phase("hotstart")
             status["overall"]["passed"] = (
                 status["coldstart"]["passed"] and status["hotstart"]["passed"]
             )
         else:
-            status["coldstart"] = self.__run_test(has_hotstart=False, is_hotstart=False)
+            status["coldstart"] = self.run_phase("coldstart")
             status["overall"]["passed"] = status["coldstart"]["passed"]
 
         return status
 
+    def phases(self) -> List[str]:
+        """
+        Get the phases of the test in run order
+
+        Returns:
+            List of phase names (coldstart, hotstart)
+        """
+        if self.__has_hotstart():
+            return ["coldstart", "hotstart"]
+        return ["coldstart"]
+
+    @property
+    def ranks(self) -> int:
+        """
+        Number of MPI ranks used by the model, including the writer ranks
+        """
+        if not self.__test_yaml["parallel"]:
+            return 1
+        return self.__test_yaml["ncpu"] + self.__test_yaml.get("n_writer", 0)
+
+    def run_phase(self, phase: str) -> dict:
+        """
+        Run a single phase of the test. The hot-start phase must follow the
+        cold-start phase of the same test.
+
+        Args:
+            phase: Phase to run (coldstart, hotstart)
+
+        Returns:
+            A dictionary with the status of the phase
+        """
+        if phase not in self.phases():
+            msg = f"Test {self.__test} has no {phase} phase"
+            raise ValueError(msg)
+
+        if phase == "hotstart":
+            if not self.__hotstart_restored:
+                self.__copy_hotstart()
+            self.__hotstart_restored = False
+            logger.info("Starting hot-start portion of the test")
+            return self.__run_test(has_hotstart=True, is_hotstart=True)
+
+        if not self.__has_hotstart():
+            return self.__run_test(has_hotstart=False, is_hotstart=False)
+
+        logger.info("Starting cold-start portion of the test")
+        # Cold starts of truncated smoke runs are not cached
+        store = self.__hotstart_cache is not None and self.__smoke_fraction is None
+        test_directory = self.__get_test_directory(has_hotstart=True, is_hotstart=False)
+        snapshot = input_snapshot(test_directory) if store else None
+        status = self.__run_test(has_hotstart=True, is_hotstart=False)
+        if store and status["passed"]:
+            # Files the cold start did not modify are its inputs. The adcprep
+            # outputs may predate the snapshot when the prep ran ahead.
+            after = input_snapshot(test_directory)
+            inputs = [
+                name
+                for name, stat in snapshot.items()
+                if after.get(name) == stat and name not in self.PREP_OUTPUT_FILES
+            ]
+            self.__hotstart_cache.store(
+                self.__test, self.__run_executables(), test_directory, inputs
+            )
+        return status
+
+    def __run_executables(self) -> List[str]:
+        """
+        Get the executables a run of the test uses
+
+        Returns:
+            Paths of the model executable and, for parallel tests, the prep executable
+        """
+        if self.__test_yaml["parallel"]:
+            return [self.__executable, self.__prep_executable]
+        return [self.__executable]
+
+    def __restore_hotstart(self) -> bool:
+        """
+        Copy the hot start files of a cached cold start into the hot start directory
+
+        Returns:
+            True if the cache held a cold start matching the executables and inputs
+        """
+        entry = self.__hotstart_cache.lookup(
+            self.__test,
+            self.__run_executables(),
+            self.__get_test_directory(has_hotstart=True, is_hotstart=False),
+        )
+        if entry is None:
+            logger.warning(
+                f"No cached cold start of test {self.__test} matches the executables and "
+                "inputs, running the cold start"
+            )
+            return False
+        logger.info(f"Skipping the cold start of test {self.__test}, using {entry}")
+        self.__hotstart_cache.restore(
+            entry, self.__get_test_directory(has_hotstart=True, is_hotstart=True)
+        )
+        self.__hotstart_restored = True
+        return True
+
     def __copy_hotstart(self) -> None:
         """
         Copy the hot start information from the cold start directory to the hot start directory
@@ -213,25 +739,17 @@ class AdcircTest:
             None
         """
         import os
-        import shutil
 
-        hotstart_file_options = ["fort.67", "fort.68", "fort.67.nc", "fort.68.nc"]
         test_directory_cold = self.__get_test_directory(
             has_hotstart=True, is_hotstart=False
         )
         test_directory_hot = self.__get_test_directory(
             has_hotstart=True, is_hotstart=True
         )
-        for file in hotstart_file_options:
-            file_cold = os.path.join(test_directory_cold, file)
-            file_binary_cold = os.path.join(test_directory_cold, "PE0000", file)
+        for file, file_cold in hotstart_sources(test_directory_cold).items():
             file_hot = os.path.join(test_directory_hot, file)
-            if os.path.exists(file_cold):
-                shutil.copy(file_cold, file_hot)
-                logger.info(f"Copied hotstart file: {file_cold} to {file_hot}")
-            elif os.path.exists(file_binary_cold):
-                shutil.copy(file_binary_cold, file_hot)
-                logger.info(f"Copied hotstart file: {file_binary_cold} to {file_hot}")
+            clone_file(file_cold, file_hot)
+            logger.info(f"Copied hotstart file: {file_cold} to {file_hot}")
 
     def __run_test(self, has_hotstart: bool, is_hotstart: bool) -> dict:
         """
@@ -245,14 +763,14 @@ class AdcircTest:
             A dictionary with the status of the test
         """
         import os
-        import subprocess
-        from tqdm import tqdm
 
         # Current directory
         cwd = os.getcwd()
 
         # Log file
-        log_file = os.path.join(self.__test_directory, "test.log")
+        log_file = os.path.join(self.__test_directory, "test.log.gz")
+
+        phase = self.__get_phase_name(is_hotstart)
 
         try:
 
@@ -261,96 +779,238 @@ class AdcircTest:
             # Change to the test directory
             os.chdir(test_directory)
 
-            # If the test is parallel, we need to run adcprep
-            if self.__test_yaml["parallel"]:
-                self.__prep_simulation()
+            with self.__hold_cpus() as slots:
+                # If the test is parallel, we need to run adcprep unless it was
+                # run ahead by prepare()
+                if self.__test_yaml["parallel"] and phase not in self.__prepared:
+                    with self.__profile_phase(f"{phase}_prep"):
+                        self.__prep_simulation(phase, test_directory, slots)
+                self.__prepared.discard(phase)
+
+                with self.__profile_phase(f"{phase}_model"):
+                    self.__run_model(phase, log_file, slots)
+
+        except ModelTimeoutError as e:
+            logger.error(f"Test {self.__test} timed out: {e}")
+            return {
+                "complete": False,
+                "passed": False,
+                "timed_out": True,
+                "reason": str(e),
+                "failed_files": [],
+            }
 
-            progress_bar = tqdm(
-                total=100,
-                ncols=50,
-                file=open(os.devnull, "w"),  # noqa: SIM115
-            )
+        finally:
+            # Change back to the original directory
+            os.chdir(cwd)
 
-            if self.__test_yaml["parallel"]:
-                if "n_writer" in self.__test_yaml:
-                    total_cpu = self.__test_yaml["ncpu"] + self.__test_yaml["n_writer"]
-                else:
-                    total_cpu = self.__test_yaml["ncpu"]
-
-                cmd = [
-                    "mpirun",
-                    "--allow-run-as-root",
-                    "-np",
-                    "{:d}".format(total_cpu),
-                    self.__executable,
-                ]
-                if "n_writer" in self.__test_yaml and self.__test_yaml["n_writer"] > 0:
-                    cmd += ["-W", "{:d}".format(self.__test_yaml["n_writer"])]
+        if not self.__compare:
+            return {"complete": True, "passed": True, "compared": False, "failed_files": []}
+
+        with self.__profile_phase(f"{phase}_check_results"):
+            with HarnessMonitor() as harness:
+                passed, failed_files = self.check_results(has_hotstart, is_hotstart)
+        self.__record_resources(phase, "check_results", harness.summary())
+
+        return {
+            "complete": True,
+            "passed": passed,
+            "failed_files": failed_files,
+            "comparisons": self.__comparisons.get(phase, {}),
+        }
+
+    def __run_model(
+        self, phase: str, log_file: str, slots: Optional[RankSlots] = None
+    ) -> None:
+        """
+        Run the model executable in the current directory
+
+        Args:
+            phase: Phase of the test used to record the resource usage
+            log_file: File where the compressed model output is written
+            slots: Slots whose cpus the model is pinned to (optional)
+
+        Returns:
+            None
+        """
+        import os
+        import subprocess
+        from tqdm import tqdm
+
+        progress_bar = tqdm(
+            total=100,
+            ncols=50,
+            file=open(os.devnull, "w"),  # noqa: SIM115
+        )
+
+        if self.__test_yaml["parallel"]:
+            if "n_writer" in self.__test_yaml:
+                total_cpu = self.__test_yaml["ncpu"] + self.__test_yaml["n_writer"]
             else:
-                cmd = self.__executable
-
-            cmd_string = " ".join(cmd)
-            logger.debug(f"Running command: {cmd_string}")
-            process = subprocess.Popen(
-                cmd,
-                shell=False,
-                bufsize=1,
-                universal_newlines=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
+                total_cpu = self.__test_yaml["ncpu"]
+
+            cmd = [
+                "mpirun",
+                "--allow-run-as-root",
+                "-np",
+                "{:d}".format(total_cpu),
+            ]
+            if slots is not None:
+                cmd += self.__mpirun_binding(slots, total_cpu)
+            cmd += [self.__executable]
+            if "n_writer" in self.__test_yaml and self.__test_yaml["n_writer"] > 0:
+                cmd += ["-W", "{:d}".format(self.__test_yaml["n_writer"])]
+        else:
+            cmd = self.__executable
+
+        cmd_string = " ".join(cmd)
+        logger.debug(f"Running command: {cmd_string}")
+        process = subprocess.Popen(
+            cmd,
+            shell=False,
+            env=self.__process_environment(),
+            bufsize=0,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        binding = None
+        if slots is not None:
+            binding = self.__pin_process(
+                process.pid,
+                slots,
+                "mpirun" if self.__test_yaml["parallel"] else "affinity",
             )
+        monitor = ProcessTreeMonitor(process.pid)
+        monitor.start()
+        watchdog = ModelWatchdog(
+            process.pid,
+            self.__stall_timeout,
+            self.__expected_runtimes.get(phase),
+            self.__runtime_factor,
+        )
+        watchdog.start()
+
+        percent = 0
+        logger.info(progress_bar)
+
+        def on_progress(percent_new: float) -> None:
+            nonlocal percent
+            watchdog.progress(percent_new)
+            percent_new = int(percent_new)
+            if (
+                percent_new % 5 == 0 or percent_new - percent > 10
+            ) and percent_new > percent:
+                percent = percent_new
+                progress_bar.update(percent - progress_bar.n)
+                logger.info(progress_bar)
 
-            percent = 0
+        log_capture = LogCapture(log_file)
+        try:
+            log_capture.capture(process.stdout, on_progress)
+        except BaseException:
+            # The model runs in its own session, so it must be killed explicitly
+            kill_process_tree(process.pid)
+            raise
+        finally:
+            return_code = monitor.wait(process)
+            watchdog.stop()
+            usage = monitor.stop()
+            if binding is not None:
+                usage["cpu_binding"] = binding
+            self.__record_resources(phase, "model", usage)
+
+        if watchdog.timed_out or return_code != 0:
+            logger.error(f"Last lines of the model output (full log: {log_file}):")
+            for line in log_capture.tail():
+                logger.error(f"  {line}")
+
+        if watchdog.timed_out:
+            raise ModelTimeoutError(watchdog.reason)
+
+        if return_code == 0 and percent < 100:
+            progress_bar.update(100 - progress_bar.n)
             logger.info(progress_bar)
-            with open(log_file, "w") as log:
-                for line in process.stdout:
-                    log.write(line)
-                    if "TIME STEP" in line and "ITERATIONS" in line:
-                        line = line.strip().split()
-
-                        try: 
-                            percent_new = int(float(line[4].split("%")[0]))
-                        except ValueError:
-                            percent_new = percent
-
-                        if (
-                            percent_new % 5 == 0 or percent_new - percent > 10
-                        ) and percent_new > percent:
-                            percent = percent_new
-                            progress_bar.update(percent - progress_bar.n)
-                            logger.info(progress_bar)
-
-            return_code = process.wait()
-
-            if return_code == 0 and percent < 100:
-                progress_bar.update(100 - progress_bar.n)
-                logger.info(progress_bar)
 
-            logger.info(f"Executable completed with return code: {return_code}")
+        logger.info(f"Executable completed with return code: {return_code}")
 
-            # Check the return code
-            if return_code != 0:
-                msg = f"Executable failed with return code: {return_code}"
-                raise RuntimeError(msg)
+        # Check the return code
+        if return_code != 0:
+            msg = f"Executable failed with return code: {return_code}"
+            raise RuntimeError(msg)
 
-            progress_bar.close()
+        progress_bar.close()
 
-        finally:
-            # Change back to the original directory
-            os.chdir(cwd)
+    @staticmethod
+    def __mpirun_binding(slots: RankSlots, ranks: int) -> List[str]:
+        """
+        Get the mpirun options binding each rank to one of the held cpus
 
-        passed, failed_files = self.check_results(has_hotstart, is_hotstart)
-        return {"complete": True, "passed": passed, "failed_files": failed_files}
+        Args:
+            slots: Slots held by the test
+            ranks: Number of ranks started by mpirun
 
-    def __prep_simulation(self) -> None:
+        Returns:
+            List of Open MPI options
         """
-        Run the prep executable
+        cmd = [
+            "--cpu-set",
+            format_cpu_list(slots.cpus),
+            "--use-hwthread-cpus",
+        ]
+        # Slots beyond the number of cpus of the machine share cpus
+        if len(set(slots.cpus)) < ranks:
+            return cmd + ["--oversubscribe", "--bind-to", "hwthread:overload-allowed"]
+        return cmd + ["--bind-to", "hwthread"]
+
+    def __process_environment(self) -> Optional[Dict[str, str]]:
+        """
+        Get the environment of the model and prep processes
+
+        Returns:
+            Environment with the variables of the test added, or None to inherit
+            the environment of the harness
+        """
+        import os
+
+        if not self.__environment:
+            return None
+        return {**os.environ, **self.__environment}
+
+    def prepare(self) -> None:
+        """
+        Run the prep executable for the cold start ahead of run(), i.e. while
+        the model of another test runs. The prep of the hot start needs the
+        hot start files and is left to run(). Nothing is done for serial tests.
+        This does not change the working directory, so it can be called from a
+        thread other than the one running the tests.
 
         Returns:
             None
         """
-        import subprocess
+        # The cold start of a hot start only run is expected to come from the cache
+        if not self.__test_yaml["parallel"] or self.__hotstart_only:
+            return
+        test_directory = self.__get_test_directory(self.__has_hotstart(), False)
+        # adcprep is serial, so it holds a single cpu slot
+        with self.__hold_cpus(1) as slots:
+            self.__prep_simulation("coldstart", test_directory, slots)
+        self.__prepared.add("coldstart")
+
+    def __prep_simulation(
+        self, phase: str, directory: str, slots: Optional[RankSlots] = None
+    ) -> None:
+        """
+        Run the prep executable
+
+        Args:
+            phase: Phase of the test used to record the resource usage
+            directory: Directory of the run
+            slots: Slots whose cpus the prep is pinned to (optional)
 
+        Returns:
+            None
+        """
         logger.info(f"Running prep executable: {self.__prep_executable}")
         cmd = [
             self.__prep_executable,
@@ -358,15 +1018,8 @@ class AdcircTest:
             "{:d}".format(self.__test_yaml["ncpu"]),
             "--partmesh",
         ]
-        ret = subprocess.run(
-            cmd,
-            shell=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
-        if ret.returncode != 0:
-            msg = f"Prep executable failed with return code: {ret.returncode}"
-            raise RuntimeError(msg)
+        self.__run_prep_command(cmd, phase, "adcprep_partmesh", directory, slots)
+
         cmd = [
             self.__prep_executable,
             "--np",
@@ -377,14 +1030,54 @@ class AdcircTest:
         cmd_string = " ".join(cmd)
         logger.debug(f"Running command: {cmd_string}")
 
-        ret = subprocess.run(
+        self.__run_prep_command(cmd, phase, "adcprep_prepall", directory, slots)
+
+    def __run_prep_command(
+        self,
+        cmd: list,
+        phase: str,
+        step: str,
+        directory: str,
+        slots: Optional[RankSlots] = None,
+    ) -> None:
+        """
+        Run a single prep command and record its resource usage
+
+        Args:
+            cmd: Command to run
+            phase: Phase of the test
+            step: Name of the step used to record the resource usage
+            directory: Directory the command runs in
+            slots: Slots whose cpus the prep is pinned to (optional)
+
+        Returns:
+            None
+        """
+        import subprocess
+
+        process = subprocess.Popen(
             cmd,
             shell=False,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            cwd=directory,
+            env=self.__process_environment(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
         )
-        if ret.returncode != 0:
-            msg = f"Prep executable failed with return code: {ret.returncode}"
+        binding = None
+        if slots is not None:
+            binding = self.__pin_process(process.pid, slots, "affinity")
+        monitor = ProcessTreeMonitor(process.pid)
+        monitor.start()
+        try:
+            monitor.wait(process)
+        finally:
+            usage = monitor.stop()
+            if binding is not None:
+                usage["cpu_binding"] = binding
+            self.__record_resources(phase, step, usage)
+
+        if process.returncode != 0:
+            msg = f"Prep executable failed with return code: {process.returncode}"
             raise RuntimeError(msg)
 
     def __get_test_directory(self, has_hotstart: bool, is_hotstart: bool) -> str:
@@ -423,30 +1116,82 @@ class AdcircTest:
 
         all_passed = True
         error_files = []
+        comparisons = {}
+        self.__comparisons[self.__get_phase_name(is_hotstart)] = comparisons
 
         test_directory = self.__get_test_directory(has_hotstart, is_hotstart)
 
         for file in self.__test_yaml["output_files"]:
 
+            if self.__smoke_fraction is not None and self.is_peak_file(file):
+                logger.info(f"Smoke mode: skipping peak value file: {file}")
+                continue
+
             logger.info(f"Checking file: {file}")
 
+            # Control files may be stored compressed
             control_file = os.path.join(test_directory, "control", file)
+            control_file = find_output_file(control_file) or control_file
             test_file = os.path.join(test_directory, file)
 
-            if not os.path.exists(control_file):
-                msg = f"Control file {control_file} does not exist"
-                raise FileNotFoundError(msg)
-
             if not os.path.exists(test_file):
                 msg = f"Test file {test_file} does not exist"
                 raise FileNotFoundError(msg)
 
-            # Compare the files
-            passed = self.__compare_files(control_file, test_file, self.__tolerance)
+            # Packages may carry only a fingerprint of the control file. The full
+            # control data is fetched when the fingerprint cannot decide the test.
+            if not os.path.exists(control_file) and os.path.exists(
+                fingerprint_file(control_file)
+            ):
+                status = self.__check_fingerprint(control_file, test_file)
+                if status == "pass" or (status == "fail" and not self.__control_url):
+                    comparisons[file] = "fingerprint"
+                    if status == "fail":
+                        all_passed = False
+                        error_files.append(os.path.basename(test_file))
+                    continue
+                self.__fetch_control_data()
+                control_file = find_output_file(control_file) or control_file
+
+            if not os.path.exists(control_file):
+                msg = f"Control file {control_file} does not exist"
+                raise FileNotFoundError(msg)
+
+            # Bit-identical files pass without a numeric comparison. Truncated smoke
+            # runs never match the full control files.
+            if (
+                self.__checksum
+                and self.__smoke_fraction is None
+                and files_identical(
+                    control_file, test_file, self.ADCIRC_DROP_VARIABLES_LIST
+                )
+            ):
+                logger.info(f"File {file} is bit-identical to the control (checksum)")
+                comparisons[file] = "checksum"
+                continue
+            comparisons[file] = "numeric"
+
+            # Files that are plotted later are held in the session so they are
+            # only read once
+            passed = self.__compare_files(
+                control_file,
+                test_file,
+                self.__tolerance,
+                prefix=self.__smoke_fraction is not None,
+                session=self.__session if self.is_plotted_file(file) else None,
+            )
             if not passed:
                 all_passed = False
                 error_files.append(test_file.split("/")[-1].split("\\")[-1])
 
+        checksum_count = list(comparisons.values()).count("checksum")
+        fingerprint_count = list(comparisons.values()).count("fingerprint")
+        logger.info(
+            f"Compared {len(comparisons)} files: {checksum_count} bit-identical (checksum), "
+            f"{fingerprint_count} by fingerprint, "
+            f"{len(comparisons) - checksum_count - fingerprint_count} numerically"
+        )
+
         if not all_passed:
             logger.error(f"Test {self.__test} failed.")
             logger.error(f"Error files: {error_files}")
@@ -455,8 +1200,81 @@ class AdcircTest:
 
         return all_passed, error_files
 
+    def __check_fingerprint(self, control_file: str, test_file: str) -> str:
+        """
+        Check a test file against the fingerprint of its control file
+
+        Args:
+            control_file: Name of the control file
+            test_file: Name of the test file
+
+        Returns:
+            Status of the check (pass, fail, undecided)
+        """
+        result = check_fingerprint(
+            read_fingerprint(fingerprint_file(control_file)),
+            test_file,
+            self.__tolerance,
+            self.ADCIRC_DROP_VARIABLES_LIST,
+            prefix=self.__smoke_fraction is not None,
+        )
+
+        for message in result["messages"]:
+            logger.error(message)
+        for variable, snap, chunk in result["failed"][:10]:
+            logger.error(
+                f"Fingerprint mismatch in file {test_file}: variable {variable}, "
+                f"snap {snap}, chunk {chunk}"
+            )
+        if len(result["failed"]) > 10:
+            logger.error(
+                f"Fingerprint mismatch in {len(result['failed']) - 10} more chunks of file {test_file}"
+            )
+        if result["undecided"]:
+            logger.info(
+                f"Fingerprint of {test_file} is undecided for {len(result['undecided'])} chunks"
+            )
+        if result["status"] == "undecided" and not self.__control_url:
+            msg = (
+                f"Fingerprint cannot decide the comparison of {test_file} and no "
+                "control url is set to fetch the control data"
+            )
+            raise RuntimeError(msg)
+
+        logger.info(f"Fingerprint check of file {test_file}: {result['status']}")
+        return result["status"]
+
+    def __fetch_control_data(self) -> None:
+        """
+        Fetch the full control data of the test from the control url. The data is
+        extracted into the test directory in the repository (not the sandbox) so
+        that it is only fetched once.
+        """
+        if self.__control_fetched:
+            return
+        if not self.__control_url:
+            msg = f"No control url is set to fetch the control data of {self.__test}"
+            raise RuntimeError(msg)
+
+        destination = (
+            self.__source_directory
+            if self.__source_directory is not None
+            else self.__test_directory
+        )
+        fetch_control_data(
+            f"{self.__control_url.rstrip('/')}/{self.__test}.control.tar.gz",
+            destination,
+        )
+        self.__control_fetched = True
+
     @staticmethod
-    def __compare_files(control_file: str, test_file: str, tolerance: float) -> bool:
+    def __compare_files(
+        control_file: str,
+        test_file: str,
+        tolerance: float,
+        prefix: bool = False,
+        session: Optional[OutputDataSession] = None,
+    ) -> bool:
         """
         Compare the control and test files
 
@@ -464,18 +1282,28 @@ class AdcircTest:
             control_file: Name of the control file
             test_file: Name of the test file
             tolerance: Tolerance for the comparison
+            prefix: Compare the test file against the leading snaps of the control file
+            session: Session used to read and hold the files (optional)
 
         Returns:
             True if the files match within spec, False otherwise
         """
         if control_file.endswith(".nc") and test_file.endswith(".nc"):
-            return AdcircTest.__compare_files_netcdf(control_file, test_file, tolerance)
+            return AdcircTest.__compare_files_netcdf(
+                control_file, test_file, tolerance, prefix, session
+            )
         else:
-            return AdcircTest.__compare_files_ascii(control_file, test_file, tolerance)
+            return AdcircTest.__compare_files_ascii(
+                control_file, test_file, tolerance, prefix, session
+            )
 
     @staticmethod
     def __compare_files_netcdf(
-        control_file: str, test_file: str, tolerance: float
+        control_file: str,
+        test_file: str,
+        tolerance: float,
+        prefix: bool = False,
+        session: Optional[OutputDataSession] = None,
     ) -> bool:
         """
         Compare the control and test files in netcdf format
@@ -484,25 +1312,39 @@ class AdcircTest:
             control_file: Name of the control file
             test_file: Name of the test file
             tolerance: Tolerance for the comparison
+            prefix: Compare the test file against the leading snaps of the control file
+            session: Session used to read and hold the files (optional)
 
         Returns:
             True if the files match within spec, False otherwise
         """
-        control = xr.open_dataset(
-            control_file,
-            drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST,
-            decode_times=False,
-        )
-        test = xr.open_dataset(
-            test_file,
-            drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST,
-            decode_times=False,
-        )
+        if session is not None:
+            control = session.netcdf_dataset(control_file)
+            test = session.netcdf_dataset(test_file)
+        else:
+            control = xr.open_dataset(
+                control_file,
+                drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST,
+                decode_times=False,
+            )
+            test = xr.open_dataset(
+                test_file,
+                drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST,
+                decode_times=False,
+            )
+
+        if prefix and "time" in test.dims and "time" in control.dims:
+            if test.sizes["time"] > control.sizes["time"]:
+                msg = f"Test file {test_file} has more snaps than the control file"
+                raise ValueError(msg)
+            control = control.isel(time=slice(0, test.sizes["time"]))
 
         passed_test = AdcircTest.__compare_datasets(control, test, tolerance)
 
-        control.close()
-        test.close()
+        # Datasets held by the session are closed when it is released
+        if session is None:
+            control.close()
+            test.close()
 
         return passed_test
 
@@ -560,7 +1402,11 @@ class AdcircTest:
 
     @staticmethod
     def __compare_files_ascii(
-        control_file: str, test_file: str, tolerance: float
+        control_file: str,
+        test_file: str,
+        tolerance: float,
+        prefix: bool = False,
+        session: Optional[OutputDataSession] = None,
     ) -> bool:
         """
         Compare the control and test files in ascii format
@@ -569,6 +1415,8 @@ class AdcircTest:
             control_file: Name of the control file
             test_file: Name of the test file
             tolerance: Tolerance for the comparison
+            prefix: Compare the test file against the leading snaps of the control file
+            session: Session used to read and hold the files (optional)
 
         Returns:
             True if the files match within spec, False otherwise
@@ -578,13 +1426,33 @@ class AdcircTest:
         control_header = AdcircTest.__get_adcirc_header(control_file)
         test_header = AdcircTest.__get_adcirc_header(test_file)
 
-        if control_header != test_header:
+        if prefix:
+            if test_header["snap_count"] > control_header["snap_count"]:
+                msg = f"Test file {test_file} has more snaps than the control file"
+                raise ValueError(msg)
+            snap_count = test_header["snap_count"]
+            control_header_compare = dict(control_header, snap_count=snap_count)
+        else:
+            snap_count = control_header["snap_count"]
+            control_header_compare = control_header
+
+        if control_header_compare != test_header:
             msg = f"Header information does not match in file: {test_file}"
             raise ValueError(msg)
 
+        if session is not None:
+            return AdcircTest.__compare_ascii_outputs(
+                session.ascii_output(control_file),
+                session.ascii_output(test_file),
+                snap_count,
+                tolerance,
+                prefix,
+            )
+
         passed = True
 
-        with open(control_file, "r") as control, open(test_file, "r") as test:
+        # Compressed control files are decompressed as they are read
+        with open_text(control_file) as control, open_text(test_file) as test:
 
             # Skip the header since we already have this info
             _ = control.readline()
@@ -592,17 +1460,24 @@ class AdcircTest:
             _ = test.readline()
             _ = test.readline()
 
-            for i in range(control_header["snap_count"]):
-                (
-                    control_result,
-                    control_time,
-                    control_iteration,
-                ) = AdcircTest.__read_adcirc_output_snap(control, control_header)
-                (
-                    test_result,
-                    test_time,
-                    test_iteration,
-                ) = AdcircTest.__read_adcirc_output_snap(test, test_header)
+            for i in range(snap_count):
+
+                test_snap = AdcircTest.__read_adcirc_output_snap(test, test_header)
+
+                # A truncated run may write fewer snaps than its header reports
+                if test_snap is None and prefix:
+                    logger.info(f"Compared {i} leading snaps of file {test_file}")
+                    break
+
+                control_snap = AdcircTest.__read_adcirc_output_snap(
+                    control, control_header
+                )
+                if control_snap is None or test_snap is None:
+                    msg = f"Snap count mismatch in file {test_file}"
+                    raise ValueError(msg)
+
+                test_time, test_iteration, test_snap = test_snap
+                control_time, control_iteration, control_snap = control_snap
                 if control_time != test_time:
                     msg = f"Time mismatch in file {test_file}"
                     raise ValueError(msg)
@@ -611,8 +1486,8 @@ class AdcircTest:
                     msg = f"Iteration mismatch in file {test_file}"
                     raise ValueError(msg)
 
-                passed_test = AdcircTest.__compare_datasets(
-                    control_result, test_result, tolerance
+                passed_test = AdcircTest.__compare_snaps(
+                    control_snap, test_snap, control_header, tolerance
                 )
                 if not passed_test:
                     passed = False
@@ -621,125 +1496,194 @@ class AdcircTest:
         return passed
 
     @staticmethod
-    def __get_adcirc_header(file: str) -> dict:
+    def __compare_ascii_outputs(
+        control: AsciiOutput,
+        test: AsciiOutput,
+        snap_count: int,
+        tolerance: float,
+        prefix: bool = False,
+    ) -> bool:
         """
-        Get the header information from an ADCIRC output file
+        Compare control and test ascii output files that are held in memory
 
         Args:
-            file: Name of the file
+            control: Control output file
+            test: Test output file
+            snap_count: Number of snaps to compare
+            tolerance: Tolerance for the comparison
+            prefix: Compare the test file against the leading snaps of the control file
 
         Returns:
-            Dictionary with the header information
+            True if the files match within spec, False otherwise
         """
-        import os
+        passed = True
 
-        if not os.path.exists(file):
-            msg = f"File {file} does not exist"
-            raise FileNotFoundError(msg)
+        for i in range(snap_count):
 
-        header = {}
-        with open(file, "r") as f:
-            _ = f.readline().strip()
-            header_line = f.readline().strip().split()
+            # A truncated run may write fewer snaps than its header reports
+            if prefix and i >= test.snap_count:
+                logger.info(f"Compared {i} leading snaps of file {test.filename}")
+                break
 
-            header["snap_count"] = int(header_line[0])
-            header["node_count"] = int(header_line[1])
-            header["output_time_interval"] = float(header_line[2])
-            header["output_time_step"] = int(header_line[3])
-            header["n_values"] = int(header_line[4])
+            if i >= test.snap_count or i >= control.snap_count:
+                msg = f"Output snap {i} missing in file {test.filename}"
+                raise ValueError(msg)
 
-            header3 = f.readline().strip().split()
-            if len(header3) == 2:
-                header["is_sparse"] = False
-            else:
-                header["is_sparse"] = True
+            if control.time(i) != test.time(i):
+                msg = f"Time mismatch in file {test.filename}"
+                raise ValueError(msg)
 
-        return header
+            if control.iteration(i) != test.iteration(i):
+                msg = f"Iteration mismatch in file {test.filename}"
+                raise ValueError(msg)
+
+            passed_test = AdcircTest.__compare_snaps(
+                control.snap(i), test.snap(i), control.header, tolerance
+            )
+            if not passed_test:
+                passed = False
+                logger.error(
+                    f"Test for file {test.filename} failed at output snap {i}"
+                )
+
+        return passed
 
     @staticmethod
-    def __read_adcirc_output_snap(
-        file_obj, header_obj: dict
-    ) -> Tuple[xr.Dataset, float, int]:
+    def __get_adcirc_header(file: str) -> dict:
         """
-        Read an ADCIRC output snap file
+        Get the header information from an ADCIRC output file
 
         Args:
-            file_obj: File object for the ADCIRC output file
-            header_obj: Header dictionary for the file
+            file: Name of the file
 
         Returns:
-            Tuple of (xarray dataset, time, iteration)
+            Dictionary with the header information
         """
-        if header_obj["is_sparse"]:
-            return AdcircTest.__read_adcirc_output_snap_sparse(file_obj, header_obj)
-        else:
-            return AdcircTest.__read_adcirc_output_snap_full(file_obj, header_obj)
+        return read_adcirc_header(file)
 
     @staticmethod
-    def __read_adcirc_output_snap_sparse(
-        file_obj, header: dict
-    ) -> Tuple[xr.Dataset, float, int]:
+    def __snap_dataset(values: np.ndarray) -> xr.Dataset:
         """
-        Read an ADCIRC output snap file with sparse data
+        Wrap the values of an output snap in a dataset for comparison
 
         Args:
-            file_obj: File object for the ADCIRC output file
-            header: Header dictionary for the file
+            values: Array of values with shape (node_count, n_values)
 
         Returns:
-            Tuple of (xarray dataset, time, iteration)
+            xarray dataset
         """
-        line = file_obj.readline().strip().split()
-        time = float(line[0])
-        iteration = int(line[1])
-        n_non_default = int(line[2])
-        fill_value = float(line[3])
-
         dataset = xr.Dataset()
-        v = np.full((header["node_count"], header["n_values"]), fill_value)
-        for i in range(n_non_default):
-            line = file_obj.readline().strip().split()
-            node = int(line[0]) - 1
-            for j in range(header["n_values"]):
-                v[node, j] = float(line[j + 1])
         dataset["v"] = xr.DataArray(
-            v,
+            values,
             dims=["node", "n_values"],
-            coords={"node": np.arange(header["node_count"])},
+            coords={"node": np.arange(values.shape[0])},
         )
-
-        return dataset, time, iteration
+        return dataset
 
     @staticmethod
-    def __read_adcirc_output_snap_full(
+    def __read_adcirc_output_snap(
         file_obj, header: dict
-    ) -> Tuple[xr.Dataset, float, int]:
+    ) -> Optional[Tuple[float, int, Union[np.ndarray, tuple]]]:
         """
-        Read an ADCIRC output snap file with full data
+        Read an ADCIRC output snap file
 
         Args:
             file_obj: File object for the ADCIRC output file
             header: Header dictionary for the file
 
         Returns:
-            Tuple of (xarray dataset, time, iteration)
+            Tuple of (time, iteration, snap), or None at the end of the file. The
+            snap is an array of values at every node for full files and a tuple of
+            (node indices, values, fill value) for sparse files.
         """
-        line = file_obj.readline().strip().split()
-        time = float(line[0])
-        iteration = int(line[1])
+        if header["is_sparse"]:
+            snap = read_sparse_snap(file_obj, header)
+            if snap is None:
+                return None
+            time, iteration, nodes, values, fill_value = snap
+            return time, iteration, (nodes, values, fill_value)
+        else:
+            return read_full_snap(file_obj, header)
 
-        dataset = xr.Dataset()
-        v = np.full((header["node_count"], header["n_values"]), np.nan)
-        for i in range(header["node_count"]):
-            line = file_obj.readline().strip().split()
-            for j in range(header["n_values"]):
-                v[i, j] = float(line[j])
-        dataset["v"] = xr.DataArray(
-            v,
-            dims=["node", "n_values"],
-            coords={"node": np.arange(header["node_count"])},
+    @staticmethod
+    def __compare_snaps(
+        control_snap: Union[np.ndarray, tuple],
+        test_snap: Union[np.ndarray, tuple],
+        header: dict,
+        tolerance: float,
+    ) -> bool:
+        """
+        Compare a control and test output snap. Sparse snaps are compared on the
+        nodes written to either snap without expanding them to every node.
+
+        Args:
+            control_snap: Control snap from __read_adcirc_output_snap
+            test_snap: Test snap from __read_adcirc_output_snap
+            header: Header dictionary for the files
+            tolerance: Tolerance for the comparison
+
+        Returns:
+            True if the snaps match within spec, False otherwise
+        """
+        if not header["is_sparse"]:
+            return AdcircTest.__compare_datasets(
+                AdcircTest.__snap_dataset(control_snap),
+                AdcircTest.__snap_dataset(test_snap),
+                tolerance,
+            )
+
+        passed, max_difference = compare_sparse_snap(
+            control_snap, test_snap, header["node_count"], tolerance
         )
-        return dataset, time, iteration
+        if not passed:
+            logger.error(
+                f"Error with tolerance {tolerance} and maximum difference: {max_difference}"
+            )
+        return passed
+
+    def compare_outputs(self, other: "AdcircTest") -> dict:
+        """
+        Compare the output files of this test with those of another run of the
+        same test, i.e. the same test run with a different build in another
+        sandbox. Each file is compared by checksum first and then numerically
+        with the tolerance of this test.
+
+        Args:
+            other: AdcircTest for the other run of the test
+
+        Returns:
+            Dictionary keyed by phase (coldstart, hotstart) of dictionaries mapping
+            each output file to "identical", "within_tolerance", "different" or
+            "missing" (not written by one of the runs)
+        """
+        import os
+
+        has_hotstart = self.__has_hotstart()
+        results = {}
+        for is_hotstart in [False, True] if has_hotstart else [False]:
+            this_directory = self.__get_test_directory(has_hotstart, is_hotstart)
+            other_directory = other.__get_test_directory(has_hotstart, is_hotstart)
+            phase_results = {}
+            for file in self.__test_yaml["output_files"]:
+                this_file = os.path.join(this_directory, file)
+                other_file = os.path.join(other_directory, file)
+                if not (os.path.exists(this_file) and os.path.exists(other_file)):
+                    phase_results[file] = "missing"
+                elif files_identical(
+                    this_file, other_file, self.ADCIRC_DROP_VARIABLES_LIST
+                ):
+                    phase_results[file] = "identical"
+                else:
+                    try:
+                        passed = self.__compare_files(
+                            this_file, other_file, self.__tolerance
+                        )
+                    except ValueError as e:
+                        logger.error(f"Outputs {this_file} and {other_file} differ: {e}")
+                        passed = False
+                    phase_results[file] = "within_tolerance" if passed else "different"
+            results[self.__get_phase_name(is_hotstart)] = phase_results
+        return results
 
     def plot(self, status: dict) -> None:
         """
@@ -751,20 +1695,29 @@ class AdcircTest:
         Returns:
             None
         """
-        if "hotstart" in self.__test_yaml and self.__test_yaml["hotstart"]:
+        if self.__has_hotstart():
             coldstart_directory = self.__get_test_directory(True, False)
             hotstart_directory = self.__get_test_directory(True, True)
             if status["coldstart"]["complete"]:
                 logger.info("Plotting cold-start results")
-                self.__plot_simulation(coldstart_directory)
+                with self.__profile_phase("coldstart_plot"):
+                    with HarnessMonitor() as harness:
+                        self.__plot_simulation(coldstart_directory)
+                self.__record_resources("coldstart", "plot", harness.summary())
             if status["coldstart"]["passed"] and status["hotstart"]["complete"]:
                 logger.info("Plotting hot-start results")
-                self.__plot_simulation(hotstart_directory)
+                with self.__profile_phase("hotstart_plot"):
+                    with HarnessMonitor() as harness:
+                        self.__plot_simulation(hotstart_directory)
+                self.__record_resources("hotstart", "plot", harness.summary())
         else:
             if status["coldstart"]["complete"]:
                 logger.info("Plotting test results")
                 test_directory = self.__get_test_directory(False, False)
-                self.__plot_simulation(test_directory)
+                with self.__profile_phase("coldstart_plot"):
+                    with HarnessMonitor() as harness:
+                        self.__plot_simulation(test_directory)
+                self.__record_resources("coldstart", "plot", harness.summary())
 
     def __plot_simulation(self, test_directory: str) -> None:
         """
@@ -776,10 +1729,15 @@ class AdcircTest:
         import os
 
         for file in self.__test_yaml["output_files"]:
-            if "max" in file or "min" in file:
+            control_file = find_output_file(os.path.join(test_directory, "control", file))
+            if control_file is None:
+                logger.info(f"No control data to plot for file: {file}")
+                continue
+            if self.is_peak_file(file):
+                if self.__smoke_fraction is not None:
+                    continue
                 mesh_file = os.path.join(test_directory, "fort.14")
                 test_file = os.path.join(test_directory, file)
-                control_file = os.path.join(test_directory, "control", file)
                 AdcircTest.plot_max_files(
                     self.__test,
                     mesh_file,
@@ -788,12 +1746,24 @@ class AdcircTest:
                     test_directory,
                     self.__is_geographic,
                     self.__is_global,
+                    session=self.__session,
+                    geometry_cache=self.__geometry_cache,
+                    renderer=self.__renderer,
+                    raster_resolution=self.__raster_resolution,
                 )
             elif "fort.61" in file or "fort.62" in file:
                 test_file = os.path.join(test_directory, file)
-                control_file = os.path.join(test_directory, "control", file)
                 AdcircTest.plot_station_files(
-                    self.__test, test_file, control_file, test_directory
+                    self.__test,
+                    test_file,
+                    control_file,
+                    test_directory,
+                    session=self.__session,
+                    mode=self.__station_plot_mode,
+                    workers=self.__plot_workers,
+                    tolerance=(
+                        self.__tolerance if self.__failing_stations_only else None
+                    ),
                 )
 
     @staticmethod
@@ -805,6 +1775,10 @@ class AdcircTest:
         output_directory: str,
         is_geographic: bool,
         is_global: bool,
+        session: Optional[OutputDataSession] = None,
+        geometry_cache: Optional[MeshGeometryCache] = None,
+        renderer: str = "contour",
+        raster_resolution: int = 1000,
     ) -> None:
         """
         Plot the maximum difference between two files
@@ -817,6 +1791,10 @@ class AdcircTest:
             output_directory: Directory to output the plots
             is_geographic: If the mesh is in geographic coordinates
             is_global: If the mesh is global
+            session: Session holding files that were already read (optional)
+            geometry_cache: Cache of the mesh geometry shared between plots (optional)
+            renderer: Draw the maps with filled contours (contour) or as images (raster)
+            raster_resolution: Number of pixels along the longest side of the raster images
 
         Returns:
             None
@@ -827,7 +1805,7 @@ class AdcircTest:
         logger.info(f"Plotting peak values for file: {test_file}")
 
         control_data, test_data, var = AdcircTest.__get_test_data(
-            mesh_file, control_file, test_file
+            mesh_file, control_file, test_file, session=session
         )
         max_diff = np.abs(test_data[var].to_numpy() - control_data[var].to_numpy())[
             0, :, 0
@@ -852,8 +1830,29 @@ class AdcircTest:
         plt.savefig(os.path.join(output_directory, f"max_value_{var}_histogram.png"))
         plt.close(fig)
 
-        x = control_data["x"].to_numpy()
-        y = control_data["y"].to_numpy()
+        if is_geographic:
+            projection = "robinson" if is_global else "mercator"
+        else:
+            projection = None
+        if geometry_cache is None:
+            geometry_cache = MeshGeometryCache()
+        geometry = geometry_cache.get(
+            mesh_file,
+            control_data["x"].to_numpy(),
+            control_data["y"].to_numpy(),
+            control_data["element"].to_numpy(),
+            projection,
+        )
+
+        if renderer not in RENDERERS:
+            msg = f"Unknown renderer: {renderer}"
+            raise ValueError(msg)
+        if renderer == "raster":
+            raster = geometry_cache.raster_weights(
+                mesh_file, geometry, projection, raster_resolution
+            )
+        else:
+            raster = None
 
         # Contour the data with symmetrical limits around the max difference
         diff = (
@@ -899,8 +1898,7 @@ class AdcircTest:
         if is_geographic:
             AdcircTest.__plot_maps_geographic(
                 test_name,
-                x,
-                y,
+                geometry,
                 test_data,
                 control_data,
                 diff,
@@ -911,13 +1909,13 @@ class AdcircTest:
                 diff_ticks,
                 output_directory,
                 is_global,
+                raster,
             )
         else:
             AdcircTest.__plot_data_cartesian(
                 test_name,
                 var,
-                x,
-                y,
+                geometry,
                 test_data,
                 control_data,
                 diff,
@@ -926,14 +1924,63 @@ class AdcircTest:
                 diff_contour_levels,
                 diff_ticks,
                 output_directory,
+                raster,
             )
 
+    @staticmethod
+    def __draw_raster(
+        ax,
+        raster: RasterWeights,
+        field: np.ndarray,
+        levels: np.ndarray,
+        cmap: str,
+        extend: str,
+        alpha: Optional[float] = None,
+        transform=None,
+    ):
+        """
+        Draw a nodal field as an image with the same color bands as the filled contours
+
+        Args:
+            ax: Axes to draw on
+            raster: Raster interpolation weights of the mesh
+            field: Value at each node
+            levels: Contour levels
+            cmap: Name of the colormap
+            extend: Color values outside of the levels (both) or leave them blank (neither)
+            alpha: Transparency of the image (optional)
+            transform: Projection of the image for map axes (optional)
+
+        Returns:
+            Image drawn
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import BoundaryNorm
+
+        image = raster.render(field)
+        if extend == "neither":
+            image[(image < levels[0]) | (image > levels[-1])] = np.nan
+
+        colormap = plt.get_cmap(cmap)
+        norm = BoundaryNorm(levels, colormap.N, extend=extend)
+
+        kwargs = {} if transform is None else {"transform": transform}
+        return ax.imshow(
+            np.ma.masked_invalid(image),
+            origin="lower",
+            extent=raster.extent,
+            cmap=colormap,
+            norm=norm,
+            alpha=alpha,
+            interpolation="nearest",
+            **kwargs,
+        )
+
     @staticmethod
     def __plot_data_cartesian(
         test_name: str,
         var: str,
-        x: np.ndarray,
-        y: np.ndarray,
+        geometry: MeshGeometry,
         test_data: xr.Dataset,
         control_data: xr.Dataset,
         diff: np.ndarray,
@@ -942,6 +1989,7 @@ class AdcircTest:
         diff_contour_levels: np.ndarray,
         diff_ticks: np.ndarray,
         output_directory: str,
+        raster: Optional[RasterWeights] = None,
     ):
         """
         Plot the data in cartesian coordinates
@@ -949,8 +1997,7 @@ class AdcircTest:
         Args:
             test_name: Name of the test
             var: Variable to plot
-            x: X coordinates
-            y: Y coordinates
+            geometry: Geometry of the mesh
             test_data: Test data
             control_data: Control data
             diff: Difference between test and control data
@@ -959,6 +2006,7 @@ class AdcircTest:
             diff_contour_levels: Contour levels for the difference
             diff_ticks: Contour ticks for the difference
             output_directory: Output directory for the plots
+            raster: Draw the data as images with these weights instead of contours (optional)
 
         Returns:
             None
@@ -968,7 +2016,7 @@ class AdcircTest:
 
         fig, ax = plt.subplots()
         ax.set_aspect("equal")
-        tri = Triangulation(x, y, control_data["element"] - 1)
+        tri = geometry.triangulation()
         percentile_95 = np.nanpercentile(np.abs(diff), 95)
         min_5 = np.nanpercentile(test_data[var].to_numpy()[0, :, 0], 5)
         max_95 = np.nanpercentile(test_data[var].to_numpy()[0, :, 0], 95)
@@ -983,18 +2031,23 @@ class AdcircTest:
         else:
             alpha = 1.0
 
-        # ... Generate a mask for the nan values
-        tri_masked = AdcircTest.get_masked_triangulation(tri, diff)
-        diff_contour = ax.tricontourf(
-            tri_masked,
-            diff,
-            cmap="bwr",
-            extend="both",
-            levels=diff_contour_levels,
-            alpha=alpha,
-            vmin=-percentile_95,
-            vmax=percentile_95,
-        )
+        if raster is not None:
+            diff_contour = AdcircTest.__draw_raster(
+                ax, raster, diff, diff_contour_levels, "bwr", "both", alpha
+            )
+        else:
+            # ... Generate a mask for the nan values
+            tri_masked = AdcircTest.get_masked_triangulation(tri, diff)
+            diff_contour = ax.tricontourf(
+                tri_masked,
+                diff,
+                cmap="bwr",
+                extend="both",
+                levels=diff_contour_levels,
+                alpha=alpha,
+                vmin=-percentile_95,
+                vmax=percentile_95,
+            )
         ax.set_xlabel("X")
         ax.set_ylabel("Y")
         ax.grid(True)
@@ -1009,18 +2062,29 @@ class AdcircTest:
         # Plot the test data
         fig, ax = plt.subplots()
         ax.set_aspect("equal")
-        tri_masked = AdcircTest.get_masked_triangulation(
-            tri, test_data[var].to_numpy()[0, :, 0]
-        )
-        contour = ax.tricontourf(
-            tri_masked,
-            test_data[var].to_numpy()[0, :, 0],
-            cmap="viridis",
-            levels=contour_levels,
-            alpha=alpha,
-            vmin=min_5,
-            vmax=max_95,
-        )
+        if raster is not None:
+            contour = AdcircTest.__draw_raster(
+                ax,
+                raster,
+                test_data[var].to_numpy()[0, :, 0],
+                contour_levels,
+                "viridis",
+                "neither",
+                alpha,
+            )
+        else:
+            tri_masked = AdcircTest.get_masked_triangulation(
+                tri, test_data[var].to_numpy()[0, :, 0]
+            )
+            contour = ax.tricontourf(
+                tri_masked,
+                test_data[var].to_numpy()[0, :, 0],
+                cmap="viridis",
+                levels=contour_levels,
+                alpha=alpha,
+                vmin=min_5,
+                vmax=max_95,
+            )
         ax.set_xlabel("X")
         ax.set_ylabel("Y")
         ax.grid(True)
@@ -1037,8 +2101,7 @@ class AdcircTest:
     @staticmethod
     def __plot_maps_geographic(
         test_name: str,
-        x: np.ndarray,
-        y: np.ndarray,
+        geometry: MeshGeometry,
         test_data: xr.Dataset,
         control_data: xr.Dataset,
         diff: np.ndarray,
@@ -1049,14 +2112,14 @@ class AdcircTest:
         diff_ticks: np.ndarray,
         output_directory: str,
         is_global: bool,
+        raster: Optional[RasterWeights] = None,
     ):
         """
         Plot the data on a map
 
         Args:
             test_name: Name of the test
-            x: X coordinates
-            y: Y coordinates
+            geometry: Geometry of the mesh in the map projection
             test_data: Test data
             control_data: Control data
             diff: Difference between test and control data
@@ -1067,52 +2130,37 @@ class AdcircTest:
             diff_ticks: Contour ticks for the difference
             output_directory: Output directory for the plots
             is_global: If the mesh is global
+            raster: Draw the data as images with these weights instead of contours (optional)
 
         Returns:
             None
         """
         import os
         import matplotlib.pyplot as plt
-        from matplotlib.tri import Triangulation
 
-        x_min = np.nanmin(test_data["x"].to_numpy())
-        x_max = np.nanmax(test_data["x"].to_numpy())
-        y_min = np.nanmin(test_data["y"].to_numpy())
-        y_max = np.nanmax(test_data["y"].to_numpy())
+        x_min, x_max, y_min, y_max = geometry.extent
 
         if is_global:
-            x_p, y_p = ccrs.Robinson().transform_points(
-                ccrs.PlateCarree(), x, y
-            )[:, :2].T
             fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.Robinson()})
-            mask = ~np.all(
-                np.abs(
-                    np.diff(
-                        x[control_data["element"] - 1],
-                        axis=1,
-                    )
-                )
-                < 90,
-                axis=1,
-            )
         else:
-            x_p, y_p = ccrs.Mercator().transform_points(
-                ccrs.PlateCarree(), x, y
-            )[:, :2].T
             fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.Mercator()})
-            mask = None
 
-        tri = Triangulation(x_p, y_p, control_data["element"] - 1,mask=mask)
+        tri = geometry.triangulation()
 
         ax.set_extent([x_min, x_max, y_min, y_max], crs=ccrs.PlateCarree())
-        tri_masked = AdcircTest.get_masked_triangulation(tri, diff)
-        contour = ax.tricontourf(
-            tri_masked,
-            diff,
-            levels=diff_contour_levels,
-            cmap="bwr",
-            extend="both"
-        )
+        if raster is not None:
+            contour = AdcircTest.__draw_raster(
+                ax, raster, diff, diff_contour_levels, "bwr", "both", transform=ax.projection
+            )
+        else:
+            tri_masked = AdcircTest.get_masked_triangulation(tri, diff)
+            contour = ax.tricontourf(
+                tri_masked,
+                diff,
+                levels=diff_contour_levels,
+                cmap="bwr",
+                extend="both"
+            )
         cbar = plt.colorbar(
             contour, orientation="vertical", ax=ax, ticks=diff_ticks
         )
@@ -1130,6 +2178,7 @@ class AdcircTest:
             dpi=300,
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         if is_global:
             fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.Robinson()})
@@ -1137,13 +2186,24 @@ class AdcircTest:
             fig, ax = plt.subplots(figsize=(10, 8), subplot_kw={'projection': ccrs.Mercator()})
             ax.set_extent([x_min, x_max, y_min, y_max], crs=ccrs.PlateCarree())
 
-        tri_masked = AdcircTest.get_masked_triangulation(tri, test_data[var].to_numpy()[0, :, 0])
-        contour = ax.tricontourf(tri_masked,
-                                 test_data[var].to_numpy()[0, :, 0],
-                                 levels=contour_levels,
-                                 cmap="viridis",
-                                 extend="both"
-        )
+        if raster is not None:
+            contour = AdcircTest.__draw_raster(
+                ax,
+                raster,
+                test_data[var].to_numpy()[0, :, 0],
+                contour_levels,
+                "viridis",
+                "both",
+                transform=ax.projection,
+            )
+        else:
+            tri_masked = AdcircTest.get_masked_triangulation(tri, test_data[var].to_numpy()[0, :, 0])
+            contour = ax.tricontourf(tri_masked,
+                                     test_data[var].to_numpy()[0, :, 0],
+                                     levels=contour_levels,
+                                     cmap="viridis",
+                                     extend="both"
+            )
         cbar = fig.colorbar(
             contour,
             orientation="vertical",
@@ -1167,7 +2227,14 @@ class AdcircTest:
 
     @staticmethod
     def plot_station_files(
-        test_name: str, test_file: str, control_file: str, output_directory: str
+        test_name: str,
+        test_file: str,
+        control_file: str,
+        output_directory: str,
+        session: Optional[OutputDataSession] = None,
+        mode: str = "individual",
+        workers: int = 1,
+        tolerance: Optional[float] = None,
     ) -> None:
         """
         Plot the station files for the test and control
@@ -1177,13 +2244,15 @@ class AdcircTest:
             test_file: Name of the test file
             control_file: Name of the control file
             output_directory: Path to the output directory
+            session: Session holding files that were already read (optional)
+            mode: Station plot mode (individual, pages, pdf)
+            workers: Number of processes used to render the plots
+            tolerance: Only plot the stations that differ by more than this
+                tolerance (optional)
 
         Returns:
             None
         """
-        import os
-        import matplotlib.pyplot as plt
-
         logger.info(f"Plotting station data for file: {test_file}")
 
         control_data, test_data, var = AdcircTest.__get_test_data(
@@ -1191,45 +2260,39 @@ class AdcircTest:
             control_file,
             test_file,
             timeseries=True,
+            session=session,
         )
 
         control_time = control_data["time"].to_numpy() / 86400.0
         test_time = test_data["time"].to_numpy() / 86400.0
 
-        for i in range(control_data["node"].size):
+        if var == "u-vel":
+            var_name = "uv_mag"
+        else:
+            var_name = var
 
-            if var == "u-vel":
-                var_name = "uv_mag"
-            else:
-                var_name = var
+        control_values = station_magnitudes(control_data[var].to_numpy())
+        test_values = station_magnitudes(test_data[var].to_numpy())
 
-            if control_data[var].shape[2] == 2:
-                control_var = np.sqrt(
-                    control_data[var][:, i, 0].to_numpy() ** 2
-                    + control_data[var][:, i, 1].to_numpy() ** 2
-                )
-                test_var = np.sqrt(
-                    test_data[var][:, i, 0].to_numpy() ** 2
-                    + test_data[var][:, i, 1].to_numpy() ** 2
-                )
-            else:
-                control_var = control_data[var][:, i, 0].to_numpy()
-                test_var = test_data[var][:, i, 0].to_numpy()
-
-            fig, ax = plt.subplots()
-            ax.plot(control_time, control_var, label="Control")
-            ax.plot(test_time, test_var, label="Test")
-            ax.set_xlabel("Time (days)")
-            ax.set_ylabel(var_name)
-            ax.grid(True)
-            ax.legend()
-            ax.set_title(f"Station {i}, {var_name}, Test: {test_name}")
-            plt.savefig(
-                os.path.join(output_directory, f"station_{i}_{var_name}.png"),
-                dpi=300,
-                bbox_inches="tight",
+        stations = None
+        if tolerance is not None:
+            stations = failing_stations(control_values, test_values, tolerance)
+            logger.info(
+                f"{len(stations)} of {control_values.shape[1]} stations differ by more than {tolerance}"
             )
-            plt.close(fig)
+
+        plot_stations(
+            test_name,
+            var_name,
+            control_time,
+            control_values,
+            test_time,
+            test_values,
+            output_directory,
+            mode=mode,
+            stations=stations,
+            workers=workers,
+        )
 
     @staticmethod
     def __get_test_data(
@@ -1237,6 +2300,7 @@ class AdcircTest:
         control_file: str,
         test_file: str,
         timeseries: bool = False,
+        session: Optional[OutputDataSession] = None,
     ) -> Tuple[xr.Dataset, xr.Dataset, str]:
         """
         Get the test data for the control and test files
@@ -1246,22 +2310,26 @@ class AdcircTest:
             control_file: Control file
             test_file: Test file
             timeseries: If the files are time series
+            session: Session holding files that were already read (optional)
 
         Returns:
             Tuple of (control data, test data, variable)
         """
+        if session is None:
+            session = OutputDataSession(AdcircTest.ADCIRC_DROP_VARIABLES_LIST)
+
         var = AdcircTest.__get_adcirc_variable(test_file)
         if test_file.endswith(".nc"):
-            test_data = AdcircTest.__get_netcdf_data(test_file, var)
+            test_data = AdcircTest.__get_netcdf_data(test_file, var, session)
         else:
             test_data = AdcircTest.__get_ascii_data(
-                mesh_file, test_file, var, timeseries
+                mesh_file, test_file, var, timeseries, session
             )
         if control_file.endswith(".nc"):
-            control_data = AdcircTest.__get_netcdf_data(control_file, var)
+            control_data = AdcircTest.__get_netcdf_data(control_file, var, session)
         else:
             control_data = AdcircTest.__get_ascii_data(
-                mesh_file, control_file, var, timeseries
+                mesh_file, control_file, var, timeseries, session
             )
         return control_data, test_data, var
 
@@ -1298,22 +2366,21 @@ class AdcircTest:
         return var
 
     @staticmethod
-    def __get_netcdf_data(file: str, variable: str) -> xr.Dataset:
+    def __get_netcdf_data(
+        file: str, variable: str, session: OutputDataSession
+    ) -> xr.Dataset:
         """
         Get the data from a netcdf ADCIRC output file
 
         Args:
             file: Name of the file
             variable: Variable to extract
+            session: Session used to read and hold the file
 
         Returns:
             xarray dataset
         """
-        temp_dataset = xr.open_dataset(
-            file,
-            drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST,
-            decode_times=False,
-        )
+        temp_dataset = session.netcdf_dataset(file)
 
         dataset = xr.Dataset(
             {
@@ -1354,7 +2421,11 @@ class AdcircTest:
 
     @staticmethod
     def __get_ascii_data(
-        mesh_file: str, file: str, variable: str, timeseries: bool
+        mesh_file: str,
+        file: str,
+        variable: str,
+        timeseries: bool,
+        session: OutputDataSession,
     ) -> xr.Dataset:
         """
         Get the data from an ascii ADCIRC output file
@@ -1364,75 +2435,26 @@ class AdcircTest:
             file: Name of the file
             variable: Variable name
             timeseries: If the file is a time series
+            session: Session used to read and hold the file
 
         Returns:
             xarray dataset
         """
+        output = session.ascii_output(file)
+        header = output.header
 
         if mesh_file is not None:
-            with open(mesh_file, "r") as f:
-                _ = f.readline()
-                header = f.readline().strip().split()
-                node_count = int(header[1])
-                element_count = int(header[0])
-                nodes = np.zeros((node_count, 3))
-                elements = np.zeros((element_count, 3))
-                for i in range(node_count):
-                    line = f.readline().strip().split()
-                    nodes[i, 0] = float(line[1])
-                    nodes[i, 1] = float(line[2])
-                    nodes[i, 2] = float(line[3])
-
-                for i in range(element_count):
-                    line = f.readline().strip().split()
-                    elements[i, 0] = int(line[2])
-                    elements[i, 1] = int(line[3])
-                    elements[i, 2] = int(line[4])
-
-        header = AdcircTest.__get_adcirc_header(file)
-
-        if mesh_file and header["node_count"] != node_count:
-            msg = f"Node count mismatch in file {file}"
-            raise ValueError(msg)
-
-        dataset = xr.Dataset()
+            nodes, elements = session.mesh(mesh_file)
+            if header["node_count"] != nodes.shape[0]:
+                msg = f"Node count mismatch in file {file}"
+                raise ValueError(msg)
 
         if timeseries:
             snap_count = header["snap_count"]
         else:
             snap_count = 1
 
-        with open(file, "r") as f:
-            _ = f.readline()
-            _ = f.readline()
-            data = np.full(
-                (snap_count, header["node_count"], header["n_values"]), np.nan
-            )
-            time_data = np.zeros(snap_count)
-            if header["is_sparse"]:
-                for t in range(snap_count):
-                    line = f.readline().strip().split()
-                    n_non_default = int(line[2])
-                    fill_value = float(line[3])
-                    for i in range(n_non_default):
-                        line = f.readline().strip().split()
-                        node = int(line[0])
-                        for j in range(header["n_values"]):
-                            val = float(line[j + 1])
-                            if val <= fill_value:
-                                val = np.nan
-                            data[t, node, j] = val
-            else:
-                for t in range(snap_count):
-                    line = f.readline().strip().split()
-                    time_data[t] = float(line[0])
-                    for i in range(header["node_count"]):
-                        line = f.readline().strip().split()
-                        for j in range(header["n_values"]):
-                            val = float(line[j + 1])
-                            if val < -999.0:
-                                val = np.nan
-                            data[t, i, j] = val
+        dataset = xr.Dataset()
 
         if mesh_file is not None:
             dataset["x"] = xr.DataArray(nodes[:, 0], dims=["node"])
@@ -1441,11 +2463,11 @@ class AdcircTest:
             dataset["element"] = xr.DataArray(elements, dims=["element", "nvertex"])
 
         dataset[variable] = xr.DataArray(
-            data,
+            output.masked_data(snap_count),
             dims=["time", "node", "n_values"],
             coords={"time": np.arange(snap_count)},
         )
-        dataset["time"] = xr.DataArray(time_data, dims=["time"])
+        dataset["time"] = xr.DataArray(output.times(snap_count), dims=["time"])
 
         return dataset
 
@@ -1461,10 +2483,8 @@ class AdcircTest:
         Returns:
             Masked triangulation
         """
-        masked_nodes = np.where(np.isnan(data))[0]
-        mask = np.full(t.triangles.shape[0], False)
-        for i in range(t.triangles.shape[0]):
-            if np.any(np.isin(t.triangles[i, :], masked_nodes)):
-                mask[i] = True
+        mask = np.any(np.isnan(data)[t.triangles], axis=1)
+        if t.mask is not None:
+            mask |= t.mask
         return Triangulation(t.x, t.y, t.triangles, mask=mask)
 
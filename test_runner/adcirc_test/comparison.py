@@ -0,0 +1,379 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Relative tolerance used with the absolute tolerance (numpy.testing.assert_allclose default)
+RELATIVE_TOLERANCE = 1e-7
+
+# Number of checksums remembered, the least recently used are dropped so that
+# long-lived processes (i.e. the harness daemon) do not grow without bound
+CHECKSUM_CACHE_SIZE = 4096
+
+_checksums: "OrderedDict[tuple, object]" = OrderedDict()
+
+
+def _checksum_key(filename: str, *extra) -> tuple:
+    """
+    Get the key used to remember the checksums of a file. The key changes when
+    the size or modification time of the file does.
+
+    Args:
+        filename: Name of the file
+        extra: Additional parts of the key
+
+    Returns:
+        Key tuple
+    """
+    import os
+
+    stat = os.stat(filename)
+    return (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns) + extra
+
+
+def _cached_checksum(key: tuple) -> Optional[object]:
+    """
+    Get a remembered checksum, marking it as recently used
+
+    Args:
+        key: Key from _checksum_key
+
+    Returns:
+        The checksum, or None if it is not remembered
+    """
+    if key not in _checksums:
+        return None
+    _checksums.move_to_end(key)
+    return _checksums[key]
+
+
+def _remember_checksum(key: tuple, checksum: object) -> None:
+    """
+    Remember a checksum, dropping the least recently used beyond CHECKSUM_CACHE_SIZE
+
+    Args:
+        key: Key from _checksum_key
+        checksum: Checksum of the file
+    """
+    _checksums[key] = checksum
+    _checksums.move_to_end(key)
+    while len(_checksums) > CHECKSUM_CACHE_SIZE:
+        _checksums.popitem(last=False)
+
+
+def _sparse_union(
+    control: Tuple[np.ndarray, np.ndarray, float],
+    test: Tuple[np.ndarray, np.ndarray, float],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Expand two sparse output snaps to the union of the nodes written to either
+    snap. A node missing from one snap takes the fill value of that snap.
+
+    Args:
+        control: Tuple of (zero based node indices, values, fill value) for the control
+        test: Tuple of (zero based node indices, values, fill value) for the test
+
+    Returns:
+        Tuple of (union of the node indices, control values, test values)
+    """
+    control_nodes, control_values, control_fill = control
+    test_nodes, test_values, test_fill = test
+
+    nodes = np.union1d(control_nodes, test_nodes)
+    n_values = control_values.shape[1] if control_values.ndim == 2 else 1
+
+    control_union = np.full((nodes.size, n_values), control_fill)
+    control_union[np.searchsorted(nodes, control_nodes), :] = control_values
+    test_union = np.full((nodes.size, n_values), test_fill)
+    test_union[np.searchsorted(nodes, test_nodes), :] = test_values
+    return nodes, control_union, test_union
+
+
+def compare_sparse_snap(
+    control: Tuple[np.ndarray, np.ndarray, float],
+    test: Tuple[np.ndarray, np.ndarray, float],
+    node_count: int,
+    tolerance: float,
+) -> Tuple[bool, float]:
+    """
+    Compare two sparse output snaps without expanding them to every node
+
+    The snaps are compared as if they were dense: a node missing from one snap
+    takes the fill value of that snap. Only the union of the nodes written to
+    either snap is allocated. Nodes written to neither snap compare the two fill
+    values.
+
+    Args:
+        control: Tuple of (zero based node indices, values, fill value) for the control
+        test: Tuple of (zero based node indices, values, fill value) for the test
+        node_count: Number of nodes in the mesh
+        tolerance: Absolute tolerance for the comparison
+
+    Returns:
+        Tuple of (True if the snaps match within tolerance, maximum difference)
+    """
+    control_nodes, _, control_fill = control
+    test_nodes, _, test_fill = test
+    nodes, control_union, test_union = _sparse_union(control, test)
+
+    passed = bool(
+        np.all(
+            np.isclose(
+                control_union,
+                test_union,
+                rtol=RELATIVE_TOLERANCE,
+                atol=tolerance,
+                equal_nan=True,
+            )
+        )
+    )
+
+    # Nodes written to neither snap hold the fill values
+    fill_compared = nodes.size < node_count
+    if fill_compared and not np.isclose(
+        control_fill,
+        test_fill,
+        rtol=RELATIVE_TOLERANCE,
+        atol=tolerance,
+        equal_nan=True,
+    ):
+        passed = False
+
+    if passed:
+        return True, 0.0
+
+    with np.errstate(invalid="ignore"):
+        differences = np.abs(control_union - test_union)
+    max_difference = float(np.nanmax(differences)) if differences.size else 0.0
+    if fill_compared:
+        max_difference = max(max_difference, abs(control_fill - test_fill))
+
+    only_control = np.setdiff1d(control_nodes, test_nodes, assume_unique=True).size
+    only_test = np.setdiff1d(test_nodes, control_nodes, assume_unique=True).size
+    if only_control or only_test:
+        logger.info(
+            f"Sparse node sets differ: {only_control} nodes only in the control, "
+            f"{only_test} nodes only in the test"
+        )
+
+    return False, max_difference
+
+
+def file_checksum(filename: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Get the blake2b checksum of a file, reading it in chunks. Compressed files
+    are hashed by their decompressed content. The checksum is remembered as long
+    as the size and modification time of the file do not change.
+
+    Args:
+        filename: Name of the file
+        chunk_size: Number of bytes read at a time
+
+    Returns:
+        Hex digest of the file
+    """
+    import hashlib
+
+    from .compression import open_binary
+
+    key = _checksum_key(filename, "file")
+    checksum = _cached_checksum(key)
+    if checksum is None:
+        digest = hashlib.blake2b()
+        with open_binary(filename) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        checksum = digest.hexdigest()
+        _remember_checksum(key, checksum)
+    return checksum
+
+
+def netcdf_checksums(
+    filename: str, drop_variables: List[str], block_size: int = 64 * 1024 * 1024
+) -> Dict[str, str]:
+    """
+    Get the blake2b checksum of the raw data of each variable in a netcdf file.
+    Attributes (i.e. the creation date and history) are not included, so files
+    written by different runs with identical data have identical checksums. The
+    checksums are remembered as long as the file does not change.
+
+    Args:
+        filename: Name of the file
+        drop_variables: Variables that are not checked
+        block_size: Approximate number of bytes read at a time
+
+    Returns:
+        Dictionary of hex digests keyed by variable name
+    """
+    import hashlib
+
+    import xarray as xr
+
+    key = _checksum_key(filename, "netcdf", tuple(drop_variables))
+    cached = _cached_checksum(key)
+    if cached is not None:
+        return cached
+
+    checksums = {}
+    with xr.open_dataset(
+        filename, drop_variables=drop_variables, decode_cf=False, decode_times=False
+    ) as dataset:
+        for name, variable in dataset.variables.items():
+            digest = hashlib.blake2b()
+            digest.update(f"{variable.dtype.str}{variable.shape}".encode())
+            if variable.ndim == 0:
+                digest.update(np.ascontiguousarray(variable.values).tobytes())
+            else:
+                row_bytes = variable.dtype.itemsize * variable.size // max(
+                    1, variable.shape[0]
+                )
+                rows = max(1, block_size // max(1, row_bytes))
+                for start in range(0, variable.shape[0], rows):
+                    block = variable[start : start + rows].values
+                    digest.update(np.ascontiguousarray(block).tobytes())
+            checksums[name] = digest.hexdigest()
+    _remember_checksum(key, checksums)
+    return checksums
+
+
+def files_identical(control_file: str, test_file: str, drop_variables: List[str]) -> bool:
+    """
+    Check if the data in two output files is bit-identical
+
+    Ascii files are compared by size (unless one is compressed) and then by
+    checksum of the decompressed content. Netcdf files are
+    compared by the checksums of the raw data of each variable in the control
+    file, ignoring attributes.
+
+    Args:
+        control_file: Name of the control file
+        test_file: Name of the test file
+        drop_variables: Netcdf variables that are not checked
+
+    Returns:
+        True if the data is bit-identical, False otherwise
+    """
+    import os
+
+    from .compression import is_compressed
+
+    if control_file.endswith(".nc") and test_file.endswith(".nc"):
+        control = netcdf_checksums(control_file, drop_variables)
+        test = netcdf_checksums(test_file, drop_variables)
+        return all(test.get(name) == checksum for name, checksum in control.items())
+
+    compressed = is_compressed(control_file) or is_compressed(test_file)
+    if not compressed and os.path.getsize(control_file) != os.path.getsize(test_file):
+        return False
+    return file_checksum(control_file) == file_checksum(test_file)
+
+
+def _array_difference(control: np.ndarray, test: np.ndarray) -> float:
+    """
+    Get the maximum absolute difference between two arrays of the same shape.
+    Values that are nan in only one of the arrays count as an infinite difference.
+
+    Args:
+        control: Control values
+        test: Test values
+
+    Returns:
+        Maximum absolute difference
+    """
+    control = np.asarray(control, dtype=float)
+    test = np.asarray(test, dtype=float)
+    if not control.size:
+        return 0.0
+    control_nan = np.isnan(control)
+    if np.any(control_nan != np.isnan(test)):
+        return float("inf")
+    if np.all(control_nan):
+        return 0.0
+    return float(np.nanmax(np.abs(control - test)))
+
+
+def _sparse_snap_difference(
+    control: Tuple[np.ndarray, np.ndarray, float],
+    test: Tuple[np.ndarray, np.ndarray, float],
+    node_count: int,
+) -> float:
+    """
+    Get the maximum absolute difference between two sparse output snaps, compared
+    as if they were dense (see compare_sparse_snap)
+
+    Args:
+        control: Tuple of (zero based node indices, values, fill value) for the control
+        test: Tuple of (zero based node indices, values, fill value) for the test
+        node_count: Number of nodes in the mesh
+
+    Returns:
+        Maximum absolute difference
+    """
+    nodes, control_union, test_union = _sparse_union(control, test)
+    difference = _array_difference(control_union, test_union)
+
+    # Nodes written to neither snap hold the fill values
+    if nodes.size < node_count:
+        difference = max(difference, _array_difference([control[2]], [test[2]]))
+    return difference
+
+
+def max_difference(
+    control_file: str, test_file: str, drop_variables: List[str]
+) -> Optional[float]:
+    """
+    Get the maximum absolute difference between the values of two output files,
+    over every snap and numeric variable. The files are compared the same way as
+    by the tests, so the result can be held against a tolerance.
+
+    Args:
+        control_file: Name of the control file
+        test_file: Name of the test file
+        drop_variables: Netcdf variables that are not compared
+
+    Returns:
+        Maximum absolute difference, or None when the files cannot be compared
+        value by value (i.e. their headers, snap times or variables differ)
+    """
+    if control_file.endswith(".nc") and test_file.endswith(".nc"):
+        import xarray as xr
+
+        difference = 0.0
+        with xr.open_dataset(
+            control_file, drop_variables=drop_variables, decode_times=False
+        ) as control, xr.open_dataset(
+            test_file, drop_variables=drop_variables, decode_times=False
+        ) as test:
+            for name in control.variables:
+                if control[name].dtype.kind not in "fi" or "time_of" in name:
+                    continue
+                if name not in test.variables or control[name].shape != test[name].shape:
+                    return None
+                difference = max(
+                    difference,
+                    _array_difference(control[name].to_numpy(), test[name].to_numpy()),
+                )
+        return difference
+
+    from .session import AsciiOutput
+
+    control = AsciiOutput(control_file)
+    test = AsciiOutput(test_file)
+    if control.header != test.header or control.snap_count != test.snap_count:
+        return None
+
+    difference = 0.0
+    for i in range(control.snap_count):
+        if control.time(i) != test.time(i) or control.iteration(i) != test.iteration(i):
+            return None
+        if control.header["is_sparse"]:
+            snap_difference = _sparse_snap_difference(
+                control.snap(i), test.snap(i), control.header["node_count"]
+            )
+        else:
+            snap_difference = _array_difference(control.snap(i), test.snap(i))
+        difference = max(difference, snap_difference)
+    return difference
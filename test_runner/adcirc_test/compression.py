@@ -0,0 +1,227 @@
+import logging
+from typing import IO, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Suffixes of compressed ascii output files, in the order they are searched
+COMPRESSED_SUFFIXES = [".zst", ".gz"]
+
+# Compression formats for ascii output files and their suffixes
+COMPRESSION_FORMATS = {"zst": ".zst", "gz": ".gz"}
+
+
+def is_compressed(filename: str) -> bool:
+    """
+    Check if a file is a compressed ascii output file
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        True if the file is compressed
+    """
+    return any(filename.endswith(suffix) for suffix in COMPRESSED_SUFFIXES)
+
+
+def uncompressed_name(filename: str) -> str:
+    """
+    Get the name of a file without its compression suffix
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        Name of the uncompressed file
+    """
+    for suffix in COMPRESSED_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[: -len(suffix)]
+    return filename
+
+
+def find_output_file(filename: str) -> Optional[str]:
+    """
+    Find an output file that may be stored compressed, i.e. a control file
+    stored as fort.63.zst
+
+    Args:
+        filename: Name of the uncompressed file
+
+    Returns:
+        Name of the file found (uncompressed first), or None if there is none
+    """
+    import os
+
+    for candidate in [filename] + [filename + s for s in COMPRESSED_SUFFIXES]:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _zstandard():
+    """
+    Import the optional zstandard module
+
+    Returns:
+        zstandard module
+    """
+    try:
+        import zstandard
+    except ImportError as e:
+        msg = "The zstandard package is required for zstd compressed output files"
+        raise ImportError(msg) from e
+    return zstandard
+
+
+def open_binary(filename: str) -> IO[bytes]:
+    """
+    Open a file that may be compressed for streaming binary reads. Compressed
+    files are decompressed as they are read, without temporary files.
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        Binary file object
+    """
+    import gzip
+
+    if filename.endswith(".zst"):
+        return _zstandard().ZstdDecompressor().stream_reader(
+            open(filename, "rb"), closefd=True  # noqa: SIM115
+        )
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rb")
+    return open(filename, "rb")  # noqa: SIM115
+
+
+def open_text(filename: str) -> IO[str]:
+    """
+    Open a file that may be compressed for streaming text reads. The stream can
+    only be read forwards.
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        Text file object
+    """
+    import io
+
+    if is_compressed(filename):
+        return io.TextIOWrapper(io.BufferedReader(open_binary(filename)), newline=None)
+    return open(filename, "r")  # noqa: SIM115
+
+
+def compress_file(filename: str, compression: str, level: Optional[int] = None) -> str:
+    """
+    Compress an ascii output file, streaming it to <filename>.<suffix>. The
+    original file is kept.
+
+    Args:
+        filename: Name of the file
+        compression: Compression format (zst, gz)
+        level: Compression level (default: the library default)
+
+    Returns:
+        Name of the compressed file
+    """
+    import gzip
+    import os
+    import shutil
+
+    if compression not in COMPRESSION_FORMATS:
+        msg = f"Unknown compression format: {compression}"
+        raise ValueError(msg)
+
+    output_file = filename + COMPRESSION_FORMATS[compression]
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(filename, "rb") as source, open(temp_file, "wb") as destination:
+        if compression == "zst":
+            zstandard = _zstandard()
+            compressor = zstandard.ZstdCompressor(
+                level=level if level is not None else 19, threads=-1
+            )
+            compressor.copy_stream(source, destination)
+        else:
+            with gzip.GzipFile(
+                fileobj=destination,
+                mode="wb",
+                compresslevel=level if level is not None else 9,
+                mtime=0,
+            ) as compressed:
+                shutil.copyfileobj(source, compressed, 1024 * 1024)
+    os.replace(temp_file, output_file)
+    return output_file
+
+
+def decompress_file(filename: str) -> str:
+    """
+    Decompress a compressed ascii output file, streaming it to the name without
+    the compression suffix. The compressed file is kept.
+
+    Args:
+        filename: Name of the compressed file
+
+    Returns:
+        Name of the decompressed file
+    """
+    import os
+    import shutil
+
+    output_file = uncompressed_name(filename)
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open_binary(filename) as source, open(temp_file, "wb") as destination:
+        shutil.copyfileobj(source, destination, 1024 * 1024)
+    os.replace(temp_file, output_file)
+    return output_file
+
+
+def deflate_netcdf(
+    filename: str, level: int = 4, drop_variables: Optional[List[str]] = None
+) -> bool:
+    """
+    Rewrite a netcdf output file in netcdf4 format with deflate and shuffle
+    filters. The file keeps its name, so readers need no changes. The file is
+    only replaced if it gets smaller and the raw data of every variable is
+    unchanged.
+
+    Args:
+        filename: Name of the file
+        level: Deflate level (1-9)
+        drop_variables: Variables not compared when the result is checked (optional)
+
+    Returns:
+        True if the file was replaced
+    """
+    import os
+
+    import xarray as xr
+
+    from .comparison import netcdf_checksums
+
+    temp_file = f"{filename}.{os.getpid()}.tmp"
+    with xr.open_dataset(
+        filename, decode_cf=False, decode_times=False, mask_and_scale=False
+    ) as dataset:
+        encoding = {}
+        for name, variable in dataset.variables.items():
+            if variable.dtype.kind in "fiu" and variable.ndim > 0:
+                encoding[name] = {"zlib": True, "complevel": level, "shuffle": True}
+        dataset.to_netcdf(temp_file, format="NETCDF4", encoding=encoding)
+
+    if os.path.getsize(temp_file) >= os.path.getsize(filename):
+        os.remove(temp_file)
+        logger.info(f"Deflating {filename} does not make it smaller, keeping the original")
+        return False
+
+    drop_variables = drop_variables if drop_variables else []
+    if netcdf_checksums(temp_file, drop_variables) != netcdf_checksums(
+        filename, drop_variables
+    ):
+        os.remove(temp_file)
+        logger.warning(f"Data changed when deflating {filename}, keeping the original")
+        return False
+
+    os.replace(temp_file, filename)
+    return True
@@ -0,0 +1,452 @@
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def tracefile_name(test_name: str) -> str:
+    """
+    Get a name usable as an lcov test name and file name from a test name
+
+    Args:
+        test_name: Name of the test
+
+    Returns:
+        Name with every character other than letters, digits and underscores
+        replaced by underscores
+    """
+    import re
+
+    return re.sub(r"\W", "_", test_name)
+
+
+def build_version(build_directory: str) -> str:
+    """
+    Get the version of the sources of a build directory
+
+    Args:
+        build_directory: ADCIRC build directory inside the source tree
+
+    Returns:
+        Output of git describe for the source tree, or "unknown"
+    """
+    import os
+    import subprocess
+
+    source_directory = os.path.join(build_directory, "..")
+    try:
+        result = subprocess.run(
+            [
+                "git",
+                "--git-dir",
+                os.path.join(source_directory, ".git"),
+                "--work-tree",
+                source_directory,
+                "describe",
+                "--always",
+                "--tags",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return result.stdout.strip()
+
+
+def link_notes_files(data_directory: str, build_directory: str) -> int:
+    """
+    Link the .gcno notes files of a build next to the .gcda data files written
+    under a GCOV_PREFIX, so lcov finds both in the same directory
+
+    Args:
+        data_directory: Directory holding the .gcda files, mirroring the build directory
+        build_directory: Build directory holding the .gcno files
+
+    Returns:
+        Number of .gcda files found
+    """
+    import os
+
+    count = 0
+    for directory, _, files in os.walk(data_directory):
+        relative_directory = os.path.relpath(directory, data_directory)
+        for file in files:
+            if not file.endswith(".gcda"):
+                continue
+            count += 1
+            notes_name = file[: -len(".gcda")] + ".gcno"
+            notes_file = os.path.join(build_directory, relative_directory, notes_name)
+            link = os.path.join(directory, notes_name)
+            if os.path.exists(notes_file) and not os.path.lexists(link):
+                os.symlink(notes_file, link)
+    return count
+
+
+def capture_tracefile(
+    data_directory: str,
+    base_directory: str,
+    test_name: str,
+    output_file: str,
+    lcov: str = "lcov",
+) -> bool:
+    """
+    Capture an lcov tracefile from the coverage data in a directory
+
+    Args:
+        data_directory: Directory holding the .gcda and .gcno files
+        base_directory: Directory used to resolve relative source paths
+        test_name: lcov test name recorded in the tracefile
+        output_file: Name of the tracefile
+        lcov: lcov executable
+
+    Returns:
+        True if the tracefile was written, False if lcov found no data
+    """
+    import subprocess
+
+    result = subprocess.run(
+        [
+            lcov,
+            "--capture",
+            "--quiet",
+            "--directory",
+            data_directory,
+            "--base-directory",
+            base_directory,
+            "--test-name",
+            tracefile_name(test_name),
+            "--output-file",
+            output_file,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0 or "skipping" in result.stderr:
+        logger.warning(
+            f"No coverage captured from {data_directory}: {result.stderr.strip()}"
+        )
+        return False
+    return True
+
+
+def merge_tracefiles(
+    tracefiles: List[str], output_file: str, executor, workers: int, lcov: str = "lcov"
+) -> None:
+    """
+    Merge lcov tracefiles with a parallel reduction. Each round merges groups of
+    tracefiles concurrently, so the number of tracefiles shrinks by the group
+    size until one remains.
+
+    Args:
+        tracefiles: Tracefiles to merge
+        output_file: Name of the merged tracefile
+        executor: Executor running the lcov processes
+        workers: Number of merges run at the same time
+        lcov: lcov executable
+    """
+    import math
+    import os
+    import shutil
+    import subprocess
+
+    def merge(inputs: List[str], output: str) -> str:
+        cmd = [lcov, "--quiet", "--output-file", output]
+        for tracefile in inputs:
+            cmd += ["--add-tracefile", tracefile]
+        subprocess.run(cmd, capture_output=True, check=True)
+        return output
+
+    if not tracefiles:
+        msg = "No tracefiles to merge"
+        raise ValueError(msg)
+
+    temporary_files = []
+    current = list(tracefiles)
+    round_index = 0
+    while len(current) > 1:
+        group_size = max(2, math.ceil(len(current) / workers))
+        groups = [current[i : i + group_size] for i in range(0, len(current), group_size)]
+        futures = []
+        for index, group in enumerate(groups):
+            if len(group) == 1:
+                futures.append(None)
+                continue
+            output = f"{output_file}.{round_index}.{index}.tmp"
+            temporary_files.append(output)
+            futures.append(executor.submit(merge, group, output))
+        current = [
+            future.result() if future else group[0]
+            for future, group in zip(futures, groups)
+        ]
+        round_index += 1
+
+    shutil.copy(current[0], output_file)
+    for temporary_file in temporary_files:
+        os.remove(temporary_file)
+
+
+def write_html_report(tracefile: str, html_directory: str, genhtml: str = "genhtml") -> None:
+    """
+    Write the html report of a tracefile
+
+    Args:
+        tracefile: Name of the tracefile
+        html_directory: Directory of the report
+        genhtml: genhtml executable
+    """
+    import subprocess
+
+    logger.info(f"Writing the coverage report to {html_directory}")
+    subprocess.run(
+        [
+            genhtml,
+            "--quiet",
+            "--legend",
+            "--frames",
+            "--num-spaces",
+            "4",
+            "--output-directory",
+            html_directory,
+            tracefile,
+        ],
+        capture_output=True,
+        check=True,
+    )
+
+
+def capture_build_directory(
+    build_directory: str,
+    output_directory: str,
+    workers: int = 1,
+    lcov: str = "lcov",
+    genhtml: str = "genhtml",
+) -> Optional[str]:
+    """
+    Capture the coverage data left in a build directory by a whole run of the
+    suite. Each target directory (CMakeFiles/*.dir) is captured in parallel and
+    the tracefiles are merged with merge_tracefiles.
+
+    Args:
+        build_directory: Build directory of the coverage build
+        output_directory: Directory where the tracefiles and the report are written
+        workers: Number of lcov processes run at the same time
+        lcov: lcov executable
+        genhtml: genhtml executable
+
+    Returns:
+        Name of the merged tracefile, or None if there is no coverage data
+    """
+    import concurrent.futures
+    import glob
+    import os
+    import shutil
+
+    if not shutil.which(lcov):
+        msg = f"No lcov executable found: {lcov}"
+        raise FileNotFoundError(msg)
+    if not shutil.which(genhtml):
+        msg = f"No genhtml executable found: {genhtml}"
+        raise FileNotFoundError(msg)
+
+    build_directory = os.path.abspath(build_directory)
+    os.makedirs(output_directory, exist_ok=True)
+    version = build_version(build_directory)
+
+    targets = [
+        d
+        for d in sorted(glob.glob(os.path.join(build_directory, "CMakeFiles", "*.dir")))
+        if glob.glob(os.path.join(d, "**", "*.gcda"), recursive=True)
+    ]
+    workers = max(1, workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        captures = {}
+        for target in targets:
+            name = os.path.basename(target)
+            tracefile = os.path.join(output_directory, f"{name}.info")
+            captures[tracefile] = executor.submit(
+                capture_tracefile,
+                target,
+                build_directory,
+                f"adcirc_{version}",
+                tracefile,
+                lcov,
+            )
+        tracefiles = [t for t, capture in captures.items() if capture.result()]
+        if not tracefiles:
+            logger.warning(f"No coverage data found in {build_directory}")
+            return None
+
+        merged = os.path.join(output_directory, f"adcirc_{version}.info")
+        logger.info(f"Merging the coverage of {len(tracefiles)} targets into {merged}")
+        merge_tracefiles(tracefiles, merged, executor, workers, lcov)
+
+    write_html_report(merged, os.path.join(output_directory, "adcirc"), genhtml)
+    return merged
+
+
+class CoverageCollector:
+    """
+    Collects the code coverage of each test of a coverage build. Each test runs
+    with its own GCOV_PREFIX, so its .gcda files are written to a directory of
+    its own. The tracefile of a test is captured in the background while the
+    suite moves on, and the tracefiles are merged at the end.
+    """
+
+    def __init__(
+        self,
+        build_directory: str,
+        output_directory: str,
+        workers: int = 1,
+        lcov: str = "lcov",
+        genhtml: str = "genhtml",
+    ):
+        """
+        Initialize the collector
+
+        Args:
+            build_directory: Build directory of the coverage build, holding the .gcno files
+            output_directory: Directory where the coverage data and reports are written
+            workers: Number of lcov processes run at the same time
+            lcov: lcov executable
+            genhtml: genhtml executable (optional, no html report when not found)
+        """
+        import concurrent.futures
+        import os
+        import shutil
+
+        if not shutil.which(lcov):
+            msg = f"No lcov executable found: {lcov}"
+            raise FileNotFoundError(msg)
+        if not os.path.isdir(build_directory):
+            msg = f"Coverage build directory {build_directory} does not exist"
+            raise FileNotFoundError(msg)
+
+        self.__build_directory = os.path.abspath(build_directory)
+        self.__output_directory = os.path.abspath(output_directory)
+        self.__data_root = os.path.join(self.__output_directory, "gcda")
+        self.__tracefile_directory = os.path.join(self.__output_directory, "tests")
+        self.__workers = max(1, workers)
+        self.__lcov = lcov
+        self.__genhtml = genhtml if shutil.which(genhtml) else None
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.__workers)
+        self.__captures = {}
+
+        os.makedirs(self.__data_root, exist_ok=True)
+        os.makedirs(self.__tracefile_directory, exist_ok=True)
+
+    def environment(self, test_name: str) -> Dict[str, str]:
+        """
+        Get the environment variables that direct the coverage data of a test to
+        its own directory. Data left by a previous run of the test is removed.
+
+        Args:
+            test_name: Name of the test
+
+        Returns:
+            Dictionary of environment variables for the model and prep processes
+        """
+        import os
+        import shutil
+
+        data_directory = os.path.join(self.__data_root, tracefile_name(test_name))
+        shutil.rmtree(data_directory, ignore_errors=True)
+        os.makedirs(data_directory)
+
+        # Strip the build directory from the object paths, so the data directory
+        # mirrors the layout of the build directory
+        strip = len([p for p in self.__build_directory.split(os.sep) if p])
+        return {"GCOV_PREFIX": data_directory, "GCOV_PREFIX_STRIP": str(strip)}
+
+    def capture(self, test_name: str) -> None:
+        """
+        Start capturing the tracefile of a test in the background
+
+        Args:
+            test_name: Name of the test
+        """
+        self.__captures[test_name] = self.__executor.submit(
+            self.__capture_test, test_name
+        )
+
+    def __capture_test(self, test_name: str) -> Optional[str]:
+        """
+        Capture the tracefile of a test
+
+        Args:
+            test_name: Name of the test
+
+        Returns:
+            Name of the tracefile, or None if the test produced no coverage data
+        """
+        import os
+
+        data_directory = os.path.join(self.__data_root, tracefile_name(test_name))
+        if link_notes_files(data_directory, self.__build_directory) == 0:
+            logger.warning(
+                f"Test {test_name} wrote no coverage data, is {self.__build_directory} a coverage build?"
+            )
+            return None
+
+        tracefile = os.path.join(
+            self.__tracefile_directory, f"{tracefile_name(test_name)}.info"
+        )
+        if not capture_tracefile(
+            data_directory, self.__build_directory, test_name, tracefile, self.__lcov
+        ):
+            return None
+        return tracefile
+
+    def tracefiles(self) -> Dict[str, str]:
+        """
+        Wait for the captures started so far
+
+        Returns:
+            Dictionary of tracefiles keyed by test name, for the tests with coverage data
+        """
+        tracefiles = {}
+        for test_name, capture in self.__captures.items():
+            try:
+                tracefile = capture.result()
+            except Exception as e:
+                logger.error(f"Capturing the coverage of test {test_name} failed: {e}")
+                continue
+            if tracefile:
+                tracefiles[test_name] = tracefile
+        return tracefiles
+
+    def finish(self) -> Optional[str]:
+        """
+        Wait for the captures, merge the tracefiles of all tests and write the
+        html report
+
+        Returns:
+            Name of the merged tracefile, or None if no test has coverage data
+        """
+        import os
+
+        try:
+            tracefiles = self.tracefiles()
+            if not tracefiles:
+                logger.warning("No coverage data was captured")
+                return None
+
+            version = build_version(self.__build_directory)
+            merged = os.path.join(self.__output_directory, f"adcirc_{version}.info")
+            logger.info(f"Merging the coverage of {len(tracefiles)} tests into {merged}")
+            merge_tracefiles(
+                list(tracefiles.values()),
+                merged,
+                self.__executor,
+                self.__workers,
+                self.__lcov,
+            )
+
+            if self.__genhtml:
+                write_html_report(
+                    merged, os.path.join(self.__output_directory, "html"), self.__genhtml
+                )
+            return merged
+        finally:
+            self.__executor.shutdown()
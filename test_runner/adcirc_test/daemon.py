@@ -0,0 +1,395 @@
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Environment variable used to override the socket of the harness daemon
+SOCKET_ENVIRONMENT_VARIABLE = "ADCIRC_HARNESS_SOCKET"
+
+
+def default_socket_path() -> str:
+    """
+    Get the socket used by the harness daemon and its client
+
+    Returns:
+        Path of the socket, from ADCIRC_HARNESS_SOCKET or in the temporary directory
+    """
+    import os
+    import tempfile
+
+    return os.environ.get(SOCKET_ENVIRONMENT_VARIABLE) or os.path.join(
+        tempfile.gettempdir(), f"adcirc_harness_{os.getuid()}.sock"
+    )
+
+
+def source_mtimes(directories: List[str]) -> Dict[str, int]:
+    """
+    Get the modification times of the python files in a set of directories
+
+    Args:
+        directories: Directories to scan (not recursive)
+
+    Returns:
+        Dictionary of modification times in nanoseconds keyed by file name
+    """
+    import glob
+    import os
+
+    mtimes = {}
+    for directory in directories:
+        for filename in glob.glob(os.path.join(directory, "*.py")):
+            mtimes[filename] = os.stat(filename).st_mtime_ns
+    return mtimes
+
+
+class HarnessState:
+    """
+    Data kept warm by the harness daemon between the runs it handles: the
+    control files and meshes, the plot geometry, and the parsed test yaml files
+    """
+
+    def __init__(self, drop_variables: List[str], max_cache_bytes: int):
+        """
+        Initialize the state
+
+        Args:
+            drop_variables: Variables not read from netcdf files
+            max_cache_bytes: Maximum total size on disk of the control files and
+                meshes held in memory
+        """
+        from .session import WarmDataCache
+
+        self.__warm_cache = WarmDataCache(drop_variables, max_cache_bytes)
+        self.__geometry_caches = {}
+        self.__test_yaml = {}
+
+    @property
+    def warm_cache(self):
+        """
+        WarmDataCache holding the control files and meshes
+        """
+        return self.__warm_cache
+
+    def geometry_cache(self, cache_directory: str):
+        """
+        Get the geometry cache for a cache directory, shared by all runs that use it
+
+        Args:
+            cache_directory: Directory where the geometry is stored
+
+        Returns:
+            MeshGeometryCache object
+        """
+        import os
+
+        from .geometry import MeshGeometryCache
+
+        key = os.path.abspath(cache_directory)
+        if key not in self.__geometry_caches:
+            self.__geometry_caches[key] = MeshGeometryCache(cache_directory)
+        return self.__geometry_caches[key]
+
+    def test_yaml(self, filename: str) -> dict:
+        """
+        Get a parsed test yaml file, parsing it again only if it has changed
+
+        Args:
+            filename: Name of the yaml file
+
+        Returns:
+            Dictionary from the yaml file
+        """
+        import os
+
+        import yaml
+
+        key = os.path.realpath(filename)
+        mtime = os.stat(key).st_mtime_ns
+        if key not in self.__test_yaml or self.__test_yaml[key][0] != mtime:
+            with open(key) as f:
+                self.__test_yaml[key] = (mtime, yaml.safe_load(f))
+        return self.__test_yaml[key][1]
+
+
+class _ConnectionWriter:
+    """
+    File-like object that sends the text written to it to the client. Output is
+    dropped once the client has disconnected so that the run can finish.
+    """
+
+    def __init__(self, connection):
+        """
+        Initialize the writer
+
+        Args:
+            connection: Connected socket
+        """
+        self.__connection = connection
+        self.__closed = False
+
+    def send(self, message: dict) -> None:
+        """
+        Send a message to the client
+
+        Args:
+            message: Message dictionary
+        """
+        import json
+
+        if self.__closed:
+            return
+        try:
+            self.__connection.sendall(json.dumps(message).encode() + b"\n")
+        except OSError:
+            self.__closed = True
+            logger.warning("Client disconnected, continuing the run without output")
+
+    def write(self, text: str) -> int:
+        """
+        Send output text to the client
+
+        Args:
+            text: Text to send
+
+        Returns:
+            Number of characters written
+        """
+        if text:
+            self.send({"output": text})
+        return len(text)
+
+    def flush(self) -> None:
+        """
+        Nothing is buffered
+        """
+
+    def isatty(self) -> bool:
+        """
+        The client is not a terminal
+        """
+        return False
+
+
+class HarnessDaemon:
+    """
+    Long-lived server that runs the test runner for clients connecting over a
+    Unix socket. Requests are handled one at a time in the daemon process, so the
+    imports and the data held by the handler stay warm between runs.
+
+    Each request is a json line with the command line arguments, working
+    directory and environment of the client. The environment is applied for the
+    duration of the run so that the model sees the PATH, MPI and OpenMP settings
+    of the client. The daemon replies with json lines holding the
+    output of the run and ends with the exit code. When the harness sources
+    change on disk the daemon asks the client to run the request itself and
+    exits, so that a stale daemon never runs old code.
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        handler: Callable[[List[str]], None],
+        idle_timeout: Optional[float] = None,
+        watched_directories: Optional[List[str]] = None,
+    ):
+        """
+        Initialize the daemon
+
+        Args:
+            socket_path: Path of the Unix socket
+            handler: Function called with the command line arguments of each request
+            idle_timeout: Seconds without requests before the daemon exits (optional)
+            watched_directories: Directories whose python files must not change (optional)
+        """
+        self.__socket_path = socket_path
+        self.__handler = handler
+        self.__idle_timeout = idle_timeout
+        self.__watched_directories = watched_directories if watched_directories else []
+        self.__source_mtimes = source_mtimes(self.__watched_directories)
+
+    def serve(self) -> None:
+        """
+        Serve requests until the daemon is idle for too long, the sources
+        change, or it is interrupted
+        """
+        import os
+        import socket
+
+        if os.path.exists(self.__socket_path):
+            if daemon_listening(self.__socket_path):
+                msg = f"A harness daemon is already listening on {self.__socket_path}"
+                raise RuntimeError(msg)
+            os.remove(self.__socket_path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # The daemon runs executables named by its clients, so only this user may connect
+            old_umask = os.umask(0o177)
+            try:
+                server.bind(self.__socket_path)
+            finally:
+                os.umask(old_umask)
+            server.listen(8)
+            server.settimeout(self.__idle_timeout)
+            logger.info(f"Harness daemon listening on {self.__socket_path}")
+
+            while True:
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    logger.info("Harness daemon idle timeout reached")
+                    break
+                with connection:
+                    connection.settimeout(None)
+                    if not self.__handle(connection):
+                        break
+        finally:
+            server.close()
+            if os.path.exists(self.__socket_path):
+                os.remove(self.__socket_path)
+            logger.info("Harness daemon stopped")
+
+    def __handle(self, connection) -> bool:
+        """
+        Handle a single request
+
+        Args:
+            connection: Connected socket
+
+        Returns:
+            True if the daemon should keep serving, False otherwise
+        """
+        import contextlib
+        import json
+        import os
+        import time
+        import traceback
+
+        with connection.makefile("rb") as f:
+            line = f.readline()
+        writer = _ConnectionWriter(connection)
+
+        # Connections without a request only check that the daemon is listening
+        if not line.strip():
+            return True
+        try:
+            request = json.loads(line)
+            argv = [str(a) for a in request["argv"]]
+            cwd = str(request["cwd"])
+            environment = {str(k): str(v) for k, v in request["environment"].items()}
+        except (ValueError, KeyError, TypeError) as e:
+            writer.send({"output": f"Invalid request: {e}\n"})
+            writer.send({"exit_code": 2})
+            return True
+
+        if source_mtimes(self.__watched_directories) != self.__source_mtimes:
+            logger.info("Harness sources changed, the daemon is exiting")
+            writer.send({"restart": True})
+            return False
+
+        logger.info(f"Running request in {cwd}: {' '.join(argv)}")
+        start = time.monotonic()
+
+        # Output of the run is sent to the client with the formatting of the daemon
+        root_logger = logging.getLogger()
+        stream_handler = logging.StreamHandler(writer)
+        if root_logger.handlers:
+            stream_handler.setFormatter(root_logger.handlers[0].formatter)
+        root_logger.addHandler(stream_handler)
+
+        previous_directory = os.getcwd()
+        previous_environment = dict(os.environ)
+        exit_code = 0
+        try:
+            os.environ.clear()
+            os.environ.update(environment)
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(writer), contextlib.redirect_stderr(writer):
+                self.__handler(argv)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                exit_code = e.code
+            elif e.code is not None:
+                writer.write(f"{e.code}\n")
+                exit_code = 1
+        except Exception:
+            writer.write(traceback.format_exc())
+            exit_code = 1
+        finally:
+            root_logger.removeHandler(stream_handler)
+            os.chdir(previous_directory)
+            os.environ.clear()
+            os.environ.update(previous_environment)
+
+        logger.info(
+            f"Request finished in {time.monotonic() - start:.2f} s with exit code {exit_code}"
+        )
+        writer.send({"exit_code": exit_code})
+        return True
+
+
+def daemon_listening(socket_path: str) -> bool:
+    """
+    Check if a harness daemon is listening on a socket
+
+    Args:
+        socket_path: Path of the Unix socket
+
+    Returns:
+        True if a daemon accepted the connection
+    """
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def run_remote(
+    socket_path: str,
+    argv: List[str],
+    cwd: str,
+    environment: Dict[str, str],
+    stream,
+) -> Optional[int]:
+    """
+    Run the test runner in the harness daemon, writing its output to a stream
+
+    Args:
+        socket_path: Path of the Unix socket
+        argv: Command line arguments of the test runner
+        cwd: Working directory of the run
+        environment: Environment variables of the run
+        stream: Text stream where the output is written
+
+    Returns:
+        Exit code of the run, or None if no daemon is listening or the daemon
+        asked the client to run the request itself (the run was not started)
+    """
+    import json
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            return None
+
+        request = {"argv": argv, "cwd": cwd, "environment": environment}
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as f:
+            for line in f:
+                message = json.loads(line)
+                if "output" in message:
+                    stream.write(message["output"])
+                    stream.flush()
+                elif "exit_code" in message:
+                    return int(message["exit_code"])
+                elif message.get("restart"):
+                    return None
+
+    stream.write("The harness daemon stopped before the run finished\n")
+    return 1
@@ -0,0 +1,412 @@
+import logging
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .comparison import RELATIVE_TOLERANCE
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_VERSION = 2
+
+# Suffix added to the name of a control file for its fingerprint
+FINGERPRINT_SUFFIX = ".fingerprint.npz"
+
+# Number of nodes summarized by each chunk of a snap
+DEFAULT_CHUNK_SIZE = 4096
+
+# Width of the bins used to quantize the values. A fingerprint can only prove
+# that a file passes when its quantum is not larger than the tolerance.
+DEFAULT_QUANTUM = 1e-5
+
+# Value used for nan when the values are quantized
+NAN_BIN = np.iinfo(np.int64).min
+MAX_BIN = float(2**62)
+
+
+def fingerprint_file(control_file: str) -> str:
+    """
+    Get the name of the fingerprint of a control file
+
+    Args:
+        control_file: Name of the control file
+
+    Returns:
+        Name of the fingerprint file
+    """
+    return f"{control_file}{FINGERPRINT_SUFFIX}"
+
+
+def _read_snaps(
+    filename: str, drop_variables: List[str]
+) -> Tuple[dict, Iterator[Tuple[str, int, np.ndarray]]]:
+    """
+    Read the values compared by the harness from an output file one snap at a time
+
+    Ascii files have a single variable "v" and sparse snaps are expanded with
+    their fill value. For netcdf files, every numeric variable that is compared
+    is returned, one snap at a time for variables with a time dimension.
+
+    Args:
+        filename: Name of the output file
+        drop_variables: Netcdf variables that are not compared
+
+    Returns:
+        Tuple of (metadata dictionary, iterator of (variable, snap, values))
+    """
+    if filename.endswith(".nc"):
+        return _read_netcdf_snaps(filename, drop_variables)
+    return _read_ascii_snaps(filename)
+
+
+def _read_ascii_snaps(
+    filename: str,
+) -> Tuple[dict, Iterator[Tuple[str, int, np.ndarray]]]:
+    """
+    Read the snaps of an ascii output file
+
+    Args:
+        filename: Name of the output file
+
+    Returns:
+        Tuple of (metadata dictionary, iterator of (variable, snap, values))
+    """
+    from .compression import open_text
+    from .session import read_adcirc_header, read_full_snap, read_sparse_snap
+
+    header = read_adcirc_header(filename)
+    metadata = {"type": "ascii", "header": header, "times": [], "iterations": []}
+
+    def snaps() -> Iterator[Tuple[str, int, np.ndarray]]:
+        with open_text(filename) as f:
+            _ = f.readline()
+            _ = f.readline()
+            for i in range(header["snap_count"]):
+                if header["is_sparse"]:
+                    snap = read_sparse_snap(f, header)
+                    if snap is None:
+                        break
+                    time, iteration, nodes, values, fill_value = snap
+                    dense = np.full((header["node_count"], header["n_values"]), fill_value)
+                    dense[nodes, :] = values
+                    values = dense
+                else:
+                    snap = read_full_snap(f, header)
+                    if snap is None:
+                        break
+                    time, iteration, values = snap
+                metadata["times"].append(time)
+                metadata["iterations"].append(iteration)
+                yield "v", i, values
+
+    return metadata, snaps()
+
+
+def _read_netcdf_snaps(
+    filename: str, drop_variables: List[str]
+) -> Tuple[dict, Iterator[Tuple[str, int, np.ndarray]]]:
+    """
+    Read the snaps of a netcdf output file
+
+    Args:
+        filename: Name of the output file
+        drop_variables: Variables that are not compared
+
+    Returns:
+        Tuple of (metadata dictionary, iterator of (variable, snap, values))
+    """
+    import xarray as xr
+
+    metadata = {"type": "netcdf"}
+
+    def snaps() -> Iterator[Tuple[str, int, np.ndarray]]:
+        with xr.open_dataset(
+            filename, drop_variables=drop_variables, decode_times=False
+        ) as dataset:
+            for name in sorted(str(v) for v in dataset.variables):
+                variable = dataset[name]
+                # Only the variables compared by the harness are fingerprinted
+                if variable.dtype.kind not in "fi" or "time_of" in name:
+                    continue
+                # Time series (including time itself) are summarized by snap so
+                # smoke runs can be checked against the leading snaps
+                if variable.ndim > 0 and variable.dims[0] == "time":
+                    for i in range(variable.shape[0]):
+                        yield name, i, variable[i].to_numpy()
+                else:
+                    yield name, 0, variable.to_numpy()
+
+    return metadata, snaps()
+
+
+def _summarize(
+    values: np.ndarray, chunk_size: int, quantum: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Summarize a snap in chunks of nodes
+
+    Args:
+        values: Values of the snap with the node as the first dimension
+        chunk_size: Number of nodes in each chunk
+        quantum: Width of the bins used to quantize the values
+
+    Returns:
+        Tuple of (minimum, maximum, nan count, quantized hash) for each chunk
+    """
+    import hashlib
+
+    rows = np.atleast_1d(np.asarray(values, dtype=float))
+    rows = rows.reshape(rows.shape[0], -1)
+    chunk_count = max(1, -(-rows.shape[0] // chunk_size))
+
+    minimum = np.full(chunk_count, np.nan)
+    maximum = np.full(chunk_count, np.nan)
+    nan_count = np.zeros(chunk_count, dtype=np.int64)
+    hashes = np.empty(chunk_count, dtype="S16")
+
+    for chunk in range(chunk_count):
+        block = rows[chunk * chunk_size : (chunk + 1) * chunk_size]
+        finite = np.isfinite(block)
+        nan_count[chunk] = block.size - np.count_nonzero(finite)
+        if nan_count[chunk] < block.size:
+            minimum[chunk] = np.min(block[finite])
+            maximum[chunk] = np.max(block[finite])
+
+        bins = np.full(block.shape, NAN_BIN, dtype=np.int64)
+        bins[finite] = np.clip(
+            np.floor(block[finite] / quantum), -MAX_BIN, MAX_BIN
+        ).astype(np.int64)
+        hashes[chunk] = hashlib.blake2b(bins.tobytes(), digest_size=16).digest()
+
+    return minimum, maximum, nan_count, hashes
+
+
+def compute_fingerprint(
+    filename: str,
+    drop_variables: List[str],
+    quantum: float = DEFAULT_QUANTUM,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Compute the fingerprint of an output file
+
+    For each snap of each variable the nodes are split into chunks. Each chunk
+    stores the minimum, the maximum, the number of nan values and a hash of the
+    values quantized to bins of width quantum.
+
+    Args:
+        filename: Name of the output file
+        drop_variables: Netcdf variables that are not compared
+        quantum: Width of the bins used to quantize the values
+        chunk_size: Number of nodes in each chunk
+
+    Returns:
+        Fingerprint dictionary
+    """
+    metadata, snaps = _read_snaps(filename, drop_variables)
+
+    variables: Dict[str, dict] = {}
+    for name, _, values in snaps:
+        summary = variables.setdefault(
+            name,
+            {"shape": list(values.shape), "min": [], "max": [], "nan": [], "hash": []},
+        )
+        minimum, maximum, nan_count, hashes = _summarize(values, chunk_size, quantum)
+        summary["min"].append(minimum)
+        summary["max"].append(maximum)
+        summary["nan"].append(nan_count)
+        summary["hash"].append(hashes)
+
+    for summary in variables.values():
+        for key in ["min", "max", "nan", "hash"]:
+            summary[key] = np.stack(summary[key])
+
+    return {
+        "version": FINGERPRINT_VERSION,
+        "quantum": quantum,
+        "chunk_size": chunk_size,
+        "metadata": metadata,
+        "variables": variables,
+    }
+
+
+def write_fingerprint(fingerprint: dict, filename: str) -> None:
+    """
+    Write a fingerprint to a compressed npz file
+
+    Args:
+        fingerprint: Fingerprint dictionary from compute_fingerprint
+        filename: Name of the fingerprint file
+    """
+    import json
+
+    info = {
+        "version": fingerprint["version"],
+        "quantum": fingerprint["quantum"],
+        "chunk_size": fingerprint["chunk_size"],
+        "metadata": fingerprint["metadata"],
+        "shapes": {k: v["shape"] for k, v in fingerprint["variables"].items()},
+    }
+    arrays = {"info": np.array(json.dumps(info))}
+    for name, summary in fingerprint["variables"].items():
+        for key in ["min", "max", "nan", "hash"]:
+            arrays[f"{name}/{key}"] = summary[key]
+
+    with open(filename, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def read_fingerprint(filename: str) -> dict:
+    """
+    Read a fingerprint from a npz file
+
+    Args:
+        filename: Name of the fingerprint file
+
+    Returns:
+        Fingerprint dictionary
+    """
+    import json
+
+    with np.load(filename) as data:
+        info = json.loads(str(data["info"]))
+        if info["version"] != FINGERPRINT_VERSION:
+            msg = f"Unsupported fingerprint version {info['version']} in {filename}"
+            raise ValueError(msg)
+        variables = {}
+        for name, shape in info["shapes"].items():
+            variables[name] = {"shape": shape}
+            for key in ["min", "max", "nan", "hash"]:
+                variables[name][key] = data[f"{name}/{key}"]
+
+    return {
+        "version": info["version"],
+        "quantum": info["quantum"],
+        "chunk_size": info["chunk_size"],
+        "metadata": info["metadata"],
+        "variables": variables,
+    }
+
+
+def check_fingerprint(
+    fingerprint: dict,
+    test_file: str,
+    tolerance: float,
+    drop_variables: List[str],
+    prefix: bool = False,
+) -> dict:
+    """
+    Check a test file against the fingerprint of its control file
+
+    A chunk passes when its quantized hash matches, since every value then lies in
+    the same bin of width quantum as the control value. A chunk fails when its
+    nan count differs or its minimum or maximum differs by more than the tolerance
+    allows. Other chunks cannot be decided without the full control data.
+
+    Args:
+        fingerprint: Fingerprint of the control file
+        test_file: Name of the test file
+        tolerance: Tolerance for the comparison
+        drop_variables: Netcdf variables that are not compared
+        prefix: Check the test file against the leading snaps of the control file
+
+    Returns:
+        Dictionary with the status (pass, fail or undecided), the failed and
+        undecided chunks as (variable, snap, chunk) and a list of messages
+    """
+    result = {"status": "pass", "failed": [], "undecided": [], "messages": []}
+
+    def fail(message: str) -> dict:
+        result["status"] = "fail"
+        result["messages"].append(message)
+        return result
+
+    test = compute_fingerprint(
+        test_file, drop_variables, fingerprint["quantum"], fingerprint["chunk_size"]
+    )
+    control_metadata = fingerprint["metadata"]
+    test_metadata = test["metadata"]
+
+    if control_metadata["type"] == "ascii":
+        control_header = dict(control_metadata["header"])
+        test_header = dict(test_metadata["header"])
+        if prefix:
+            control_header["snap_count"] = test_header["snap_count"]
+        if control_header != test_header:
+            return fail(f"Header information does not match in file: {test_file}")
+        snap_count = len(test_metadata["times"])
+        if not prefix and snap_count != len(control_metadata["times"]):
+            return fail(f"Snap count mismatch in file {test_file}")
+        if test_metadata["times"] != control_metadata["times"][:snap_count]:
+            return fail(f"Time mismatch in file {test_file}")
+        if test_metadata["iterations"] != control_metadata["iterations"][:snap_count]:
+            return fail(f"Iteration mismatch in file {test_file}")
+
+    proves_pass = fingerprint["quantum"] <= tolerance
+
+    for name, control in fingerprint["variables"].items():
+        if name not in test["variables"]:
+            return fail(f"Variable {name} not found in test file")
+        summary = test["variables"][name]
+
+        snap_count = summary["hash"].shape[0]
+        if (prefix and snap_count > control["hash"].shape[0]) or (
+            not prefix and snap_count != control["hash"].shape[0]
+        ):
+            return fail(f"Snap count mismatch for {name} in file {test_file}")
+        if list(summary["shape"]) != list(control["shape"]):
+            return fail(f"Shape mismatch for {name} in file {test_file}")
+
+        control_min = control["min"][:snap_count]
+        control_max = control["max"][:snap_count]
+        allowed = tolerance + RELATIVE_TOLERANCE * np.fmax(
+            np.abs(summary["min"]), np.abs(summary["max"])
+        )
+        with np.errstate(invalid="ignore"):
+            failed = (
+                (control["nan"][:snap_count] != summary["nan"])
+                | (np.abs(control_min - summary["min"]) > allowed)
+                | (np.abs(control_max - summary["max"]) > allowed)
+            )
+        matched = control["hash"][:snap_count] == summary["hash"]
+        undecided = ~failed & ~(matched & proves_pass)
+
+        result["failed"].extend((name, int(s), int(c)) for s, c in zip(*np.where(failed)))
+        result["undecided"].extend(
+            (name, int(s), int(c)) for s, c in zip(*np.where(undecided))
+        )
+
+    if result["failed"]:
+        result["status"] = "fail"
+    elif result["undecided"]:
+        result["status"] = "undecided"
+    return result
+
+
+def fetch_control_data(url: str, destination: str) -> None:
+    """
+    Download a tarball of control files and extract it
+
+    Args:
+        url: Url of the tarball (i.e. https://..., file://...)
+        destination: Directory where the tarball is extracted
+    """
+    import os
+    import tarfile
+    import tempfile
+    import urllib.request
+
+    logger.info(f"Fetching control data from {url}")
+    with tempfile.TemporaryDirectory() as temp_directory:
+        archive = os.path.join(temp_directory, "control.tar.gz")
+        urllib.request.urlretrieve(url, archive)
+        with tarfile.open(archive, "r:*") as tar:
+            root = os.path.realpath(destination)
+            for member in tar.getmembers():
+                target = os.path.realpath(os.path.join(root, member.name))
+                if not (member.isfile() or member.isdir()) or not target.startswith(
+                    root + os.sep
+                ):
+                    msg = f"Refusing to extract {member.name} from {url}"
+                    raise ValueError(msg)
+            tar.extractall(root)
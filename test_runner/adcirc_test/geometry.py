@@ -0,0 +1,334 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.tri import Triangulation
+
+logger = logging.getLogger(__name__)
+
+# Projections used for the plots. None is used for cartesian meshes.
+PROJECTIONS = [None, "mercator", "robinson"]
+
+# Elements spanning more than this many degrees of longitude cross the dateline
+DATELINE_SPAN = 90.0
+
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(filename: str) -> str:
+    """
+    Get the sha256 hash of a file. The hash is remembered for the life of the
+    process as long as the size and modification time of the file do not change.
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        Hex digest of the file
+    """
+    import hashlib
+    import os
+
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+class MeshGeometry:
+    """
+    Geometry products of a mesh used by the plots that depend only on the mesh
+    and the projection, not on the plotted variable
+    """
+
+    def __init__(
+        self,
+        extent: np.ndarray,
+        triangles: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        mask: Optional[np.ndarray] = None,
+    ):
+        """
+        Initialize the geometry
+
+        Args:
+            extent: Extent of the mesh in its own coordinates (x_min, x_max, y_min, y_max)
+            triangles: Zero based node numbers of each element
+            x: X coordinates in the plot projection
+            y: Y coordinates in the plot projection
+            mask: Elements that are not drawn, i.e. elements crossing the dateline (optional)
+        """
+        self.__extent = extent
+        self.__triangles = triangles
+        self.__x = x
+        self.__y = y
+        self.__mask = mask
+        self.__triangulation = None
+
+    @property
+    def extent(self) -> List[float]:
+        """
+        Extent of the mesh in its own coordinates (x_min, x_max, y_min, y_max)
+        """
+        return [float(v) for v in self.__extent]
+
+    @property
+    def triangles(self) -> np.ndarray:
+        """
+        Zero based node numbers of each element
+        """
+        return self.__triangles
+
+    @property
+    def x(self) -> np.ndarray:
+        """
+        X coordinates in the plot projection
+        """
+        return self.__x
+
+    @property
+    def y(self) -> np.ndarray:
+        """
+        Y coordinates in the plot projection
+        """
+        return self.__y
+
+    @property
+    def mask(self) -> Optional[np.ndarray]:
+        """
+        Elements that are not drawn, or None
+        """
+        return self.__mask
+
+    def triangulation(self) -> Triangulation:
+        """
+        Get the triangulation of the mesh in the plot projection. The
+        triangulation is built once and shared by all plots of the mesh.
+
+        Returns:
+            Triangulation
+        """
+        if self.__triangulation is None:
+            self.__triangulation = Triangulation(
+                self.__x, self.__y, self.__triangles, mask=self.__mask
+            )
+        return self.__triangulation
+
+    def save(self, filename: str) -> None:
+        """
+        Write the geometry to a npz file
+
+        Args:
+            filename: Name of the file
+        """
+        import os
+
+        arrays = {
+            "extent": self.__extent,
+            "triangles": self.__triangles,
+            "x": self.__x,
+            "y": self.__y,
+        }
+        if self.__mask is not None:
+            arrays["mask"] = self.__mask
+
+        temp_file = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_file, filename)
+
+    @staticmethod
+    def load(filename: str) -> "MeshGeometry":
+        """
+        Read a geometry from a npz file
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            MeshGeometry object
+        """
+        with np.load(filename) as data:
+            return MeshGeometry(
+                data["extent"],
+                data["triangles"],
+                data["x"],
+                data["y"],
+                data["mask"] if "mask" in data else None,
+            )
+
+    @staticmethod
+    def compute(
+        x: np.ndarray, y: np.ndarray, elements: np.ndarray, projection: Optional[str]
+    ) -> "MeshGeometry":
+        """
+        Compute the geometry of a mesh
+
+        Args:
+            x: X coordinates (longitude for geographic meshes)
+            y: Y coordinates (latitude for geographic meshes)
+            elements: One based node numbers of each element
+            projection: Plot projection (None, mercator, robinson)
+
+        Returns:
+            MeshGeometry object
+        """
+        if projection not in PROJECTIONS:
+            msg = f"Unknown projection: {projection}"
+            raise ValueError(msg)
+
+        extent = np.array([np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)])
+        triangles = np.asarray(elements, dtype=np.int32) - 1
+
+        if projection is None:
+            return MeshGeometry(extent, triangles, np.asarray(x), np.asarray(y))
+
+        import cartopy.crs as ccrs
+
+        if projection == "robinson":
+            crs = ccrs.Robinson()
+        else:
+            crs = ccrs.Mercator()
+        x_p, y_p = crs.transform_points(ccrs.PlateCarree(), x, y)[:, :2].T
+
+        mask = None
+        if projection == "robinson":
+            mask = ~np.all(
+                np.abs(np.diff(x[triangles], axis=1)) < DATELINE_SPAN, axis=1
+            )
+
+        return MeshGeometry(extent, triangles, x_p, y_p, mask)
+
+
+class MeshGeometryCache:
+    """
+    Cache of mesh geometry keyed by the hash of the mesh file and the projection.
+    Geometry is held in memory for the life of the cache and, when a cache
+    directory is given, written to <cache_directory>/<hash>_<projection>.npz so
+    that later runs can reuse it.
+    """
+
+    def __init__(self, cache_directory: Optional[str] = None):
+        """
+        Initialize the cache
+
+        Args:
+            cache_directory: Directory where the geometry is stored (optional)
+        """
+        import os
+
+        self.__cache_directory = (
+            os.path.abspath(cache_directory) if cache_directory else None
+        )
+        self.__geometry: Dict[Tuple[str, Optional[str]], MeshGeometry] = {}
+        self.__raster_weights: Dict[Tuple[str, Optional[str], int], object] = {}
+        if cache_directory:
+            os.makedirs(cache_directory, exist_ok=True)
+
+    def get(
+        self,
+        mesh_file: str,
+        x: np.ndarray,
+        y: np.ndarray,
+        elements: np.ndarray,
+        projection: Optional[str],
+    ) -> MeshGeometry:
+        """
+        Get the geometry of a mesh, computing it if it is not cached
+
+        Args:
+            mesh_file: Name of the mesh file (fort.14) used for the cache key
+            x: X coordinates of the nodes
+            y: Y coordinates of the nodes
+            elements: One based node numbers of each element
+            projection: Plot projection (None, mercator, robinson)
+
+        Returns:
+            MeshGeometry object
+        """
+        import os
+
+        key = (file_hash(mesh_file), projection)
+        geometry = self.__geometry.get(key)
+
+        cache_file = None
+        if geometry is None and self.__cache_directory:
+            cache_file = os.path.join(
+                self.__cache_directory, f"{key[0]}_{projection or 'cartesian'}.npz"
+            )
+            if os.path.exists(cache_file):
+                try:
+                    geometry = MeshGeometry.load(cache_file)
+                    logger.debug(f"Read mesh geometry from {cache_file}")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable geometry cache {cache_file}: {e}")
+
+        # The data may come from a netcdf file whose mesh differs from the fort.14
+        if geometry is not None and (
+            geometry.x.shape[0] != len(x) or geometry.triangles.shape[0] != len(elements)
+        ):
+            logger.warning(f"Cached geometry does not match the mesh in {mesh_file}")
+            geometry = None
+
+        if geometry is None:
+            geometry = MeshGeometry.compute(x, y, elements, projection)
+            if cache_file:
+                geometry.save(cache_file)
+                logger.debug(f"Wrote mesh geometry to {cache_file}")
+
+        self.__geometry[key] = geometry
+        return geometry
+
+    def raster_weights(
+        self,
+        mesh_file: str,
+        geometry: MeshGeometry,
+        projection: Optional[str],
+        resolution: int,
+    ):
+        """
+        Get the raster interpolation weights of a mesh, computing them if they
+        are not cached
+
+        Args:
+            mesh_file: Name of the mesh file (fort.14) used for the cache key
+            geometry: Geometry of the mesh from get()
+            projection: Plot projection (None, mercator, robinson)
+            resolution: Number of pixels along the longest side of the image
+
+        Returns:
+            RasterWeights object
+        """
+        import os
+        from .raster import RasterWeights
+
+        key = (file_hash(mesh_file), projection, resolution)
+        weights = self.__raster_weights.get(key)
+
+        cache_file = None
+        if weights is None and self.__cache_directory:
+            cache_file = os.path.join(
+                self.__cache_directory,
+                f"{key[0]}_{projection or 'cartesian'}_raster{resolution}.npz",
+            )
+            if os.path.exists(cache_file):
+                try:
+                    weights = RasterWeights.load(cache_file)
+                    logger.debug(f"Read raster weights from {cache_file}")
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable raster cache {cache_file}: {e}")
+
+        if weights is None:
+            weights = RasterWeights.compute(geometry, resolution)
+            if cache_file:
+                weights.save(cache_file)
+                logger.debug(f"Wrote raster weights to {cache_file}")
+
+        self.__raster_weights[key] = weights
+        return weights
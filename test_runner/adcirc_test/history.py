@@ -0,0 +1,79 @@
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TestHistory:
+    """
+    Stores measurements from previous runs of each test in a json file so that
+    later runs can compare against them (i.e. the model runtime)
+    """
+
+    # Number of measurements kept for each value
+    MAX_SAMPLES = 5
+
+    def __init__(self, filename: str):
+        """
+        Initialize the history, reading the file if it exists
+
+        Args:
+            filename: Name of the json file holding the history
+        """
+        import json
+        import os
+
+        self.__filename = filename
+        self.__data = {}
+        if os.path.exists(filename):
+            with open(filename, "r") as f:
+                self.__data = json.load(f)
+            logger.debug(f"Read test history from {filename}")
+
+    def get(self, test: str, phase: str, key: str) -> Optional[float]:
+        """
+        Get the median of the stored measurements of a value
+
+        Args:
+            test: Name of the test
+            phase: Phase of the test (coldstart, hotstart)
+            key: Name of the value
+
+        Returns:
+            Median of the stored measurements, or None if there are none
+        """
+        import statistics
+
+        samples = self.__data.get(test, {}).get(phase, {}).get(key, [])
+        if not samples:
+            return None
+        return statistics.median(samples)
+
+    def add(self, test: str, phase: str, key: str, value: float) -> None:
+        """
+        Add a measurement of a value, discarding the oldest when full
+
+        Args:
+            test: Name of the test
+            phase: Phase of the test (coldstart, hotstart)
+            key: Name of the value
+            value: Measured value
+        """
+        samples = self.__data.setdefault(test, {}).setdefault(phase, {}).setdefault(key, [])
+        samples.append(value)
+        del samples[: -self.MAX_SAMPLES]
+
+    def save(self) -> None:
+        """
+        Write the history to the json file
+
+        Returns:
+            None
+        """
+        import json
+        import os
+
+        temp_file = f"{self.__filename}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self.__data, f, indent=2)
+        os.replace(temp_file, self.__filename)
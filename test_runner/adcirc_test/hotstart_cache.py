@@ -0,0 +1,269 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .geometry import file_hash
+
+logger = logging.getLogger(__name__)
+
+# Hot start files written by the cold start, in the run directory or in PE0000
+HOTSTART_FILES = ["fort.67", "fort.68", "fort.67.nc", "fort.68.nc"]
+
+# ioctl cloning a file on copy-on-write filesystems (btrfs, xfs)
+FICLONE = 0x40049409
+
+
+def clone_file(source: str, destination: str) -> str:
+    """
+    Copy a file, sharing its blocks with the source where the filesystem supports
+    it. Unlike a hard link, writes to the copy do not change the source, which
+    matters since the model rewrites the hot start files in place.
+
+    Args:
+        source: File to copy
+        destination: Name of the copy, replaced when it exists
+
+    Returns:
+        How the file was copied (clone, copy)
+    """
+    import fcntl
+    import os
+    import shutil
+
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return "clone"
+    except OSError:
+        shutil.copyfile(source, destination)
+        return "copy"
+
+
+def input_snapshot(directory: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Get the size and modification time of the files of a run directory
+
+    Args:
+        directory: Run directory
+
+    Returns:
+        Dictionary of (size, modification time in ns) keyed by file name
+    """
+    import os
+
+    snapshot = {}
+    for entry in os.scandir(directory):
+        if entry.is_file(follow_symlinks=True):
+            stat = entry.stat()
+            snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def hotstart_sources(directory: str) -> Dict[str, str]:
+    """
+    Find the hot start files written by a cold start
+
+    Args:
+        directory: Cold start run directory
+
+    Returns:
+        Dictionary of file paths keyed by the name used in the hot start directory
+    """
+    import os
+
+    sources = {}
+    for name in HOTSTART_FILES:
+        for path in [os.path.join(directory, name), os.path.join(directory, "PE0000", name)]:
+            if os.path.exists(path):
+                sources[name] = path
+                break
+    return sources
+
+
+class HotstartCache:
+    """
+    Cache of the hot start files of verified cold starts. An entry is stored in
+    <directory>/<test>/<key>, where the key is the hash of the executables and of
+    the input files of the cold start. The input files are the files of the cold
+    start directory the run did not modify, listed in the manifest.json of the
+    entry so that a lookup hashes the same files.
+    """
+
+    def __init__(self, directory: str, keep: int = 3):
+        """
+        Initialize the cache
+
+        Args:
+            directory: Directory of the cache
+            keep: Number of entries kept for each test, the least recently used
+                are removed
+        """
+        import os
+
+        self.__directory = os.path.abspath(directory)
+        self.__keep = keep
+
+    @staticmethod
+    def __binary_hashes(executables: List[str]) -> Dict[str, str]:
+        """
+        Hash the executables of a run
+
+        Args:
+            executables: Paths of the executables
+
+        Returns:
+            Dictionary of hashes keyed by executable name
+        """
+        import os
+
+        return {os.path.basename(e): file_hash(e) for e in executables}
+
+    def lookup(self, test_name: str, executables: List[str], directory: str) -> Optional[str]:
+        """
+        Find the entry matching the executables and the inputs of a cold start
+
+        Args:
+            test_name: Name of the test
+            executables: Paths of the model and prep executables
+            directory: Cold start run directory
+
+        Returns:
+            Directory of the entry, or None when there is no match
+        """
+        import json
+        import os
+
+        test_directory = os.path.join(self.__directory, test_name)
+        if not os.path.isdir(test_directory):
+            return None
+
+        binaries = self.__binary_hashes(executables)
+        for entry in self.__entries(test_directory):
+            try:
+                with open(os.path.join(entry, "manifest.json")) as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable hot start cache entry {entry}: {e}")
+                continue
+            if manifest["binaries"] != binaries:
+                continue
+            if all(
+                os.path.isfile(os.path.join(directory, name))
+                and file_hash(os.path.join(directory, name)) == digest
+                for name, digest in manifest["inputs"].items()
+            ):
+                os.utime(entry)
+                return entry
+        return None
+
+    def store(
+        self,
+        test_name: str,
+        executables: List[str],
+        directory: str,
+        inputs: List[str],
+    ) -> Optional[str]:
+        """
+        Store the hot start files of a verified cold start
+
+        Args:
+            test_name: Name of the test
+            executables: Paths of the model and prep executables
+            directory: Cold start run directory
+            inputs: Names of the input files of the cold start
+
+        Returns:
+            Directory of the entry, or None when the cold start wrote no hot start file
+        """
+        import hashlib
+        import json
+        import os
+        import shutil
+        import tempfile
+
+        sources = hotstart_sources(directory)
+        if not sources:
+            logger.warning(f"No hot start files found in {directory}, nothing cached")
+            return None
+
+        manifest = {
+            "test": test_name,
+            "binaries": self.__binary_hashes(executables),
+            "inputs": {
+                name: file_hash(os.path.join(directory, name)) for name in sorted(inputs)
+            },
+            "files": sorted(sources),
+        }
+        key = hashlib.sha256(
+            json.dumps([manifest["binaries"], manifest["inputs"]], sort_keys=True).encode()
+        ).hexdigest()[:16]
+
+        test_directory = os.path.join(self.__directory, test_name)
+        os.makedirs(test_directory, exist_ok=True)
+        entry = os.path.join(test_directory, key)
+
+        # The entry is written next to its final name and renamed so that a
+        # lookup never sees a partial entry
+        staging = tempfile.mkdtemp(dir=test_directory, prefix=".staging_")
+        try:
+            for name, source in sources.items():
+                clone_file(source, os.path.join(staging, name))
+            with open(os.path.join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.rename(staging, entry)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        logger.info(f"Stored the hot start files of {test_name} in {entry}")
+
+        for old_entry in self.__entries(test_directory)[self.__keep :]:
+            shutil.rmtree(old_entry, ignore_errors=True)
+        return entry
+
+    @staticmethod
+    def restore(entry: str, destination: str) -> List[str]:
+        """
+        Copy the hot start files of an entry into a hot start directory
+
+        Args:
+            entry: Directory of the entry from lookup()
+            destination: Hot start run directory
+
+        Returns:
+            Names of the files restored
+        """
+        import json
+        import os
+
+        with open(os.path.join(entry, "manifest.json")) as f:
+            manifest = json.load(f)
+        for name in manifest["files"]:
+            method = clone_file(os.path.join(entry, name), os.path.join(destination, name))
+            logger.info(f"Restored hot start file {name} from {entry} ({method})")
+        return manifest["files"]
+
+    @staticmethod
+    def __entries(test_directory: str) -> List[str]:
+        """
+        Get the entries of a test, most recently used first
+
+        Args:
+            test_directory: Directory of the entries of the test
+
+        Returns:
+            List of entry directories
+        """
+        import os
+
+        entries = [
+            os.path.join(test_directory, name)
+            for name in os.listdir(test_directory)
+            if not name.startswith(".")
+        ]
+        return sorted(
+            (e for e in entries if os.path.isdir(e)),
+            key=lambda e: os.stat(e).st_mtime_ns,
+            reverse=True,
+        )
@@ -0,0 +1,265 @@
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Suffixes of changed files that can change the model even when no test executes
+# them, i.e. new sources, headers and build files. Changes to other files that no
+# test executes (documentation, scripts) select no tests.
+MODEL_FILE_SUFFIXES = (
+    ".F",
+    ".F90",
+    ".f",
+    ".f90",
+    ".c",
+    ".cpp",
+    ".h",
+    ".inc",
+    ".cmake",
+    "CMakeLists.txt",
+)
+
+
+def read_tracefile(
+    filename: str, source_root: Optional[str] = None
+) -> Tuple[Dict[str, Set[str]], Dict[str, Dict[str, int]]]:
+    """
+    Read the executed source files and routines from an lcov tracefile
+
+    Args:
+        filename: Name of the tracefile
+        source_root: Root of the source tree, source paths below it are stored
+            relative to it (optional)
+
+    Returns:
+        Tuple of the executed routines keyed by source file (every executed file
+        is included, even when no routine information is available), and the
+        first line of every routine keyed by source file
+    """
+    import os
+
+    executed = {}
+    routines = {}
+    source_file = None
+    lines_hit = False
+    executed_routines = set()
+    with open(filename, "r") as f:
+        lines = [line.strip() for line in f]
+
+    for line in lines:
+        if line.startswith("SF:"):
+            path = line[3:]
+            if source_root:
+                root = os.path.abspath(source_root)
+                if os.path.abspath(path).startswith(root + os.sep):
+                    path = os.path.relpath(os.path.abspath(path), root)
+            source_file = path
+            lines_hit = False
+            executed_routines = set()
+            routines.setdefault(source_file, {})
+        elif source_file is None:
+            continue
+        elif line.startswith("FN:"):
+            start, name = line[3:].split(",", 1)
+            routines[source_file][name] = int(start)
+        elif line.startswith("FNDA:"):
+            count, name = line[5:].split(",", 1)
+            if int(count) > 0:
+                executed_routines.add(name)
+        elif line.startswith("DA:"):
+            if int(line[3:].split(",")[1]) > 0:
+                lines_hit = True
+        elif line == "end_of_record":
+            if lines_hit or executed_routines:
+                executed.setdefault(source_file, set()).update(executed_routines)
+            source_file = None
+    return executed, routines
+
+
+def git_changed_lines(
+    source_directory: str, revision: str
+) -> Dict[str, Optional[List[Tuple[int, int]]]]:
+    """
+    Get the lines changed in a git source tree since a revision
+
+    Args:
+        source_directory: Root of the source tree
+        revision: Revision the working tree is compared against, i.e. origin/main
+
+    Returns:
+        Dictionary of changed line ranges keyed by source file relative to the
+        root of the tree. Line numbers refer to the file at the revision, which
+        is the version the impact map was built from. New and deleted files have
+        no ranges (None).
+    """
+    import re
+    import subprocess
+
+    result = subprocess.run(
+        ["git", "-C", source_directory, "diff", "--no-color", "--unified=0", revision],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    changes = {}
+    old_file = None
+    for line in result.stdout.splitlines():
+        if line.startswith("--- "):
+            old_file = None if line == "--- /dev/null" else line[len("--- a/") :]
+        elif line.startswith("+++ "):
+            if old_file is None:
+                changes[line[len("+++ b/") :]] = None
+            elif line == "+++ /dev/null":
+                changes[old_file] = None
+                old_file = None
+            else:
+                changes[old_file] = []
+        elif line.startswith("@@") and old_file is not None:
+            match = re.match(r"@@ -(\d+)(?:,(\d+))?", line)
+            start = int(match.group(1))
+            count = int(match.group(2)) if match.group(2) is not None else 1
+            # Pure insertions change the code after the line where they are made
+            changes[old_file].append((start, start + max(count, 1) - 1))
+    return changes
+
+
+class ImpactMap:
+    """
+    Stores which ADCIRC source files and routines each test executes, built
+    from the per-test coverage tracefiles, in a json file. It selects the tests
+    affected by a change to the sources.
+    """
+
+    def __init__(self, filename: str):
+        """
+        Initialize the map, reading the file if it exists
+
+        Args:
+            filename: Name of the json file holding the map
+        """
+        import json
+        import os
+
+        self.__filename = filename
+        self.__data = {"tests": {}, "routines": {}}
+        if os.path.exists(filename):
+            with open(filename, "r") as f:
+                self.__data = json.load(f)
+            logger.debug(f"Read impact map from {filename}")
+
+    @property
+    def tests(self) -> List[str]:
+        """
+        Names of the tests in the map
+        """
+        return list(self.__data["tests"])
+
+    def update(self, test: str, tracefile: str, source_root: Optional[str] = None) -> None:
+        """
+        Replace the entry of a test with the coverage in a tracefile
+
+        Args:
+            test: Name of the test
+            tracefile: lcov tracefile of the test
+            source_root: Root of the source tree (optional)
+        """
+        executed, routines = read_tracefile(tracefile, source_root)
+        self.__data["tests"][test] = {
+            source_file: sorted(names) for source_file, names in executed.items()
+        }
+        for source_file, starts in routines.items():
+            self.__data["routines"].setdefault(source_file, {}).update(starts)
+
+    def __changed_routines(
+        self, source_file: str, ranges: Optional[List[Tuple[int, int]]]
+    ) -> Optional[Set[str]]:
+        """
+        Get the routines of a source file containing a set of changed lines
+
+        Args:
+            source_file: Source file relative to the root of the tree
+            ranges: Changed line ranges, or None if the whole file changed
+
+        Returns:
+            Names of the changed routines, or None if a change is outside every
+            routine (i.e. in module declarations) or the file has no routine
+            information, in which case the whole file is considered changed
+        """
+        starts = sorted(
+            (start, name)
+            for name, start in self.__data["routines"].get(source_file, {}).items()
+        )
+        if ranges is None or not starts:
+            return None
+
+        changed = set()
+        for first, last in ranges:
+            if first < starts[0][0]:
+                return None
+            # A routine extends from its first line to the first line of the next one
+            for index, (start, name) in enumerate(starts):
+                end = starts[index + 1][0] - 1 if index + 1 < len(starts) else float("inf")
+                if start <= last and first <= end:
+                    changed.add(name)
+        return changed
+
+    def select(
+        self,
+        all_tests: List[str],
+        changes: Dict[str, Optional[List[Tuple[int, int]]]],
+        core_tests: List[str],
+    ) -> List[str]:
+        """
+        Select the tests affected by a set of changed source files
+
+        Args:
+            all_tests: Names of the tests that can be run, in run order
+            changes: Changed line ranges keyed by source file relative to the root
+                of the tree, None for files changed as a whole
+            core_tests: Names of the tests that are always run
+
+        Returns:
+            Names of the selected tests, in run order. Every test is selected when
+            a changed model file is not executed by any test in the map.
+        """
+        known_files = set()
+        for files in self.__data["tests"].values():
+            known_files.update(files)
+
+        selected = set(core_tests)
+        # Tests missing from the map have no coverage data yet, so they always run
+        selected.update(t for t in all_tests if t not in self.__data["tests"])
+
+        for source_file, ranges in changes.items():
+            if source_file not in known_files:
+                if source_file.endswith(MODEL_FILE_SUFFIXES):
+                    logger.info(
+                        f"No test is known to execute {source_file}, selecting every test"
+                    )
+                    return list(all_tests)
+                continue
+
+            routines = self.__changed_routines(source_file, ranges)
+            for test, files in self.__data["tests"].items():
+                if source_file not in files:
+                    continue
+                if routines is None or routines.intersection(files[source_file]):
+                    selected.add(test)
+
+        return [t for t in all_tests if t in selected]
+
+    def save(self) -> None:
+        """
+        Write the map to the json file
+
+        Returns:
+            None
+        """
+        import json
+        import os
+
+        temp_file = f"{self.__filename}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump(self.__data, f, indent=2)
+        os.replace(temp_file, self.__filename)
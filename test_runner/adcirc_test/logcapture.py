@@ -0,0 +1,127 @@
+import logging
+from collections import deque
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LogCapture:
+    """
+    Captures the output of a model run in large chunks, writing it to a gzip
+    compressed log file while keeping only the last lines in memory for failure
+    reports. Progress is parsed from the TIME STEP lines at most once per
+    progress interval rather than on every line.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    TAIL_LINES = 100
+
+    def __init__(
+        self,
+        log_file: str,
+        tail_lines: int = TAIL_LINES,
+        progress_interval: float = 1.0,
+    ):
+        """
+        Initialize the log capture
+
+        Args:
+            log_file: Name of the compressed log file
+            tail_lines: Number of lines kept in memory
+            progress_interval: Minimum seconds between progress parses
+        """
+        self.__log_file = log_file
+        self.__tail = deque(maxlen=tail_lines)
+        self.__progress_interval = progress_interval
+        self.__last_parse_time = None
+
+    def capture(
+        self, stream, on_progress: Optional[Callable[[float], None]] = None
+    ) -> None:
+        """
+        Read the stream until it is closed
+
+        Args:
+            stream: Binary stream (i.e. the stdout pipe of the model)
+            on_progress: Function called with the percent complete (optional)
+        """
+        import gzip
+        import os
+        import time
+
+        fd = stream.fileno()
+        remainder = b""
+        with gzip.open(self.__log_file, "wb", compresslevel=6) as log:
+            while True:
+                chunk = os.read(fd, self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                log.write(chunk)
+
+                data = remainder + chunk
+                end_of_lines = data.rfind(b"\n")
+                if end_of_lines < 0:
+                    remainder = data
+                    continue
+                complete, remainder = data[:end_of_lines], data[end_of_lines + 1 :]
+
+                self.__add_to_tail(complete)
+
+                now = time.monotonic()
+                if on_progress and (
+                    self.__last_parse_time is None
+                    or now - self.__last_parse_time >= self.__progress_interval
+                ):
+                    self.__last_parse_time = now
+                    percent = self.parse_progress(complete)
+                    if percent is not None:
+                        on_progress(percent)
+
+        if remainder:
+            self.__add_to_tail(remainder)
+            if on_progress:
+                percent = self.parse_progress(remainder)
+                if percent is not None:
+                    on_progress(percent)
+
+    def __add_to_tail(self, data: bytes) -> None:
+        """
+        Add the last lines of a block of complete lines to the in-memory tail
+
+        Args:
+            data: Block of lines
+        """
+        lines = data.rsplit(b"\n", self.__tail.maxlen)
+        self.__tail.extend(line.decode("utf-8", errors="replace") for line in lines)
+
+    @staticmethod
+    def parse_progress(data: bytes) -> Optional[float]:
+        """
+        Parse the percent complete from the last TIME STEP line in a block of output
+
+        Args:
+            data: Block of model output
+
+        Returns:
+            Percent complete, or None if no progress line was found
+        """
+        start = data.rfind(b"TIME STEP")
+        while start >= 0:
+            end = data.find(b"\n", start)
+            line = data[start:] if end < 0 else data[start:end]
+            if b"ITERATIONS" in line:
+                try:
+                    return float(line.split()[4].split(b"%")[0])
+                except (IndexError, ValueError):
+                    return None
+            start = data.rfind(b"TIME STEP", 0, start)
+        return None
+
+    def tail(self) -> List[str]:
+        """
+        Get the last lines of the output
+
+        Returns:
+            List of lines
+        """
+        return list(self.__tail)
@@ -0,0 +1,323 @@
+import logging
+from typing import Callable, Optional, Tuple
+
+from .compression import find_output_file
+from .slots import default_slot_directory
+
+logger = logging.getLogger(__name__)
+
+# Rough memory used by the model and adcprep for each mesh node, summed over the ranks
+MODEL_BYTES_PER_NODE = 4096
+
+# Memory used by the harness to compare an output file relative to the size of
+# the control file (test and control data and their difference)
+COMPARE_FACTOR = 3.0
+
+# Size of a compressed control file relative to the uncompressed file
+COMPRESSION_RATIO = 0.25
+
+
+def parse_memory(value: str) -> float:
+    """
+    Parse an amount of memory, allowing M, G and T suffixes (i.e. 512M, 64G).
+    Values without a suffix are in MB.
+
+    Args:
+        value: Amount of memory
+
+    Returns:
+        Amount of memory in MB
+    """
+    import argparse
+
+    multipliers = {"m": 1.0, "g": 1024.0, "t": 1024.0 * 1024.0}
+    text = value.strip().lower().rstrip("b")
+    try:
+        if text and text[-1] in multipliers:
+            return float(text[:-1]) * multipliers[text[-1]]
+        return float(text)
+    except ValueError:
+        msg = f"Invalid amount of memory: {value}"
+        raise argparse.ArgumentTypeError(msg) from None
+
+
+def measured_memory(usage: dict) -> Tuple[float, float]:
+    """
+    Get the peak memory of a phase of a test from its resource usage. The steps
+    of a phase run one after the other, so the peak of the phase is the peak of
+    its largest step. The model and adcprep steps count all of their processes,
+    the comparison and plot steps count the growth of the harness.
+
+    Args:
+        usage: Steps of a phase from AdcircTest.resource_usage()
+
+    Returns:
+        Tuple of the peak memory of the phase and of its adcprep steps in MB
+    """
+    peak = 0.0
+    prep_peak = 0.0
+    for step_name, step in usage.items():
+        if "total_peak_rss_mb" in step:
+            memory = step["total_peak_rss_mb"]
+        else:
+            memory = step.get("rss_increase_mb", 0.0)
+        peak = max(peak, memory)
+        if step_name.startswith("adcprep"):
+            prep_peak = max(prep_peak, memory)
+    return peak, prep_peak
+
+
+def estimate_memory(test_directory: str, test_yaml: dict) -> Tuple[float, float]:
+    """
+    Estimate the peak memory of a test from the size of its mesh and control
+    files, for tests that have not been measured
+
+    Args:
+        test_directory: Directory of the test
+        test_yaml: Test yaml dictionary
+
+    Returns:
+        Tuple of the estimated peak memory of the test and of its adcprep steps in MB
+    """
+    import os
+
+    run_directories = (
+        [os.path.join(test_directory, "01_cs"), os.path.join(test_directory, "02_hs")]
+        if test_yaml.get("hotstart", False)
+        else [test_directory]
+    )
+
+    nodes = 0
+    compare_bytes = 0.0
+    for directory in run_directories:
+        try:
+            with open(os.path.join(directory, "fort.14")) as f:
+                f.readline()
+                nodes = max(nodes, int(f.readline().split()[1]))
+        except (OSError, IndexError, ValueError):
+            pass
+        for output_file in test_yaml.get("output_files", []):
+            control_file = find_output_file(os.path.join(directory, "control", output_file))
+            if control_file is None:
+                continue
+            size = os.path.getsize(control_file)
+            if control_file != os.path.join(directory, "control", output_file):
+                size /= COMPRESSION_RATIO
+            compare_bytes = max(compare_bytes, COMPARE_FACTOR * size)
+
+    model_mb = nodes * MODEL_BYTES_PER_NODE / 1024**2
+    prep_mb = model_mb if test_yaml.get("parallel", False) else 0.0
+    return max(model_mb, compare_bytes / 1024**2), prep_mb
+
+
+def memory_estimate(
+    test_name: str, test_directory: str, test_yaml: dict, history=None
+) -> Tuple[float, float]:
+    """
+    Get the memory estimate of a test, measured in earlier runs when the history
+    has it, otherwise estimated from the size of its files (see estimate_memory)
+
+    Args:
+        test_name: Name of the test
+        test_directory: Directory of the test
+        test_yaml: Test yaml dictionary
+        history: TestHistory holding the peak memory of earlier runs (optional)
+
+    Returns:
+        Tuple of the peak memory of the test and of its adcprep steps in MB
+    """
+    if history is not None:
+        phases = ["coldstart", "hotstart"]
+        peaks = [history.get(test_name, phase, "peak_memory_mb") for phase in phases]
+        if any(peak is not None for peak in peaks):
+            prep_peaks = [history.get(test_name, phase, "prep_memory_mb") for phase in phases]
+            return (
+                max(peak for peak in peaks if peak is not None),
+                max((peak for peak in prep_peaks if peak is not None), default=0.0),
+            )
+    return estimate_memory(test_directory, test_yaml)
+
+
+class MemoryReservation:
+    """
+    Memory reserved in a MemoryBudget, released when the object is closed or used
+    as a context manager
+    """
+
+    def __init__(self, memory_mb: float, release: Callable[[], None]):
+        """
+        Initialize the reservation
+
+        Args:
+            memory_mb: Memory reserved in MB
+            release: Function removing the reservation from the budget
+        """
+        self.__memory_mb = memory_mb
+        self.__release = release
+
+    @property
+    def memory_mb(self) -> float:
+        """
+        Memory reserved in MB
+        """
+        return self.__memory_mb
+
+    def release(self) -> None:
+        """
+        Release the reservation
+        """
+        if self.__release is not None:
+            self.__release()
+            self.__release = None
+
+    def __enter__(self) -> "MemoryReservation":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+class MemoryBudget:
+    """
+    Memory budget shared between processes, so that concurrent runs (i.e.
+    several runners or pytest-xdist workers on a CI node) only start a test when
+    the estimated peak memory of the running tests and of the new one fits. The
+    reservations are kept in a json ledger guarded by a lock file, and those of
+    processes that no longer exist are dropped.
+    """
+
+    def __init__(
+        self, max_memory_mb: float, directory: Optional[str] = None, poll_interval: float = 1.0
+    ):
+        """
+        Initialize the budget
+
+        Args:
+            max_memory_mb: Memory shared by the tests in MB
+            directory: Directory of the ledger (default: default_slot_directory())
+            poll_interval: Seconds between attempts when the memory is not available
+        """
+        import os
+
+        self.__max_memory_mb = max_memory_mb
+        self.__directory = directory if directory else default_slot_directory()
+        self.__poll_interval = poll_interval
+        os.makedirs(self.__directory, mode=0o700, exist_ok=True)
+
+    @property
+    def max_memory_mb(self) -> float:
+        """
+        Memory shared by the tests in MB
+        """
+        return self.__max_memory_mb
+
+    def reserve(
+        self, name: str, memory_mb: float, wait: bool = True
+    ) -> Optional[MemoryReservation]:
+        """
+        Reserve memory for a test. A test larger than the budget waits until it
+        can run alone.
+
+        Args:
+            name: Name of the test, recorded in the ledger
+            memory_mb: Estimated peak memory in MB
+            wait: Wait until the memory is available
+
+        Returns:
+            The reservation, or None when wait is False and the memory is not available
+        """
+        import os
+        import time
+        import uuid
+
+        if memory_mb > self.__max_memory_mb and wait:
+            logger.warning(
+                f"{name} is estimated to use {memory_mb:.0f} MB, more than the "
+                f"{self.__max_memory_mb:.0f} MB budget, it will run alone"
+            )
+        memory_mb = min(memory_mb, self.__max_memory_mb)
+
+        logged = False
+        while True:
+            with self.__ledger() as entries:
+                used = sum(entry["memory_mb"] for entry in entries)
+                if not entries or used + memory_mb <= self.__max_memory_mb:
+                    token = uuid.uuid4().hex
+                    entries.append(
+                        {"token": token, "pid": os.getpid(), "name": name, "memory_mb": memory_mb}
+                    )
+                    logger.debug(f"Reserved {memory_mb:.0f} MB for {name}")
+                    return MemoryReservation(memory_mb, lambda: self.__release(token))
+            if not wait:
+                return None
+            if not logged:
+                logger.info(
+                    f"Waiting for {memory_mb:.0f} MB of memory for {name} "
+                    f"({used:.0f} of {self.__max_memory_mb:.0f} MB reserved)"
+                )
+                logged = True
+            time.sleep(self.__poll_interval)
+
+    def __release(self, token: str) -> None:
+        """
+        Remove a reservation from the ledger
+
+        Args:
+            token: Token of the reservation
+        """
+        with self.__ledger() as entries:
+            entries[:] = [entry for entry in entries if entry["token"] != token]
+
+    def __ledger(self):
+        """
+        Get a context manager holding the lock of the ledger and yielding its live
+        entries. Changes to the list are written back on exit.
+
+        Returns:
+            Context manager yielding the list of reservations
+        """
+        import fcntl
+        import json
+        import os
+        from contextlib import contextmanager
+
+        ledger_file = os.path.join(self.__directory, "memory.json")
+
+        @contextmanager
+        def ledger():
+            with open(os.path.join(self.__directory, "memory.lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(ledger_file) as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    entries = []
+                entries = [entry for entry in entries if _process_alive(entry["pid"])]
+                yield entries
+                temp_file = f"{ledger_file}.tmp"
+                with open(temp_file, "w") as f:
+                    json.dump(entries, f, indent=2)
+                os.replace(temp_file, ledger_file)
+
+        return ledger()
+
+
+def _process_alive(pid: int) -> bool:
+    """
+    Check whether a process exists
+
+    Args:
+        pid: Process id
+
+    Returns:
+        True if the process exists
+    """
+    import os
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,123 @@
+import logging
+from typing import Callable, Optional
+
+from .adcirctest import AdcircTest
+
+logger = logging.getLogger(__name__)
+
+
+class PrepPipeline:
+    """
+    Background stage running adcprep for the upcoming parallel tests while the
+    model of the current test runs, so that the prep of a test is off the
+    critical path when its turn comes
+    """
+
+    def __init__(self, depth: int):
+        """
+        Initialize the pipeline
+
+        Args:
+            depth: Number of upcoming tests prepared at the same time
+        """
+        import concurrent.futures
+
+        self.__depth = depth
+        self.__executor = (
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=depth, thread_name_prefix="adcprep"
+            )
+            if depth > 0
+            else None
+        )
+        self.__pending = {}
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of upcoming tests prepared at the same time
+        """
+        return self.__depth
+
+    def submitted(self, key: str) -> bool:
+        """
+        Check whether a test was submitted and not yet taken
+
+        Args:
+            key: Name of the test
+
+        Returns:
+            True if the test is in the pipeline
+        """
+        return key in self.__pending
+
+    def submit(
+        self,
+        key: str,
+        create: Callable[[], AdcircTest],
+        release: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        Create a test and run its prep in the background. Tests already
+        submitted are ignored.
+
+        Args:
+            key: Name of the test, used by take()
+            create: Function creating the test, ready to run (cleaned and sandboxed)
+            release: Function called when the prep is done, i.e. releasing the
+                memory reserved for it (optional)
+        """
+        if self.__executor is None or key in self.__pending:
+            if release is not None:
+                release()
+            return
+        try:
+            test = create()
+        except Exception:
+            if release is not None:
+                release()
+            raise
+        logger.info(f"Preparing {key} in the background")
+        future = self.__executor.submit(test.prepare)
+        if release is not None:
+            # Also called when the prep is cancelled by close()
+            future.add_done_callback(lambda _: release())
+        self.__pending[key] = (test, future)
+
+    def take(self, key: str) -> Optional[AdcircTest]:
+        """
+        Get a test submitted to the pipeline, waiting for its prep to finish
+
+        Args:
+            key: Name of the test
+
+        Returns:
+            The prepared test, or None if the test was not submitted. Errors of
+            the prep are raised here.
+        """
+        if key not in self.__pending:
+            return None
+        test, future = self.__pending.pop(key)
+        if not future.done():
+            logger.info(f"Waiting for the prep of {key}")
+        future.result()
+        return test
+
+    def close(self) -> None:
+        """
+        Cancel the preps that have not started and wait for the running ones
+        """
+        if self.__executor is None:
+            return
+        for _, future in self.__pending.values():
+            future.cancel()
+        self.__executor.shutdown(wait=True)
+        for test, _ in self.__pending.values():
+            test.release()
+        self.__pending.clear()
+
+    def __enter__(self) -> "PrepPipeline":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
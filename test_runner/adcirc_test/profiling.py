@@ -0,0 +1,150 @@
+import logging
+from contextlib import contextmanager
+from typing import Iterator, List
+
+logger = logging.getLogger(__name__)
+
+
+class HarnessProfiler:
+    """
+    Profiles the phases of the test harness with cProfile and tracemalloc
+
+    Each phase of each test is written to <output_directory>/<test>/<phase>.prof
+    along with a listing of the largest allocation sites. A combined summary of
+    the hottest functions across all tests is written by write_summary().
+    """
+
+    # Number of entries written to the summaries
+    TOP_FUNCTION_COUNT = 40
+    TOP_ALLOCATION_COUNT = 15
+
+    def __init__(self, output_directory: str):
+        """
+        Initialize the profiler
+
+        Args:
+            output_directory: Directory where the profile dumps are written
+        """
+        import os
+
+        self.__output_directory = os.path.abspath(output_directory)
+        self.__profiles: List[str] = []
+        self.__phases: List[dict] = []
+        os.makedirs(self.__output_directory, exist_ok=True)
+
+    @contextmanager
+    def phase(self, test_name: str, phase_name: str) -> Iterator[None]:
+        """
+        Profile a phase of a test
+
+        Args:
+            test_name: Name of the test
+            phase_name: Name of the phase (i.e. clean, prep, model, check_results, plot)
+        """
+        import cProfile
+        import os
+        import time
+        import tracemalloc
+
+        test_directory = os.path.join(self.__output_directory, test_name)
+        os.makedirs(test_directory, exist_ok=True)
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            wall_time = time.perf_counter() - start_time
+            _, peak_memory = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+            profile_file = os.path.join(test_directory, f"{phase_name}.prof")
+            profile.dump_stats(profile_file)
+            self.__profiles.append(profile_file)
+
+            allocation_file = os.path.join(test_directory, f"{phase_name}.alloc.txt")
+            self.__write_allocations(allocation_file, snapshot)
+
+            self.__phases.append(
+                {
+                    "test": test_name,
+                    "phase": phase_name,
+                    "wall_time_s": wall_time,
+                    "peak_traced_mb": peak_memory / 1024.0 / 1024.0,
+                }
+            )
+            logger.debug(
+                f"Profiled {test_name}/{phase_name}: {wall_time:.2f}s, "
+                f"peak traced memory {peak_memory / 1024.0 / 1024.0:.1f}MB"
+            )
+
+    def __write_allocations(self, filename: str, snapshot) -> None:
+        """
+        Write the largest allocation sites of a snapshot to a file
+
+        Args:
+            filename: Name of the output file
+            snapshot: tracemalloc snapshot
+        """
+        import tracemalloc
+
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        with open(filename, "w") as f:
+            for stat in snapshot.statistics("lineno")[: self.TOP_ALLOCATION_COUNT]:
+                f.write(f"{stat}\n")
+
+    def write_summary(self) -> str:
+        """
+        Write a combined summary of the hottest functions and the per-phase
+        timings across all profiled tests
+
+        Returns:
+            Name of the summary file
+        """
+        import io
+        import os
+        import pstats
+
+        summary_file = os.path.join(self.__output_directory, "summary.txt")
+        if not self.__profiles:
+            return summary_file
+
+        stream = io.StringIO()
+        stats = pstats.Stats(*self.__profiles, stream=stream)
+        stats.dump_stats(os.path.join(self.__output_directory, "combined.prof"))
+
+        # Don't list every profile file in the header of the summary
+        stats.files = []
+
+        stream.write("Per-phase timing and peak traced memory\n")
+        stream.write(f"{'test':<60s} {'phase':<30s} {'wall (s)':>10s} {'peak (MB)':>10s}\n")
+        for phase in self.__phases:
+            stream.write(
+                f"{phase['test']:<60s} {phase['phase']:<30s} "
+                f"{phase['wall_time_s']:>10.2f} {phase['peak_traced_mb']:>10.1f}\n"
+            )
+
+        stream.write("\nHot functions by internal time\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.TOP_FUNCTION_COUNT)
+        stream.write("\nHot functions by cumulative time\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.TOP_FUNCTION_COUNT)
+
+        with open(summary_file, "w") as f:
+            f.write(stream.getvalue())
+
+        logger.info(f"Profile summary written to {summary_file}")
+        return summary_file
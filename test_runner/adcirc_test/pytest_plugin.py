@@ -0,0 +1,306 @@
+import logging
+
+import pytest
+
+logger = logging.getLogger(__name__)
+
+
+def pytest_addoption(parser):
+    """
+    Add the options of the ADCIRC test suite to pytest
+    """
+    group = parser.getgroup("adcirc", "ADCIRC test suite")
+    group.addoption(
+        "--adcirc-bin",
+        type=str,
+        help="Path to the ADCIRC binary directory. The cases are skipped when it is not given",
+        default=None,
+    )
+    group.addoption(
+        "--tolerance",
+        type=float,
+        help="Tolerance for the test results (default: 1e-5)",
+        default=1e-5,
+    )
+    group.addoption(
+        "--adcirc-test-root",
+        type=str,
+        help="Root directory for tests (default: the directory of the test yaml file)",
+        default=None,
+    )
+    group.addoption(
+        "--adcirc-cpus",
+        type=int,
+        help="Number of MPI ranks run at the same time by all workers (default: number of cpus)",
+        default=None,
+    )
+    group.addoption(
+        "--adcirc-slot-dir",
+        type=str,
+        help="Directory of the lock files shared by the workers (default: in the temporary directory)",
+        default=None,
+    )
+    group.addoption(
+        "--adcirc-pin-cpus",
+        action="store_true",
+        help="Bind adcprep and the model to the cpus of the rank slots they hold",
+    )
+    group.addoption(
+        "--adcirc-max-memory",
+        type=str,
+        help="Memory shared by the cases of all workers (i.e. 64G). A phase only starts when the estimated peak "
+        "memory of its case fits next to the running cases",
+        default=None,
+    )
+    group.addoption(
+        "--adcirc-plots",
+        action="store_true",
+        help="Plot the results of each case after its last phase",
+    )
+    parser.addini(
+        "adcirc_test_yaml",
+        type="linelist",
+        help="Glob patterns of the test yaml files collected as ADCIRC cases. Other yaml "
+        "files (i.e. test_list_scaled.yaml) are collected when given on the command line",
+        default=["test_list.yaml"],
+    )
+
+
+def pytest_configure(config):
+    """
+    Register the marker of the cases and keep the phases of a case on one worker
+    """
+    config.addinivalue_line("markers", "adcirc: ADCIRC test suite case")
+    if not config.pluginmanager.hasplugin("xdist"):
+        config.addinivalue_line("markers", "xdist_group(name): pytest-xdist group")
+
+    # The phases of a case share its directory and the hot start needs the cold
+    # start outputs, so the items of a case are grouped on one xdist worker.
+    # xdist uses the load schedule for -n unless told otherwise.
+    if getattr(config.option, "dist", "no") == "load":
+        config.option.dist = "loadgroup"
+
+
+def pytest_collect_file(parent, file_path):
+    """
+    Collect the cases of the test yaml files, and of the yaml files given on
+    the command line
+    """
+    import fnmatch
+
+    patterns = parent.config.getini("adcirc_test_yaml")
+    if any(fnmatch.fnmatch(file_path.name, p) for p in patterns) or (
+        file_path.suffix == ".yaml" and parent.session.isinitpath(file_path)
+    ):
+        return AdcircYamlFile.from_parent(parent, path=file_path)
+    return None
+
+
+class AdcircCaseFailure(Exception):
+    """
+    Raised when a phase of a case does not match the control solution
+    """
+
+
+class AdcircYamlFile(pytest.File):
+    """
+    Test yaml file, holding one collector per case
+    """
+
+    def collect(self):
+        import yaml
+
+        with open(self.path) as f:
+            test_info = yaml.safe_load(f)
+        for test_name, test_yaml in test_info.get("tests", {}).items():
+            yield AdcircCase.from_parent(self, name=test_name, test_yaml=test_yaml)
+
+
+class AdcircCase(pytest.Collector):
+    """
+    Case of the test suite, holding one item per phase (coldstart, hotstart).
+    The AdcircTest object and the status of the phases are shared by the items.
+    """
+
+    def __init__(self, *, test_yaml: dict, **kwargs):
+        super().__init__(**kwargs)
+        self.test_yaml = test_yaml
+        self.status = {}
+        self.__test = None
+        self.__finished = False
+        self.add_marker(pytest.mark.adcirc)
+        self.add_marker(pytest.mark.xdist_group(name=self.name))
+
+    @property
+    def phases(self) -> list:
+        """
+        Names of the phases of the case in run order
+        """
+        if self.test_yaml.get("hotstart", False):
+            return ["coldstart", "hotstart"]
+        return ["coldstart"]
+
+    def collect(self):
+        for phase in self.phases:
+            yield AdcircPhaseItem.from_parent(self, name=phase, phase=phase)
+
+    @property
+    def test_root(self) -> str:
+        """
+        Root directory of the tests of the case
+        """
+        import os
+
+        test_root = self.config.getoption("adcirc_test_root")
+        if test_root is None:
+            test_root = os.path.dirname(str(self.path))
+        return test_root
+
+    def adcirc_test(self):
+        """
+        Get the AdcircTest object of the case, creating it and cleaning the case
+        directory on first use
+
+        Returns:
+            AdcircTest object
+        """
+        from .adcirctest import AdcircTest, AdcircTestOptions
+
+        if self.__test is None:
+            config = self.config
+            self.__test = AdcircTest(
+                self.name,
+                self.test_yaml,
+                config.getoption("adcirc_bin"),
+                self.test_root,
+                config.getoption("tolerance"),
+                options=AdcircTestOptions(
+                    cpu_pool=rank_slot_pool(config),
+                    pin_cpus=config.getoption("adcirc_pin_cpus"),
+                ),
+            )
+            self.__test.clean()
+        return self.__test
+
+    def finish(self) -> None:
+        """
+        Plot the results when requested and release the output data of the case
+        """
+        if self.__test is None or self.__finished:
+            return
+        self.__finished = True
+        if self.config.getoption("adcirc_plots"):
+            status = dict(self.status)
+            status["overall"] = {
+                "passed": all(s["passed"] for s in self.status.values())
+            }
+            self.__test.plot(status)
+        self.__test.release()
+
+
+def rank_slot_pool(config):
+    """
+    Get the rank slot pool of a pytest run
+
+    Args:
+        config: pytest configuration
+
+    Returns:
+        RankSlotPool shared by the workers
+    """
+    import os
+
+    from .slots import RankSlotPool
+
+    if not hasattr(config, "_adcirc_slot_pool"):
+        cpus = config.getoption("adcirc_cpus")
+        config._adcirc_slot_pool = RankSlotPool(
+            cpus if cpus else os.cpu_count() or 1,
+            config.getoption("adcirc_slot_dir"),
+        )
+    return config._adcirc_slot_pool
+
+
+def memory_budget(config):
+    """
+    Get the memory budget of a pytest run
+
+    Args:
+        config: pytest configuration
+
+    Returns:
+        MemoryBudget shared by the workers, or None without --adcirc-max-memory
+    """
+    from .memory import MemoryBudget, parse_memory
+
+    max_memory = config.getoption("adcirc_max_memory")
+    if not max_memory:
+        return None
+    if not hasattr(config, "_adcirc_memory_budget"):
+        config._adcirc_memory_budget = MemoryBudget(
+            parse_memory(max_memory), config.getoption("adcirc_slot_dir")
+        )
+    return config._adcirc_memory_budget
+
+
+class AdcircPhaseItem(pytest.Item):
+    """
+    Phase of a case. The item runs the phase, which waits for as many rank slots
+    as the model uses MPI ranks, and compares its outputs to the control solution.
+    """
+
+    def __init__(self, *, phase: str, **kwargs):
+        super().__init__(**kwargs)
+        self.phase = phase
+
+    def runtest(self):
+        import os
+        from contextlib import nullcontext
+
+        from .memory import estimate_memory
+
+        case = self.parent
+        if not self.config.getoption("adcirc_bin"):
+            pytest.skip("--adcirc-bin was not given")
+
+        test = case.adcirc_test()
+        budget = memory_budget(self.config)
+        if budget is not None:
+            estimate, _ = estimate_memory(
+                os.path.join(case.test_root, case.test_yaml["path"]), case.test_yaml
+            )
+            reservation = budget.reserve(case.name, estimate)
+        else:
+            reservation = nullcontext()
+
+        status = None
+        with reservation:
+            try:
+                # A hot start selected without its cold start (i.e. with -k) runs the
+                # cold start first
+                if self.phase == "hotstart" and "coldstart" not in case.status:
+                    case.status["coldstart"] = test.run_phase("coldstart")
+                if self.phase == "hotstart" and not case.status["coldstart"]["passed"]:
+                    pytest.skip("the cold start of the case failed")
+
+                status = test.run_phase(self.phase)
+                case.status[self.phase] = status
+            finally:
+                if status is None or not status["passed"] or self.phase == case.phases[-1]:
+                    case.finish()
+
+        if status.get("timed_out", False):
+            raise AdcircCaseFailure(f"{self.phase} timed out: {status['reason']}")
+        if not status["passed"]:
+            raise AdcircCaseFailure(
+                f"{self.phase} differs from the control solution in: "
+                f"{', '.join(status['failed_files'])}"
+            )
+
+    def repr_failure(self, excinfo):
+        if isinstance(excinfo.value, AdcircCaseFailure):
+            return str(excinfo.value)
+        return super().repr_failure(excinfo)
+
+    def reportinfo(self):
+        return self.path, None, f"{self.parent.name}::{self.phase}"
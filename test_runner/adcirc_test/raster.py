@@ -0,0 +1,181 @@
+import logging
+from typing import List
+
+import numpy as np
+
+from .geometry import MeshGeometry
+
+logger = logging.getLogger(__name__)
+
+# Renderers used for the max/min maps
+RENDERERS = ["contour", "raster"]
+
+# Number of pixels passed to the trifinder at once
+TRIFINDER_BLOCK_SIZE = 1000000
+
+
+class RasterWeights:
+    """
+    Interpolation weights from the nodes of a mesh to the pixels of an image
+
+    Each pixel inside the mesh stores the three nodes of the element that
+    contains its center and the barycentric weights of the center within that
+    element. A field is rasterized with a weighted gather of its nodal values,
+    so the element search is only done once per mesh and resolution. Pixels in
+    elements with a nan value are nan.
+    """
+
+    def __init__(
+        self,
+        shape: tuple,
+        extent: np.ndarray,
+        pixels: np.ndarray,
+        nodes: np.ndarray,
+        weights: np.ndarray,
+    ):
+        """
+        Initialize the weights
+
+        Args:
+            shape: Shape of the image (rows, columns)
+            extent: Extent of the image in the plot projection (x_min, x_max, y_min, y_max)
+            pixels: Flat indices of the pixels inside the mesh
+            nodes: Zero based node numbers of the element containing each pixel
+            weights: Barycentric weights of each pixel
+        """
+        self.__shape = tuple(int(s) for s in shape)
+        self.__extent = extent
+        self.__pixels = pixels
+        self.__nodes = nodes
+        self.__weights = weights
+
+    @property
+    def shape(self) -> tuple:
+        """
+        Shape of the image (rows, columns)
+        """
+        return self.__shape
+
+    @property
+    def extent(self) -> List[float]:
+        """
+        Extent of the image in the plot projection (x_min, x_max, y_min, y_max)
+        """
+        return [float(v) for v in self.__extent]
+
+    def render(self, field: np.ndarray) -> np.ndarray:
+        """
+        Rasterize a nodal field
+
+        Args:
+            field: Value at each node of the mesh
+
+        Returns:
+            Image with shape (rows, columns), nan outside of the mesh
+        """
+        image = np.full(self.__shape[0] * self.__shape[1], np.nan)
+        image[self.__pixels] = np.einsum(
+            "ij,ij->i", self.__weights, np.asarray(field)[self.__nodes]
+        )
+        return image.reshape(self.__shape)
+
+    def save(self, filename: str) -> None:
+        """
+        Write the weights to a npz file
+
+        Args:
+            filename: Name of the file
+        """
+        import os
+
+        temp_file = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_file, "wb") as f:
+            np.savez(
+                f,
+                shape=np.array(self.__shape),
+                extent=self.__extent,
+                pixels=self.__pixels,
+                nodes=self.__nodes,
+                weights=self.__weights,
+            )
+        os.replace(temp_file, filename)
+
+    @staticmethod
+    def load(filename: str) -> "RasterWeights":
+        """
+        Read weights from a npz file
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            RasterWeights object
+        """
+        with np.load(filename) as data:
+            return RasterWeights(
+                tuple(data["shape"]),
+                data["extent"],
+                data["pixels"],
+                data["nodes"],
+                data["weights"],
+            )
+
+    @staticmethod
+    def compute(geometry: MeshGeometry, resolution: int) -> "RasterWeights":
+        """
+        Compute the weights for a mesh
+
+        Args:
+            geometry: Geometry of the mesh in the plot projection
+            resolution: Number of pixels along the longest side of the image
+
+        Returns:
+            RasterWeights object
+        """
+        x = geometry.x
+        y = geometry.y
+        valid = np.isfinite(x) & np.isfinite(y)
+        extent = np.array(
+            [x[valid].min(), x[valid].max(), y[valid].min(), y[valid].max()]
+        )
+        width = extent[1] - extent[0]
+        height = extent[3] - extent[2]
+        if width >= height:
+            columns = resolution
+            rows = max(1, int(round(resolution * height / width)))
+        else:
+            rows = resolution
+            columns = max(1, int(round(resolution * width / height)))
+
+        # Pixel centers
+        x_pixels = extent[0] + (np.arange(columns) + 0.5) * width / columns
+        y_pixels = extent[2] + (np.arange(rows) + 0.5) * height / rows
+        x_grid, y_grid = np.meshgrid(x_pixels, y_pixels)
+        x_grid = x_grid.ravel()
+        y_grid = y_grid.ravel()
+
+        trifinder = geometry.triangulation().get_trifinder()
+        elements = np.empty(x_grid.size, dtype=np.int64)
+        for start in range(0, x_grid.size, TRIFINDER_BLOCK_SIZE):
+            end = start + TRIFINDER_BLOCK_SIZE
+            elements[start:end] = trifinder(x_grid[start:end], y_grid[start:end])
+
+        pixels = np.where(elements >= 0)[0]
+        nodes = geometry.triangles[elements[pixels]]
+        px = x_grid[pixels]
+        py = y_grid[pixels]
+        x0, x1, x2 = x[nodes].T
+        y0, y1, y2 = y[nodes].T
+
+        det = (y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2)
+        w0 = ((y1 - y2) * (px - x2) + (x2 - x1) * (py - y2)) / det
+        w1 = ((y2 - y0) * (px - x2) + (x0 - x2) * (py - y2)) / det
+        weights = np.stack([w0, w1, 1.0 - w0 - w1], axis=1).astype(np.float32)
+
+        logger.debug(
+            f"Computed raster weights: {columns}x{rows} pixels, {pixels.size} inside the mesh"
+        )
+
+        return RasterWeights(
+            (rows, columns), extent, pixels, nodes.astype(np.int32), weights
+        )
@@ -0,0 +1,388 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+def _clock_ticks() -> int:
+    """
+    Get the number of clock ticks per second used by /proc
+
+    Returns:
+        Clock ticks per second
+    """
+    import os
+
+    try:
+        return os.sysconf("SC_CLK_TCK")
+    except (ValueError, OSError, AttributeError):
+        return 100
+
+
+def _read_proc_stat(pid: int) -> Optional[Tuple[str, int, float, float]]:
+    """
+    Read the name, parent pid and cpu times of a process from /proc
+
+    Args:
+        pid: Process id
+
+    Returns:
+        Tuple of (name, parent pid, user cpu seconds, system cpu seconds) or None
+        if the process no longer exists
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+
+    # The process name is enclosed in parentheses and may contain spaces
+    name = stat[stat.find("(") + 1 : stat.rfind(")")]
+    fields = stat[stat.rfind(")") + 2 :].split()
+    ticks = _clock_ticks()
+    ppid = int(fields[1])
+    user_cpu = int(fields[11]) / ticks
+    system_cpu = int(fields[12]) / ticks
+    return name, ppid, user_cpu, system_cpu
+
+
+def _read_proc_memory(pid: Union[int, str]) -> Optional[Tuple[float, float]]:
+    """
+    Read the current and peak resident set size of a process from /proc
+
+    Args:
+        pid: Process id, or "self" for the harness process
+
+    Returns:
+        Tuple of (current rss, peak rss) in megabytes or None if the process
+        no longer exists
+    """
+    rss = 0.0
+    hwm = 0.0
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = float(line.split()[1]) / 1024.0
+                elif line.startswith("VmHWM:"):
+                    hwm = float(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return rss, max(rss, hwm)
+
+
+def process_tree(root_pid: int) -> List[int]:
+    """
+    Find a process and all of its descendants using /proc
+
+    Args:
+        root_pid: Process id at the root of the tree
+
+    Returns:
+        List of process ids in the tree, including the root
+    """
+    import os
+
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = _read_proc_stat(int(entry))
+        if stat is None:
+            continue
+        children.setdefault(stat[1], []).append(int(entry))
+
+    tree = []
+    queue = [root_pid]
+    while queue:
+        pid = queue.pop()
+        tree.append(pid)
+        queue.extend(children.get(pid, []))
+    return tree
+
+
+def _rusage_tuple(usage) -> Tuple[float, float, float]:
+    """
+    Convert a rusage structure to cpu times and peak memory
+
+    Args:
+        usage: rusage structure from os.wait4 or resource.getrusage
+
+    Returns:
+        Tuple of (user cpu seconds, system cpu seconds, max rss in megabytes)
+    """
+    import sys
+
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    if sys.platform == "darwin":
+        max_rss = usage.ru_maxrss / 1024.0 / 1024.0
+    else:
+        max_rss = usage.ru_maxrss / 1024.0
+    return usage.ru_utime, usage.ru_stime, max_rss
+
+
+class ProcessTreeMonitor:
+    """
+    Samples the peak memory and cpu time of a process and all of its
+    descendants (i.e. mpirun and each of the MPI ranks) while it runs
+    """
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        """
+        Initialize the monitor
+
+        Args:
+            pid: Process id of the launched executable
+            interval: Sampling interval in seconds
+        """
+        import os
+
+        self.__pid = pid
+        self.__interval = interval
+        self.__processes: Dict[int, dict] = {}
+        self.__has_proc = os.path.isdir("/proc")
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__start_time = None
+        self.__end_time = None
+        self.__rusage = None
+
+    def start(self) -> None:
+        """
+        Start sampling the process tree in a background thread
+        """
+        import time
+
+        self.__start_time = time.perf_counter()
+        if self.__has_proc:
+            self.__thread = threading.Thread(target=self.__sample_loop, daemon=True)
+            self.__thread.start()
+
+    def wait(self, process) -> int:
+        """
+        Wait for the process to complete and capture its rusage. The rusage
+        includes all descendants the process waited for (i.e. the MPI ranks
+        launched by mpirun).
+
+        Args:
+            process: subprocess.Popen object being monitored
+
+        Returns:
+            Return code of the process
+        """
+        import os
+
+        if not hasattr(os, "wait4") or process.returncode is not None:
+            return process.wait()
+
+        try:
+            _, wait_status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait()
+
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+        self.__rusage = _rusage_tuple(usage)
+        return process.returncode
+
+    def stop(self) -> dict:
+        """
+        Stop sampling
+
+        Returns:
+            Dictionary with the resource summary
+        """
+        import time
+
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__end_time = time.perf_counter()
+        return self.summary()
+
+    def __sample_loop(self) -> None:
+        """
+        Sample the process tree until stopped
+        """
+        while True:
+            self.__sample()
+            if self.__stop_event.wait(self.__interval):
+                break
+
+    def __sample(self) -> None:
+        """
+        Take a single sample of every process in the tree
+        """
+        for pid in process_tree(self.__pid):
+            stat = _read_proc_stat(pid)
+            memory = _read_proc_memory(pid)
+            if stat is None or memory is None:
+                continue
+            record = self.__processes.setdefault(
+                pid,
+                {
+                    "pid": pid,
+                    "name": stat[0],
+                    "peak_rss_mb": 0.0,
+                    "user_cpu_s": 0.0,
+                    "system_cpu_s": 0.0,
+                },
+            )
+            record["peak_rss_mb"] = max(record["peak_rss_mb"], memory[1])
+            record["user_cpu_s"] = max(record["user_cpu_s"], stat[2])
+            record["system_cpu_s"] = max(record["system_cpu_s"], stat[3])
+
+    def summary(self) -> dict:
+        """
+        Summarize the resource usage of the process tree
+
+        Returns:
+            Dictionary with wall time, cpu time, peak rss of the largest process,
+            sum of the per-process peaks and the per-process records
+        """
+        processes = sorted(self.__processes.values(), key=lambda p: p["pid"])
+
+        if self.__rusage:
+            user_cpu, system_cpu, peak_rss = self.__rusage
+        else:
+            user_cpu = sum(p["user_cpu_s"] for p in processes)
+            system_cpu = sum(p["system_cpu_s"] for p in processes)
+            peak_rss = 0.0
+
+        # Prefer the sampled values since the rusage high water mark can include
+        # the harness memory at the time of the fork. Short-lived processes may
+        # exit before they are sampled, in which case only the rusage is known.
+        if processes:
+            peak_rss = max(p["peak_rss_mb"] for p in processes)
+            total_peak_rss = sum(p["peak_rss_mb"] for p in processes)
+        else:
+            total_peak_rss = peak_rss
+
+        if self.__start_time is not None and self.__end_time is not None:
+            wall_time = self.__end_time - self.__start_time
+        else:
+            wall_time = 0.0
+
+        return {
+            "wall_time_s": wall_time,
+            "user_cpu_s": user_cpu,
+            "system_cpu_s": system_cpu,
+            "peak_rss_mb": peak_rss,
+            "total_peak_rss_mb": total_peak_rss,
+            "processes": processes,
+        }
+
+
+class HarnessMonitor:
+    """
+    Context manager that records the peak memory and cpu time used by the
+    harness itself (i.e. during comparison and plotting)
+    """
+
+    def __init__(self, interval: float = 0.1):
+        """
+        Initialize the monitor
+
+        Args:
+            interval: Sampling interval in seconds
+        """
+        self.__interval = interval
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__start_time = None
+        self.__start_usage = None
+        self.__start_rss = 0.0
+        self.__peak_rss = 0.0
+        self.__summary = {}
+
+    def __enter__(self) -> "HarnessMonitor":
+        import resource
+        import time
+
+        self.__start_time = time.perf_counter()
+        self.__start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        memory = _read_proc_memory("self")
+        if memory is not None:
+            self.__start_rss = memory[0]
+            self.__peak_rss = memory[0]
+            self.__thread = threading.Thread(target=self.__sample_loop, daemon=True)
+            self.__thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        import resource
+        import time
+
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.__sample()
+
+        end_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.__summary = {
+            "wall_time_s": time.perf_counter() - self.__start_time,
+            "user_cpu_s": end_usage.ru_utime - self.__start_usage.ru_utime,
+            "system_cpu_s": end_usage.ru_stime - self.__start_usage.ru_stime,
+            "peak_rss_mb": self.__peak_rss,
+            "rss_increase_mb": max(0.0, self.__peak_rss - self.__start_rss),
+        }
+
+    def __sample_loop(self) -> None:
+        """
+        Sample the harness memory until stopped
+        """
+        while not self.__stop_event.wait(self.__interval):
+            self.__sample()
+
+    def __sample(self) -> None:
+        """
+        Take a single sample of the harness memory
+        """
+        memory = _read_proc_memory("self")
+        if memory is not None:
+            self.__peak_rss = max(self.__peak_rss, memory[0])
+
+    def summary(self) -> dict:
+        """
+        Summarize the resource usage of the harness during the measured block
+
+        Returns:
+            Dictionary with wall time, cpu time and peak rss
+        """
+        return self.__summary
+
+
+def format_resource_summary(test_name: str, usage: dict) -> List[str]:
+    """
+    Format the resource usage of a test into lines suitable for logging
+
+    Args:
+        test_name: Name of the test
+        usage: Resource usage dictionary from AdcircTest.resource_usage()
+
+    Returns:
+        List of formatted lines
+    """
+    lines = [f"Resource usage for test {test_name}:"]
+    for phase_name, phase in usage.items():
+        for step_name, step in phase.items():
+            line = (
+                f"  {phase_name}/{step_name}: wall={step['wall_time_s']:.2f}s "
+                f"user={step['user_cpu_s']:.2f}s sys={step['system_cpu_s']:.2f}s "
+                f"peak_rss={step['peak_rss_mb']:.1f}MB"
+            )
+            if "total_peak_rss_mb" in step:
+                line += f" total_peak_rss={step['total_peak_rss_mb']:.1f}MB"
+            if "cpu_binding" in step:
+                line += f" cpus={step['cpu_binding']['cpus']}"
+
+            lines.append(line)
+            for process in step.get("processes", []):
+                lines.append(
+                    f"    {process['name']} (pid {process['pid']}): "
+                    f"peak_rss={process['peak_rss_mb']:.1f}MB "
+                    f"user={process['user_cpu_s']:.2f}s sys={process['system_cpu_s']:.2f}s"
+                )
+    return lines
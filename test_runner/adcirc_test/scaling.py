@@ -0,0 +1,748 @@
+import logging
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Input files holding values per node or per boundary node, which would no
+# longer match a refined mesh
+NODE_INPUT_FILES = (
+    "fort.10",
+    "fort.11",
+    "fort.19",
+    "fort.20",
+    "fort.23",
+    "fort.24",
+    "fort.67",
+    "fort.68",
+    "fort.88",
+    "fort.141",
+)
+
+# Land boundary types with specified flux, which carry forcing per boundary node
+FLUX_BOUNDARY_TYPES = (2, 12, 22, 32, 52)
+
+
+def _fields(line: str) -> List[str]:
+    """
+    Get the data fields of an input file line, without the trailing comment
+
+    Args:
+        line: Line of the file
+
+    Returns:
+        List of fields
+    """
+    return line.split("!")[0].split()
+
+
+def _replace_fields(line: str, fields: List[str]) -> str:
+    """
+    Replace the data fields of an input file line, keeping its comment
+
+    Args:
+        line: Line of the file
+        fields: New data fields
+
+    Returns:
+        Updated line
+    """
+    data, separator, comment = line.partition("!")
+    indent = data[: len(data) - len(data.lstrip())]
+    new_data = indent + " ".join(fields)
+    if separator:
+        new_data = new_data.ljust(max(len(data) - 1, len(new_data))) + " "
+    return new_data + separator + comment
+
+
+def _format_value(value: float) -> str:
+    """
+    Format a float for an input file without losing precision
+
+    Args:
+        value: Value to format
+
+    Returns:
+        Formatted value
+    """
+    return f"{value:.10g}"
+
+
+def read_mesh_file(filename: str) -> dict:
+    """
+    Read an ADCIRC mesh (fort.14) including its boundaries
+
+    Args:
+        filename: Name of the mesh file
+
+    Returns:
+        Dictionary with the title, the nodes (columns x, y, depth), the elements
+        (one based node numbers), the open boundaries (lists of node numbers), the
+        land boundaries (list of (ibtype, rows) where each row is a tuple of its
+        node numbers and its values) and the land boundary node count (nvel)
+    """
+    with open(filename, "r") as f:
+        title = f.readline().rstrip("\n")
+        header = _fields(f.readline())
+        element_count = int(header[0])
+        node_count = int(header[1])
+        nodes = np.array(
+            [f.readline().split()[1:4] for _ in range(node_count)], dtype=float
+        ).reshape((node_count, 3))
+        elements = np.array(
+            [f.readline().split()[2:5] for _ in range(element_count)], dtype=np.int64
+        ).reshape((element_count, 3))
+
+        open_boundaries = []
+        open_count = int(_fields(f.readline())[0])
+        f.readline()
+        for _ in range(open_count):
+            size = int(_fields(f.readline())[0])
+            open_boundaries.append([int(_fields(f.readline())[0]) for _ in range(size)])
+
+        land_boundaries = []
+        land_count = int(_fields(f.readline())[0])
+        nvel = int(_fields(f.readline())[0])
+        for _ in range(land_count):
+            size, ibtype = (int(v) for v in _fields(f.readline())[:2])
+            node_columns = boundary_node_columns(ibtype)
+            rows = []
+            for _ in range(size):
+                fields = _fields(f.readline())
+                rows.append(
+                    (
+                        tuple(int(v) for v in fields[:node_columns]),
+                        tuple(float(v) for v in fields[node_columns:]),
+                    )
+                )
+            land_boundaries.append((ibtype, rows))
+
+    return {
+        "title": title,
+        "nodes": nodes,
+        "elements": elements,
+        "open_boundaries": open_boundaries,
+        "land_boundaries": land_boundaries,
+        "nvel": nvel,
+    }
+
+
+def write_mesh_file(filename: str, mesh: dict) -> None:
+    """
+    Write an ADCIRC mesh (fort.14) including its boundaries
+
+    Args:
+        filename: Name of the mesh file
+        mesh: Mesh dictionary (see read_mesh_file)
+    """
+    nodes = mesh["nodes"]
+    elements = mesh["elements"]
+    with open(filename, "w") as f:
+        f.write(f"{mesh['title']}\n")
+        f.write(f"{len(elements)} {len(nodes)}\n")
+        np.savetxt(
+            f,
+            np.column_stack([np.arange(1, len(nodes) + 1), nodes]),
+            fmt="%d %.10g %.10g %.10g",
+        )
+        np.savetxt(
+            f,
+            np.column_stack(
+                [np.arange(1, len(elements) + 1), np.full(len(elements), 3), elements]
+            ),
+            fmt="%d",
+        )
+
+        open_boundaries = mesh["open_boundaries"]
+        f.write(f"{len(open_boundaries)} ! NOPE\n")
+        f.write(f"{sum(len(b) for b in open_boundaries)} ! NETA\n")
+        for boundary in open_boundaries:
+            f.write(f"{len(boundary)}\n")
+            f.writelines(f"{node}\n" for node in boundary)
+
+        land_boundaries = mesh["land_boundaries"]
+        f.write(f"{len(land_boundaries)} ! NBOU\n")
+        f.write(f"{mesh['nvel']} ! NVEL\n")
+        for ibtype, rows in land_boundaries:
+            f.write(f"{len(rows)} {ibtype}\n")
+            for row_nodes, row_values in rows:
+                fields = [str(n) for n in row_nodes] + [_format_value(v) for v in row_values]
+                f.write(" ".join(fields) + "\n")
+
+
+def boundary_node_columns(ibtype: int) -> int:
+    """
+    Get the number of node columns in the rows of a land boundary type
+
+    Args:
+        ibtype: Land boundary type
+
+    Returns:
+        2 for boundaries made of node pairs (internal barriers), 1 otherwise
+    """
+    return 2 if ibtype % 10 in (4, 5) or ibtype == 64 else 1
+
+
+def mesh_edges(elements: np.ndarray, node_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the edges of a mesh
+
+    Args:
+        elements: Elements with one based node numbers
+        node_count: Number of nodes
+
+    Returns:
+        Tuple of (edges as zero based node pairs with the lower number first,
+        index of the edges ab, bc and ca of each element)
+    """
+    a, b, c = (elements[:, i] - 1 for i in range(3))
+    pairs = np.stack([np.stack([a, b], 1), np.stack([b, c], 1), np.stack([c, a], 1)], 1)
+    keys = pairs.min(axis=2) * node_count + pairs.max(axis=2)
+    unique_keys, inverse = np.unique(keys.ravel(), return_inverse=True)
+    edges = np.column_stack([unique_keys // node_count, unique_keys % node_count])
+    return edges, inverse.reshape(keys.shape)
+
+
+def subdivided_node_count(mesh_file: str, divisions: int) -> int:
+    """
+    Get the node count of a mesh after subdivide_mesh, without subdividing it
+
+    Args:
+        mesh_file: Name of the mesh file
+        divisions: Number of segments each edge is split into
+
+    Returns:
+        Number of nodes
+    """
+    mesh = read_mesh_file(mesh_file)
+    edges, _ = mesh_edges(mesh["elements"], len(mesh["nodes"]))
+    return (
+        len(mesh["nodes"])
+        + len(edges) * (divisions - 1)
+        + len(mesh["elements"]) * (divisions - 1) * (divisions - 2) // 2
+    )
+
+
+def divisions_for_node_count(mesh_file: str, target_nodes: int) -> Tuple[int, int]:
+    """
+    Get the smallest subdivision of a mesh reaching a node count
+
+    Args:
+        mesh_file: Name of the mesh file
+        target_nodes: Smallest acceptable node count
+
+    Returns:
+        Tuple of (number of segments each edge is split into, node count)
+    """
+    divisions = 1
+    node_count = subdivided_node_count(mesh_file, divisions)
+    while node_count < target_nodes:
+        divisions += 1
+        node_count = subdivided_node_count(mesh_file, divisions)
+    return divisions, node_count
+
+
+def subdivide_mesh(
+    nodes: np.ndarray, elements: np.ndarray, divisions: int, geographic: bool
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Split every edge of a mesh into equal segments and each element into the
+    divisions**2 similar elements they define. The existing nodes keep their
+    numbers. The nodes on the edges follow, divisions - 1 per edge in the order
+    of the edges from their lower numbered node, then the nodes inside each element.
+
+    Args:
+        nodes: Nodes with columns x, y, depth
+        elements: Elements with one based node numbers
+        divisions: Number of segments each edge is split into
+        geographic: Whether the coordinates are longitude and latitude, in which
+            case elements crossing the dateline are handled
+
+    Returns:
+        Tuple of (nodes, elements, parents, weights, edges). Each added node is the
+        weighted sum of three zero based parent nodes. The edges are those of
+        the original mesh (see mesh_edges).
+    """
+    n = divisions
+    node_count = len(nodes)
+    element_count = len(elements)
+    edges, element_edges = mesh_edges(elements, node_count)
+    edge_count = len(edges)
+    interior_count = (n - 1) * (n - 2) // 2
+    a, b, c = (elements[:, i] - 1 for i in range(3))
+
+    def edge_node(edge: np.ndarray, start: np.ndarray, end: np.ndarray, step: int) -> np.ndarray:
+        # Node "step" segments from start towards end along the edge
+        step = np.where(start < end, step, n - step)
+        return node_count + edge * (n - 1) + step - 1
+
+    # Node numbers at the lattice points (i, j) of each element, the point
+    # a + i / n * (b - a) + j / n * (c - a)
+    lattice = {}
+    interior = []
+    for i in range(n + 1):
+        for j in range(n + 1 - i):
+            if (i, j) == (0, 0):
+                lattice[i, j] = a
+            elif (i, j) == (n, 0):
+                lattice[i, j] = b
+            elif (i, j) == (0, n):
+                lattice[i, j] = c
+            elif j == 0:
+                lattice[i, j] = edge_node(element_edges[:, 0], a, b, i)
+            elif i + j == n:
+                lattice[i, j] = edge_node(element_edges[:, 1], b, c, j)
+            elif i == 0:
+                lattice[i, j] = edge_node(element_edges[:, 2], c, a, n - j)
+            else:
+                lattice[i, j] = (
+                    node_count
+                    + edge_count * (n - 1)
+                    + np.arange(element_count) * interior_count
+                    + len(interior)
+                )
+                interior.append((i, j))
+
+    triangles = []
+    for i, j in lattice:
+        if i + j <= n - 1:
+            triangles.append((lattice[i, j], lattice[i + 1, j], lattice[i, j + 1]))
+        if i + j <= n - 2:
+            triangles.append((lattice[i + 1, j], lattice[i + 1, j + 1], lattice[i, j + 1]))
+    new_elements = np.stack([np.stack(t, 1) for t in triangles], 1).reshape((-1, 3)) + 1
+
+    steps = np.arange(1, n) / n
+    edge_parents = np.stack(
+        [
+            np.repeat(edges[:, 0], n - 1),
+            np.repeat(edges[:, 1], n - 1),
+            np.repeat(edges[:, 0], n - 1),
+        ],
+        1,
+    )
+    edge_weights = np.column_stack(
+        [np.tile(1.0 - steps, edge_count), np.tile(steps, edge_count), np.zeros(edge_count * (n - 1))]
+    )
+    interior_parents = np.repeat(np.stack([a, b, c], 1), interior_count, axis=0)
+    interior_weights = np.tile(
+        np.array([((n - i - j) / n, i / n, j / n) for i, j in interior]).reshape((-1, 3)),
+        (element_count, 1),
+    )
+    parents = np.concatenate([edge_parents, interior_parents])
+    weights = np.concatenate([edge_weights, interior_weights])
+
+    values = nodes[parents]
+    if geographic:
+        # Longitudes of an element that wraps around the dateline are taken on
+        # the side of its first parent, and the added node is wrapped back
+        shift = np.round((values[:, :, 0] - values[:, :1, 0]) / 360.0)
+        values[:, :, 0] -= 360.0 * shift
+        wrapped = np.any(shift != 0.0, axis=1)
+    new_nodes = np.einsum("mp,mpk->mk", weights, values)
+    if geographic:
+        longitude = new_nodes[wrapped, 0]
+        new_nodes[wrapped, 0] = (longitude + 180.0) % 360.0 - 180.0
+
+    return np.concatenate([nodes, new_nodes]), new_elements, parents, weights, edges
+
+
+def edge_node_lookup(
+    edges: np.ndarray, node_count: int, divisions: int
+) -> Callable[[int, int], List[int]]:
+    """
+    Build a function giving the nodes added on an edge by subdivide_mesh
+
+    Args:
+        edges: Edges returned by subdivide_mesh
+        node_count: Number of nodes before the subdivision
+        divisions: Number of segments each edge was split into
+
+    Returns:
+        Function of two one based node numbers returning the one based node
+        numbers added between them, in order from the first
+    """
+    keys = edges[:, 0] * node_count + edges[:, 1]
+
+    def lookup(first: int, second: int) -> List[int]:
+        low, high = sorted((first - 1, second - 1))
+        key = low * node_count + high
+        index = int(np.searchsorted(keys, key))
+        if index == len(keys) or keys[index] != key:
+            msg = f"Boundary nodes {first} and {second} do not share an element edge"
+            raise ValueError(msg)
+        added = [node_count + index * (divisions - 1) + step + 1 for step in range(divisions - 1)]
+        return added if first < second else added[::-1]
+
+    return lookup
+
+
+def insert_between(items: list, closed: bool, between: Callable[..., list]) -> list:
+    """
+    Insert items between each pair of consecutive items of a sequence
+
+    Args:
+        items: Sequence along a boundary
+        closed: Whether the last item is followed by the first (island boundaries)
+        between: Function of two consecutive items returning the items inserted
+            between them
+
+    Returns:
+        Refined sequence
+    """
+    pairs = list(zip(items, items[1:]))
+    if closed and len(items) > 1:
+        pairs.append((items[-1], items[0]))
+
+    refined = items[:1]
+    for index, (first, second) in enumerate(pairs):
+        refined.extend(between(first, second))
+        if index + 1 < len(items):
+            refined.append(second)
+    return refined
+
+
+def refine_boundaries(mesh: dict, lookup: Callable[[int, int], List[int]], divisions: int) -> None:
+    """
+    Refine the open and land boundaries of a mesh in place after subdivide_mesh
+
+    Args:
+        mesh: Mesh dictionary (see read_mesh_file)
+        lookup: Edge node lookup (see edge_node_lookup)
+        divisions: Number of segments each edge was split into
+    """
+    mesh["open_boundaries"] = [
+        insert_between(boundary, False, lookup) for boundary in mesh["open_boundaries"]
+    ]
+
+    def rows_between(first: tuple, second: tuple) -> list:
+        # Some meshes repeat a node, i.e. to close an island explicitly
+        if first[0] == second[0]:
+            return []
+        columns = [lookup(n1, n2) for n1, n2 in zip(first[0], second[0])]
+        rows = []
+        for step in range(1, divisions):
+            t = step / divisions
+            row_values = tuple(v1 + t * (v2 - v1) for v1, v2 in zip(first[1], second[1]))
+            rows.append((tuple(column[step - 1] for column in columns), row_values))
+        return rows
+
+    # The land boundary node count lists the two nodes of each pair in
+    # some meshes and one row per pair in others
+    rows_before = sum(len(rows) for _, rows in mesh["land_boundaries"])
+    pair_rows_before = sum(
+        len(rows) for ibtype, rows in mesh["land_boundaries"] if boundary_node_columns(ibtype) == 2
+    )
+    pairs_counted_twice = pair_rows_before > 0 and mesh["nvel"] == rows_before + pair_rows_before
+
+    mesh["land_boundaries"] = [
+        (ibtype, insert_between(rows, ibtype % 10 == 1 and rows[0][0] != rows[-1][0], rows_between))
+        for ibtype, rows in mesh["land_boundaries"]
+    ]
+    nvel = sum(len(rows) for _, rows in mesh["land_boundaries"])
+    if pairs_counted_twice:
+        nvel += sum(
+            len(rows)
+            for ibtype, rows in mesh["land_boundaries"]
+            if boundary_node_columns(ibtype) == 2
+        )
+    mesh["nvel"] = nvel
+
+
+def interpolate_node_values(values: np.ndarray, parents: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Extend values defined at the nodes of a mesh to the nodes added by
+    subdivide_mesh, interpolating linearly from their parent nodes
+
+    Args:
+        values: Array with one row per node
+        parents: Parent nodes returned by subdivide_mesh
+        weights: Parent weights returned by subdivide_mesh
+
+    Returns:
+        Array with one row per node of the subdivided mesh
+    """
+    return np.concatenate([values, np.einsum("mp,mpk->mk", weights, values[parents])])
+
+
+def refine_nodal_attributes(
+    input_file: str, output_file: str, parents: np.ndarray, weights: np.ndarray
+) -> None:
+    """
+    Refine a nodal attributes file (fort.13). Values at the added nodes are
+    interpolated from their parent nodes and are listed when they differ from
+    the default value.
+
+    Args:
+        input_file: Nodal attributes file of the original mesh
+        output_file: Nodal attributes file of the subdivided mesh
+        parents: Parent nodes returned by subdivide_mesh
+        weights: Parent weights returned by subdivide_mesh
+    """
+    with open(input_file, "r") as f:
+        title = f.readline().rstrip("\n")
+        node_count = int(_fields(f.readline())[0])
+        attribute_count = int(_fields(f.readline())[0])
+        attributes = []
+        for _ in range(attribute_count):
+            name = f.readline().strip()
+            units = f.readline().strip()
+            value_count = int(_fields(f.readline())[0])
+            defaults = np.array(_fields(f.readline())[:value_count], dtype=float)
+            attributes.append((name, units, defaults))
+
+        values = {}
+        for _ in range(attribute_count):
+            name = f.readline().strip()
+            count = int(_fields(f.readline())[0])
+            defaults = next(d for n, _, d in attributes if n == name)
+            if name == "condensed_nodes":
+                msg = "Nodal attribute condensed_nodes holds node numbers and cannot be refined"
+                raise ValueError(msg)
+            table = np.tile(defaults, (node_count, 1))
+            for _ in range(count):
+                fields = f.readline().split()
+                table[int(fields[0]) - 1] = np.array(fields[1 : 1 + len(defaults)], dtype=float)
+            values[name] = interpolate_node_values(table, parents, weights)
+
+    with open(output_file, "w") as f:
+        f.write(f"{title}\n{node_count + len(parents)}\n{attribute_count}\n")
+        for name, units, defaults in attributes:
+            f.write(f"{name}\n{units}\n{len(defaults)}\n")
+            f.write(" ".join(_format_value(v) for v in defaults) + "\n")
+        for name, _, defaults in attributes:
+            table = values[name]
+            listed = np.flatnonzero(np.any(table != defaults, axis=1))
+            f.write(f"{name}\n{len(listed)}\n")
+            np.savetxt(
+                f,
+                np.column_stack([listed + 1, table[listed]]),
+                fmt="%d" + " %.10g" * len(defaults),
+            )
+
+
+def supported_model(im: int) -> bool:
+    """
+    Check whether a model selection (IM) is one the control file scaling handles,
+    i.e. a barotropic 2DDI run with or without transport
+
+    Args:
+        im: Model selection parameter of the control file
+
+    Returns:
+        True when supported
+    """
+    if im in (0, 10):
+        return True
+    return 100000 <= im < 600000
+
+
+def scale_control_file(
+    input_file: str,
+    output_file: str,
+    divisions: int,
+    open_boundaries: List[List[int]],
+) -> None:
+    """
+    Adjust a control file (fort.15) for a subdivided mesh. The time step is divided
+    like the edges so the Courant number is kept, the output, hot start and
+    harmonic analysis intervals (given in time steps) are multiplied so they stay
+    at the same model times, and the open boundary forcing is interpolated to the
+    added boundary nodes.
+
+    Args:
+        input_file: Control file of the original mesh
+        output_file: Control file of the subdivided mesh
+        divisions: Number of segments each edge was split into
+        open_boundaries: Open boundaries of the original mesh (lists of node numbers)
+    """
+    with open(input_file, "r", newline="") as f:
+        content = f.read()
+    lines = content.splitlines()
+    newline = "\r\n" if "\r\n" in content else "\n"
+    output = []
+    factor = divisions
+    position = 0
+
+    def take(count: int = 1, keep: bool = True) -> List[str]:
+        nonlocal position
+        taken = lines[position : position + count]
+        if len(taken) < count:
+            msg = f"Unexpected end of the control file {input_file}"
+            raise ValueError(msg)
+        position += count
+        if keep:
+            output.extend(taken)
+        return taken
+
+    def value(index: int = 0) -> str:
+        return _fields(take()[0])[index]
+
+    def scale_steps(field: int) -> None:
+        fields = _fields(take()[0])
+        if len(fields) > field:
+            fields[field] = str(int(float(fields[field])) * factor)
+            output[-1] = _replace_fields(output[-1], fields)
+
+    take(4)  # RUNDES, RUNID, NFOVER, NABOUT
+    scale_steps(0)  # NSCREEN
+    take(2)  # IHOT, ICS
+    im = int(value())
+    if not supported_model(im):
+        msg = f"Only 2DDI barotropic runs can be scaled, the control file has IM = {im}"
+        raise ValueError(msg)
+    take(4)  # NOLIBF, NOLIFA, NOLICA, NOLICAT
+    nwp = int(value())
+    take(nwp)  # Nodal attribute names
+    take(1)  # NCOR
+    take(1)  # NTIP
+    nws = int(value())
+    take(2)  # NRAMP, G
+    if float(value()) == -5.0:  # TAU0
+        take(1)  # Tau0FullDomainMin, Tau0FullDomainMax
+
+    fields = _fields(take()[0])
+    fields[0] = _format_value(float(fields[0]) / factor)
+    output[-1] = _replace_fields(output[-1], fields)
+
+    take(2)  # STATIM, REFTIM
+    if abs(nws) % 100 == 3:
+        take(2)  # IREFYR ... REFSEC, NWLAT ... WTIMINC
+    elif abs(nws) % 100 not in (0, 1) or abs(nws) >= 100:
+        take(1)  # WTIMINC
+    take(8)  # RNDAY, DRAMP, A00 B00 C00, H0, SLAM0 SFEA0, TAU/CF, ESLM, CORI
+    ntif = int(value())
+    take(2 * ntif)
+    nbfr = int(value())
+    take(2 * nbfr)
+
+    def forcing_between(first: Tuple[float, float], second: Tuple[float, float]) -> list:
+        # Phases are interpolated the short way around the circle
+        difference = (second[1] - first[1] + 180.0) % 360.0 - 180.0
+        return [
+            (
+                first[0] + step / divisions * (second[0] - first[0]),
+                (first[1] + step / divisions * difference) % 360.0,
+            )
+            for step in range(1, divisions)
+        ]
+
+    for _ in range(nbfr):
+        take(1)  # Constituent name
+        forcing = []
+        for boundary in open_boundaries:
+            rows = [
+                tuple(float(v) for v in _fields(line)[:2])
+                for line in take(len(boundary), keep=False)
+            ]
+            forcing.extend(insert_between(rows, False, forcing_between))
+        output.extend(f" {_format_value(a)} {_format_value(p)}" for a, p in forcing)
+
+    take(1)  # ANGINN
+    scale_steps(3)  # NOUTE, TOUTSE, TOUTFE, NSPOOLE
+    take(abs(int(value())))  # Elevation stations
+    scale_steps(3)  # NOUTV, TOUTSV, TOUTFV, NSPOOLV
+    take(abs(int(value())))  # Velocity stations
+    if im == 10:
+        scale_steps(3)  # NOUTC, TOUTSC, TOUTFC, NSPOOLC
+        take(abs(int(value())))  # Concentration stations
+    if nws != 0:
+        scale_steps(3)  # NOUTM, TOUTSM, TOUTFM, NSPOOLM
+        take(abs(int(value())))  # Meteorological stations
+    scale_steps(3)  # NOUTGE, TOUTSGE, TOUTFGE, NSPOOLGE
+    scale_steps(3)  # NOUTGV, TOUTSGV, TOUTFGV, NSPOOLGV
+    if im == 10:
+        scale_steps(3)  # NOUTGC, TOUTSGC, TOUTFGC, NSPOOLGC
+    if nws != 0:
+        scale_steps(3)  # NOUTGW, TOUTSGW, TOUTFGW, NSPOOLGW
+    nfreq = int(value())
+    take(2 * nfreq)
+    scale_steps(2)  # THAS, THAF, NHAINC, FMV
+    take(1)  # NHASE, NHASV, NHAGE, NHAGV
+    scale_steps(1)  # NHSTAR, NHSINC
+
+    output.extend(lines[position:])
+    with open(output_file, "w", newline="") as f:
+        f.write(newline.join(output) + newline)
+
+
+def check_scalable(directory: str, mesh: dict) -> None:
+    """
+    Check that the inputs of a run can be refined
+
+    Args:
+        directory: Directory of the run
+        mesh: Mesh dictionary (see read_mesh_file)
+    """
+    import os
+
+    node_files = [f for f in NODE_INPUT_FILES if os.path.exists(os.path.join(directory, f))]
+    if node_files:
+        msg = f"{directory} has inputs given per node that cannot be refined: {', '.join(node_files)}"
+        raise ValueError(msg)
+    flux_types = sorted(
+        {ibtype for ibtype, _ in mesh["land_boundaries"] if ibtype in FLUX_BOUNDARY_TYPES}
+    )
+    if flux_types:
+        msg = f"{directory} has flux boundaries (IBTYPE {flux_types}) that cannot be refined"
+        raise ValueError(msg)
+
+
+def scale_run_directory(
+    source_directory: str, output_directory: str, divisions: int
+) -> int:
+    """
+    Write a refined copy of the inputs of a run directory. The mesh, the control
+    file and the nodal attributes are subdivided and the other files are copied,
+    except the control solutions which no longer apply.
+
+    Args:
+        source_directory: Directory holding fort.14 and fort.15
+        output_directory: Directory of the refined run
+        divisions: Number of segments each edge is split into
+
+    Returns:
+        Node count of the refined mesh
+    """
+    import os
+    import shutil
+
+    mesh = read_mesh_file(os.path.join(source_directory, "fort.14"))
+    check_scalable(source_directory, mesh)
+    with open(os.path.join(source_directory, "fort.15"), "r") as f:
+        lines = f.read().splitlines()
+    geographic = int(_fields(lines[6])[0]) == 2
+    open_boundaries = [list(b) for b in mesh["open_boundaries"]]
+
+    node_count = len(mesh["nodes"])
+    mesh["nodes"], mesh["elements"], parents, weights, edges = subdivide_mesh(
+        mesh["nodes"], mesh["elements"], divisions, geographic
+    )
+    refine_boundaries(mesh, edge_node_lookup(edges, node_count, divisions), divisions)
+    logger.info(
+        f"Subdivided {source_directory}: {len(mesh['nodes'])} nodes, {len(mesh['elements'])} elements"
+    )
+
+    os.makedirs(output_directory, exist_ok=True)
+    for name in sorted(os.listdir(source_directory)):
+        source = os.path.join(source_directory, name)
+        if name in ("fort.14", "fort.15", "fort.13", "control") or not os.path.isfile(source):
+            continue
+        shutil.copy2(source, os.path.join(output_directory, name))
+
+    write_mesh_file(os.path.join(output_directory, "fort.14"), mesh)
+    scale_control_file(
+        os.path.join(source_directory, "fort.15"),
+        os.path.join(output_directory, "fort.15"),
+        divisions,
+        open_boundaries,
+    )
+    if os.path.exists(os.path.join(source_directory, "fort.13")):
+        refine_nodal_attributes(
+            os.path.join(source_directory, "fort.13"),
+            os.path.join(output_directory, "fort.13"),
+            parents,
+            weights,
+        )
+    os.makedirs(os.path.join(output_directory, "control"), exist_ok=True)
+    return len(mesh["nodes"])
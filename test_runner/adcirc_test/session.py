@@ -0,0 +1,547 @@
+import logging
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+from .compression import open_text
+
+logger = logging.getLogger(__name__)
+
+
+def read_adcirc_header(file: str) -> dict:
+    """
+    Get the header information from an ADCIRC output file, which may be compressed
+
+    Args:
+        file: Name of the file
+
+    Returns:
+        Dictionary with the header information
+    """
+    import os
+
+    if not os.path.exists(file):
+        msg = f"File {file} does not exist"
+        raise FileNotFoundError(msg)
+
+    header = {}
+    with open_text(file) as f:
+        _ = f.readline().strip()
+        header_line = f.readline().strip().split()
+
+        header["snap_count"] = int(header_line[0])
+        header["node_count"] = int(header_line[1])
+        header["output_time_interval"] = float(header_line[2])
+        header["output_time_step"] = int(header_line[3])
+        header["n_values"] = int(header_line[4])
+
+        header3 = f.readline().strip().split()
+        if len(header3) == 2:
+            header["is_sparse"] = False
+        else:
+            header["is_sparse"] = True
+
+    return header
+
+
+def read_full_snap(
+    file_obj, header: dict
+) -> Optional[Tuple[float, int, np.ndarray]]:
+    """
+    Read a snap of an ADCIRC ascii output file with full data
+
+    Args:
+        file_obj: File object for the ADCIRC output file
+        header: Header dictionary for the file
+
+    Returns:
+        Tuple of (time, iteration, array of values with shape (node_count, n_values)),
+        or None at the end of the file
+    """
+    line = file_obj.readline().strip().split()
+    if not line:
+        return None
+    time = float(line[0])
+    iteration = int(line[1])
+
+    node_count = header["node_count"]
+    n_values = header["n_values"]
+    lines = [file_obj.readline() for _ in range(node_count)]
+
+    # The first column of each line is the node number
+    values = np.array(" ".join(lines).split(), dtype=float)
+    values = values.reshape((node_count, n_values + 1))[:, 1:]
+
+    return time, iteration, values
+
+
+def read_sparse_snap(
+    file_obj, header: dict
+) -> Optional[Tuple[float, int, np.ndarray, np.ndarray, float]]:
+    """
+    Read a snap of an ADCIRC ascii output file with sparse data
+
+    Args:
+        file_obj: File object for the ADCIRC output file
+        header: Header dictionary for the file
+
+    Returns:
+        Tuple of (time, iteration, zero based node indices, array of values with
+        shape (n_non_default, n_values), fill value), or None at the end of the file
+    """
+    line = file_obj.readline().strip().split()
+    if not line:
+        return None
+    time = float(line[0])
+    iteration = int(line[1])
+    n_non_default = int(line[2])
+    fill_value = float(line[3])
+
+    n_values = header["n_values"]
+    lines = [file_obj.readline() for _ in range(n_non_default)]
+    data = np.array(" ".join(lines).split(), dtype=float)
+    data = data.reshape((n_non_default, n_values + 1))
+
+    nodes = data[:, 0].astype(np.int64) - 1
+    values = data[:, 1:]
+
+    return time, iteration, nodes, values, fill_value
+
+
+class AsciiOutput:
+    """
+    An ADCIRC ascii output file (full or sparse) read into memory. Compressed
+    files are decompressed as they are read.
+    """
+
+    def __init__(self, filename: str, max_snaps: Optional[int] = None):
+        """
+        Read the file
+
+        Args:
+            filename: Name of the file
+            max_snaps: Maximum number of snaps to read (optional)
+        """
+        self.__filename = filename
+        self.__header = read_adcirc_header(filename)
+
+        snap_count = self.__header["snap_count"]
+        if max_snaps is not None:
+            snap_count = min(snap_count, max_snaps)
+
+        self.__times = []
+        self.__iterations = []
+        self.__snaps = []
+
+        with open_text(filename) as f:
+            _ = f.readline()
+            _ = f.readline()
+            for _ in range(snap_count):
+                if self.__header["is_sparse"]:
+                    snap = read_sparse_snap(f, self.__header)
+                    if snap is None:
+                        break
+                    time, iteration, nodes, values, fill_value = snap
+                    self.__snaps.append((nodes, values, fill_value))
+                else:
+                    snap = read_full_snap(f, self.__header)
+                    if snap is None:
+                        break
+                    time, iteration, values = snap
+                    self.__snaps.append(values)
+                self.__times.append(time)
+                self.__iterations.append(iteration)
+
+    @property
+    def filename(self) -> str:
+        """
+        Name of the file
+        """
+        return self.__filename
+
+    @property
+    def header(self) -> dict:
+        """
+        Header dictionary for the file
+        """
+        return self.__header
+
+    @property
+    def snap_count(self) -> int:
+        """
+        Number of snaps read from the file
+        """
+        return len(self.__snaps)
+
+    def time(self, snap: int) -> float:
+        """
+        Get the time of a snap
+
+        Args:
+            snap: Snap index
+
+        Returns:
+            Time in seconds
+        """
+        return self.__times[snap]
+
+    def iteration(self, snap: int) -> int:
+        """
+        Get the iteration of a snap
+
+        Args:
+            snap: Snap index
+
+        Returns:
+            Model iteration
+        """
+        return self.__iterations[snap]
+
+    def snap(self, snap: int) -> Union[np.ndarray, tuple]:
+        """
+        Get a snap as it was read from the file
+
+        Args:
+            snap: Snap index
+
+        Returns:
+            Array of values with shape (node_count, n_values) for full files, or a
+            tuple of (zero based node indices, values, fill value) for sparse files
+        """
+        return self.__snaps[snap]
+
+    def masked_data(self, snap_count: int) -> np.ndarray:
+        """
+        Get the values of the leading snaps with dry or missing values set to nan
+
+        Args:
+            snap_count: Number of snaps
+
+        Returns:
+            Array with shape (snap_count, node_count, n_values)
+        """
+        data = np.full(
+            (snap_count, self.__header["node_count"], self.__header["n_values"]),
+            np.nan,
+        )
+        for t in range(min(snap_count, self.snap_count)):
+            if self.__header["is_sparse"]:
+                nodes, values, fill_value = self.__snaps[t]
+                data[t, nodes, :] = np.where(values <= fill_value, np.nan, values)
+            else:
+                values = self.__snaps[t]
+                data[t, :, :] = np.where(values < -999.0, np.nan, values)
+        return data
+
+    def times(self, snap_count: int) -> np.ndarray:
+        """
+        Get the times of the leading snaps
+
+        Args:
+            snap_count: Number of snaps
+
+        Returns:
+            Array of times in seconds
+        """
+        times = np.zeros(snap_count)
+        n = min(snap_count, self.snap_count)
+        times[:n] = self.__times[:n]
+        return times
+
+
+def read_mesh(mesh_file: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Read the nodes and elements of an ADCIRC mesh (fort.14)
+
+    Args:
+        mesh_file: Name of the mesh file
+
+    Returns:
+        Tuple of (nodes with columns x, y, depth, elements with one based node numbers)
+    """
+    with open(mesh_file, "r") as f:
+        _ = f.readline()
+        header = f.readline().strip().split()
+        element_count = int(header[0])
+        node_count = int(header[1])
+        nodes = np.array(
+            [f.readline().split()[1:4] for _ in range(node_count)], dtype=float
+        )
+        elements = np.array(
+            [f.readline().split()[2:5] for _ in range(element_count)], dtype=np.int64
+        )
+    return nodes.reshape((node_count, 3)), elements.reshape((element_count, 3))
+
+
+def read_netcdf_output(filename: str, drop_variables: List[str]) -> xr.Dataset:
+    """
+    Read a netcdf output file into memory
+
+    Args:
+        filename: Name of the file
+        drop_variables: Variables that are not read
+
+    Returns:
+        xarray dataset
+    """
+    with xr.open_dataset(
+        filename,
+        drop_variables=drop_variables,
+        decode_times=False,
+    ) as dataset:
+        return dataset.load()
+
+
+class WarmDataCache:
+    """
+    Holds the control files and meshes of the tests for the life of a long-lived
+    process (i.e. the harness daemon) so that repeated runs of a test do not read
+    them again. Entries are keyed by the real path of the file, so the control
+    directories linked into sandboxes share their entries, and are read again if
+    the size or modification time of the file changes. The least recently used
+    entries are dropped once the files held exceed max_bytes.
+    """
+
+    def __init__(self, drop_variables: List[str], max_bytes: int = 2 * 1024**3):
+        """
+        Initialize the cache
+
+        Args:
+            drop_variables: Variables not read from netcdf files
+            max_bytes: Maximum total size on disk of the files held
+        """
+        from collections import OrderedDict
+
+        self.__drop_variables = drop_variables
+        self.__max_bytes = max_bytes
+        self.__entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    @staticmethod
+    def holds(filename: str) -> bool:
+        """
+        Check if a file is held by the cache. Only files that the model does not
+        write, the control files and the meshes, are held.
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            True if the file is held by the cache
+        """
+        import os
+
+        path = os.path.realpath(filename)
+        return (
+            os.path.basename(os.path.dirname(path)) == "control"
+            or os.path.basename(path) == "fort.14"
+        )
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Number of entries, bytes held, hits and misses of the cache
+        """
+        return {
+            "entries": len(self.__entries),
+            "bytes": self.__bytes,
+            "hits": self.__hits,
+            "misses": self.__misses,
+        }
+
+    def __get(self, kind: str, filename: str, reader: Callable[[str], object]):
+        """
+        Get an entry, reading the file if it is not held or has changed
+
+        Args:
+            kind: Kind of entry (ascii, netcdf, mesh)
+            filename: Name of the file
+            reader: Function that reads the file
+
+        Returns:
+            The data read from the file
+        """
+        import os
+
+        path = os.path.realpath(filename)
+        stat = os.stat(path)
+        key = (kind, path)
+        entry = self.__entries.get(key)
+        if entry is not None and entry[0] == (stat.st_size, stat.st_mtime_ns):
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return entry[1]
+
+        if entry is not None:
+            self.__drop(key)
+        self.__misses += 1
+        data = reader(path)
+        self.__entries[key] = ((stat.st_size, stat.st_mtime_ns), data)
+        self.__bytes += stat.st_size
+
+        while self.__bytes > self.__max_bytes and len(self.__entries) > 1:
+            self.__drop(next(iter(self.__entries)))
+        return data
+
+    def __drop(self, key: Tuple[str, str]) -> None:
+        """
+        Drop an entry from the cache
+
+        Args:
+            key: Key of the entry
+        """
+        (size, _), data = self.__entries.pop(key)
+        self.__bytes -= size
+        if isinstance(data, xr.Dataset):
+            data.close()
+
+    def ascii_output(self, filename: str) -> AsciiOutput:
+        """
+        Get an ascii output file
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            AsciiOutput object
+        """
+        return self.__get("ascii", filename, AsciiOutput)
+
+    def netcdf_dataset(self, filename: str) -> xr.Dataset:
+        """
+        Get a netcdf output file loaded into memory
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            xarray dataset
+        """
+        return self.__get(
+            "netcdf",
+            filename,
+            lambda path: read_netcdf_output(path, self.__drop_variables),
+        )
+
+    def mesh(self, mesh_file: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nodes and elements of a mesh
+
+        Args:
+            mesh_file: Name of the mesh file
+
+        Returns:
+            Tuple of (nodes, elements)
+        """
+        return self.__get("mesh", mesh_file, read_mesh)
+
+    def clear(self) -> None:
+        """
+        Drop every entry from the cache
+        """
+        for key in list(self.__entries):
+            self.__drop(key)
+
+
+class OutputDataSession:
+    """
+    Holds the output files of a test that are used by both the comparison and
+    the plotting so that each file is only read once. The data is held until
+    release() is called. Control files and meshes are taken from a warm cache
+    instead when one is given.
+    """
+
+    def __init__(
+        self, drop_variables: List[str], warm_cache: Optional[WarmDataCache] = None
+    ):
+        """
+        Initialize the session
+
+        Args:
+            drop_variables: Variables not read from netcdf files
+            warm_cache: Cache holding control files and meshes between tests (optional)
+        """
+        self.__drop_variables = drop_variables
+        self.__warm_cache = warm_cache
+        self.__ascii: Dict[str, AsciiOutput] = {}
+        self.__netcdf: Dict[str, xr.Dataset] = {}
+        self.__meshes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def ascii_output(self, filename: str) -> AsciiOutput:
+        """
+        Get an ascii output file, reading it on first use
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            AsciiOutput object
+        """
+        import os
+
+        if self.__warm_cache is not None and self.__warm_cache.holds(filename):
+            return self.__warm_cache.ascii_output(filename)
+
+        key = os.path.abspath(filename)
+        if key not in self.__ascii:
+            logger.debug(f"Reading ascii output file: {filename}")
+            self.__ascii[key] = AsciiOutput(filename)
+        return self.__ascii[key]
+
+    def netcdf_dataset(self, filename: str) -> xr.Dataset:
+        """
+        Get a netcdf output file loaded into memory, reading it on first use
+
+        Args:
+            filename: Name of the file
+
+        Returns:
+            xarray dataset
+        """
+        import os
+
+        if self.__warm_cache is not None and self.__warm_cache.holds(filename):
+            return self.__warm_cache.netcdf_dataset(filename)
+
+        key = os.path.abspath(filename)
+        if key not in self.__netcdf:
+            logger.debug(f"Reading netcdf output file: {filename}")
+            self.__netcdf[key] = read_netcdf_output(filename, self.__drop_variables)
+        return self.__netcdf[key]
+
+    def mesh(self, mesh_file: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the nodes and elements of a mesh, reading it on first use
+
+        Args:
+            mesh_file: Name of the mesh file
+
+        Returns:
+            Tuple of (nodes, elements)
+        """
+        import os
+
+        if self.__warm_cache is not None and self.__warm_cache.holds(mesh_file):
+            return self.__warm_cache.mesh(mesh_file)
+
+        key = os.path.abspath(mesh_file)
+        if key not in self.__meshes:
+            logger.debug(f"Reading mesh file: {mesh_file}")
+            self.__meshes[key] = read_mesh(mesh_file)
+        return self.__meshes[key]
+
+    def release(self) -> None:
+        """
+        Release all data held by the session. Data held by the warm cache is kept.
+
+        Returns:
+            None
+        """
+        for dataset in self.__netcdf.values():
+            dataset.close()
+        self.__ascii.clear()
+        self.__netcdf.clear()
+        self.__meshes.clear()
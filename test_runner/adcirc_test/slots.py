@@ -0,0 +1,308 @@
+import logging
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """
+    Parse a Linux cpu list (i.e. 0-3,8-11)
+
+    Args:
+        text: Cpu list
+
+    Returns:
+        List of cpu numbers
+    """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpu_list(cpus: List[int]) -> str:
+    """
+    Format cpu numbers as a Linux cpu list, joining consecutive cpus into ranges
+
+    Args:
+        cpus: Cpu numbers
+
+    Returns:
+        Cpu list (i.e. 0-3,8-11)
+    """
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if b > a else f"{a}" for a, b in ranges)
+
+
+def numa_cpu_sets() -> List[Tuple[int, List[int]]]:
+    """
+    Get the cpus this process may run on, grouped by NUMA node
+
+    Returns:
+        List of (NUMA node, cpus) sorted by node. Machines without NUMA
+        information report all cpus on node 0.
+    """
+    import glob
+    import os
+    import re
+
+    if hasattr(os, "sched_getaffinity"):
+        allowed = sorted(os.sched_getaffinity(0))
+    else:
+        allowed = list(range(os.cpu_count() or 1))
+
+    nodes = []
+    remaining = set(allowed)
+    for path in glob.glob("/sys/devices/system/node/node[0-9]*/cpulist"):
+        node = int(re.search(r"node(\d+)", path).group(1))
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in remaining]
+        if cpus:
+            nodes.append((node, cpus))
+            remaining.difference_update(cpus)
+    nodes.sort()
+    if remaining:
+        nodes.append((nodes[-1][0] + 1 if nodes else 0, sorted(remaining)))
+    return nodes
+
+
+def default_slot_directory() -> str:
+    """
+    Get the directory holding the lock files of the rank slots shared by the
+    processes of a user on this machine
+
+    Returns:
+        Path of the directory in the temporary directory
+    """
+    import os
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"adcirc_rank_slots_{os.getuid()}")
+
+
+class RankSlots:
+    """
+    Slots held by a process, released when the object is closed or used as a
+    context manager
+    """
+
+    def __init__(
+        self,
+        slots: List[int],
+        files: list,
+        cpus: Optional[List[int]] = None,
+        numa_nodes: Optional[List[int]] = None,
+    ):
+        """
+        Initialize the held slots
+
+        Args:
+            slots: Indices of the slots
+            files: Open lock files of the slots
+            cpus: Cpu of each slot (optional)
+            numa_nodes: NUMA nodes of the cpus (optional)
+        """
+        self.__slots = slots
+        self.__files = files
+        self.__cpus = cpus if cpus is not None else []
+        self.__numa_nodes = numa_nodes if numa_nodes is not None else []
+
+    @property
+    def slots(self) -> List[int]:
+        """
+        Indices of the slots held
+        """
+        return list(self.__slots)
+
+    @property
+    def cpus(self) -> List[int]:
+        """
+        Cpus of the slots held
+        """
+        return list(self.__cpus)
+
+    @property
+    def numa_nodes(self) -> List[int]:
+        """
+        NUMA nodes of the cpus of the slots held
+        """
+        return list(self.__numa_nodes)
+
+    def release(self) -> None:
+        """
+        Release the slots
+
+        Returns:
+            None
+        """
+        import fcntl
+
+        for f in self.__files:
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+        self.__files = []
+
+    def __enter__(self) -> "RankSlots":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+class RankSlotPool:
+    """
+    Pool of rank slots shared between processes through lock files, so that
+    concurrent runs (i.e. pytest-xdist workers) do not start more MPI ranks than
+    the machine has cpus. Each slot is a file locked with flock, so the slots of
+    a process that dies are released by the kernel.
+
+    Each slot stands for a cpu, taken in NUMA node order, so that the slots
+    held by a run can be used to pin it to cpus no other run holds. Runs are
+    kept on a single NUMA node when one has enough free cpus.
+    """
+
+    def __init__(
+        self,
+        slots: int,
+        directory: Optional[str] = None,
+        poll_interval: float = 0.2,
+        topology: Optional[List[Tuple[int, List[int]]]] = None,
+    ):
+        """
+        Initialize the pool
+
+        Args:
+            slots: Number of slots, i.e. the number of cpus
+            directory: Directory of the lock files (default: default_slot_directory())
+            poll_interval: Seconds between attempts when not enough slots are free
+            topology: Cpus grouped by NUMA node (default: numa_cpu_sets()). Slots
+                beyond the number of cpus share cpus.
+        """
+        import os
+
+        self.__slots = max(1, slots)
+        self.__directory = directory if directory else default_slot_directory()
+        self.__poll_interval = poll_interval
+        os.makedirs(self.__directory, mode=0o700, exist_ok=True)
+
+        nodes = topology if topology else numa_cpu_sets()
+        cpus = [(node, cpu) for node, node_cpus in nodes for cpu in node_cpus]
+        self.__slot_cpus = [cpus[index % len(cpus)] for index in range(self.__slots)]
+        self.__groups = {}
+        for index, (node, _) in enumerate(self.__slot_cpus):
+            self.__groups.setdefault(node, []).append(index)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of slots in the pool
+        """
+        return self.__slots
+
+    def acquire(self, count: int) -> RankSlots:
+        """
+        Wait until a number of slots are free and take them. Requests are served
+        one at a time, so a run needing many ranks is not starved by smaller ones.
+
+        Args:
+            count: Number of slots, capped at the size of the pool
+
+        Returns:
+            RankSlots holding the slots
+        """
+        import fcntl
+        import os
+        import time
+
+        if count > self.__slots:
+            logger.warning(
+                f"{count} ranks requested but the pool has {self.__slots} slots, oversubscribing"
+            )
+            count = self.__slots
+
+        with open(os.path.join(self.__directory, "pool.lock"), "w") as gate:
+            fcntl.flock(gate, fcntl.LOCK_EX)
+            try:
+                while True:
+                    slots, files = self.__try_acquire(count)
+                    if len(slots) == count:
+                        cpus = [self.__slot_cpus[index][1] for index in slots]
+                        nodes = sorted({self.__slot_cpus[index][0] for index in slots})
+                        return RankSlots(slots, files, cpus, nodes)
+                    RankSlots(slots, files).release()
+                    time.sleep(self.__poll_interval)
+            finally:
+                fcntl.flock(gate, fcntl.LOCK_UN)
+
+    def __try_acquire(self, count: int):
+        """
+        Take free slots without waiting
+
+        Args:
+            count: Number of slots wanted
+
+        Returns:
+            Tuple of the indices and the open lock files of the slots taken,
+            which may be fewer than requested
+        """
+        import fcntl
+        import os
+
+        free = {}
+        for index in range(self.__slots):
+            f = open(os.path.join(self.__directory, f"slot_{index}.lock"), "w")  # noqa: SIM115
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            free[index] = f
+
+        slots = self.__choose_slots(sorted(free), count)
+        for index, f in free.items():
+            if index not in slots:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+        return slots, [free[index] for index in slots]
+
+    def __choose_slots(self, free: List[int], count: int) -> List[int]:
+        """
+        Choose slots among the free ones. The NUMA node with the fewest free
+        slots that can hold the request is used, otherwise the request is spread
+        over the nodes with the most free slots.
+
+        Args:
+            free: Indices of the free slots
+            count: Number of slots wanted
+
+        Returns:
+            Indices of the chosen slots, fewer than requested when not enough are free
+        """
+        if len(free) <= count:
+            return free
+
+        free_set = set(free)
+        groups = [
+            [index for index in group if index in free_set] for group in self.__groups.values()
+        ]
+        fitting = [group for group in groups if len(group) >= count]
+        if fitting:
+            return min(fitting, key=len)[:count]
+
+        chosen = []
+        for group in sorted(groups, key=len, reverse=True):
+            chosen.extend(group[: count - len(chosen)])
+            if len(chosen) == count:
+                break
+        return sorted(chosen)
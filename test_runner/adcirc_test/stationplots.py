@@ -0,0 +1,304 @@
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Station plot modes
+STATION_PLOT_MODES = ["individual", "pages", "pdf"]
+
+# Number of stations drawn on each page in the pages and pdf modes
+STATION_ROWS_PER_PAGE = 4
+STATION_COLUMNS_PER_PAGE = 3
+
+INDIVIDUAL_DPI = 300
+PAGE_DPI = 150
+
+
+def station_magnitudes(data: np.ndarray) -> np.ndarray:
+    """
+    Get the value plotted for every station at once. Vector values (i.e. u-vel,
+    v-vel) are reduced to their magnitude.
+
+    Args:
+        data: Array with shape (time, station, n_values)
+
+    Returns:
+        Array with shape (time, station)
+    """
+    if data.shape[2] == 2:
+        return np.hypot(data[:, :, 0], data[:, :, 1])
+    return data[:, :, 0]
+
+
+def failing_stations(
+    control: np.ndarray, test: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """
+    Find the stations where the test differs from the control by more than the
+    tolerance. Only the leading snaps present in both arrays are compared.
+
+    Args:
+        control: Control values with shape (time, station)
+        test: Test values with shape (time, station)
+        tolerance: Tolerance for the comparison
+
+    Returns:
+        Indices of the failing stations
+    """
+    snap_count = min(control.shape[0], test.shape[0])
+    close = np.isclose(
+        test[:snap_count, :],
+        control[:snap_count, :],
+        rtol=1e-7,
+        atol=tolerance,
+        equal_nan=True,
+    )
+    return np.where(~np.all(close, axis=0))[0]
+
+
+def plot_stations(
+    test_name: str,
+    var_name: str,
+    control_time: np.ndarray,
+    control_values: np.ndarray,
+    test_time: np.ndarray,
+    test_values: np.ndarray,
+    output_directory: str,
+    mode: str = "individual",
+    stations: Optional[np.ndarray] = None,
+    workers: int = 1,
+) -> List[str]:
+    """
+    Plot the control and test time series of a set of stations
+
+    In the individual mode one png is written per station. In the pages mode the
+    stations are drawn on a grid of axes with several stations per png. In the pdf
+    mode the pages are written to a single multi-page pdf. Each process reuses one
+    figure for all of its plots. The png modes are spread over the worker
+    processes, the pdf is written by a single process.
+
+    Args:
+        test_name: Name of the test
+        var_name: Name of the plotted variable
+        control_time: Control times in days
+        control_values: Control values with shape (time, station)
+        test_time: Test times in days
+        test_values: Test values with shape (time, station)
+        output_directory: Directory to output the plots
+        mode: Station plot mode (individual, pages, pdf)
+        stations: Indices of the stations to plot (default: all)
+        workers: Number of worker processes
+
+    Returns:
+        List of the files written
+    """
+    import os
+
+    if mode not in STATION_PLOT_MODES:
+        msg = f"Unknown station plot mode: {mode}"
+        raise ValueError(msg)
+
+    if stations is None:
+        stations = np.arange(control_values.shape[1])
+    if len(stations) == 0:
+        logger.info(f"No stations to plot for {var_name}")
+        return []
+
+    if mode == "individual":
+        groups = [[int(s)] for s in stations]
+    else:
+        per_page = STATION_ROWS_PER_PAGE * STATION_COLUMNS_PER_PAGE
+        groups = [
+            [int(s) for s in stations[i : i + per_page]]
+            for i in range(0, len(stations), per_page)
+        ]
+
+    if mode == "pdf":
+        pdf_file = os.path.join(output_directory, f"stations_{var_name}.pdf")
+        jobs = [
+            (test_name, var_name, mode, groups, output_directory, pdf_file)
+            + _slice_stations(control_time, control_values, test_time, test_values)
+        ]
+        workers = 1
+    else:
+        # Give each worker a contiguous block of plots and only the columns it draws
+        workers = max(1, min(workers, len(groups)))
+        blocks = np.array_split(np.arange(len(groups)), workers)
+        jobs = []
+        for block in blocks:
+            block_groups = [groups[b] for b in block]
+            columns = [s for group in block_groups for s in group]
+            jobs.append(
+                (test_name, var_name, mode, block_groups, output_directory, None)
+                + _slice_stations(
+                    control_time, control_values, test_time, test_values, columns
+                )
+            )
+
+    if workers == 1:
+        results = [_render_station_plots(job) for job in jobs]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # The harness runs threads (resource sampler, watchdog, prep pipeline)
+        # that may hold locks, so the workers are not forked from it
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_plot_worker,
+        ) as pool:
+            results = list(pool.map(_render_station_plots, jobs))
+
+    files = [f for result in results for f in result]
+    logger.debug(f"Wrote {len(files)} station plot files for {var_name}")
+    return files
+
+
+def _slice_stations(
+    control_time: np.ndarray,
+    control_values: np.ndarray,
+    test_time: np.ndarray,
+    test_values: np.ndarray,
+    columns: Optional[List[int]] = None,
+) -> tuple:
+    """
+    Get the data needed to plot a set of stations
+
+    Args:
+        control_time: Control times in days
+        control_values: Control values with shape (time, station)
+        test_time: Test times in days
+        test_values: Test values with shape (time, station)
+        columns: Stations to keep (default: all)
+
+    Returns:
+        Tuple of (station index map, control time, control values, test time, test values)
+    """
+    if columns is None:
+        columns = list(range(control_values.shape[1]))
+    index = {s: i for i, s in enumerate(columns)}
+    return (
+        index,
+        control_time,
+        control_values[:, columns],
+        test_time,
+        test_values[:, columns],
+    )
+
+
+def _init_plot_worker() -> None:
+    """
+    Select the non-interactive matplotlib backend in a plot worker process
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _render_station_plots(job: tuple) -> List[str]:
+    """
+    Render a block of station plots reusing a single figure. This runs in the
+    worker processes, or in the harness process when there is a single worker.
+
+    Args:
+        job: Tuple of the plot arguments built by plot_stations
+
+    Returns:
+        List of the files written
+    """
+    import os
+
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    (
+        test_name,
+        var_name,
+        mode,
+        groups,
+        output_directory,
+        pdf_file,
+        index,
+        control_time,
+        control_values,
+        test_time,
+        test_values,
+    ) = job
+
+    if mode == "individual":
+        rows, columns, dpi = 1, 1, INDIVIDUAL_DPI
+        fig, axes = plt.subplots(squeeze=False)
+    else:
+        rows, columns, dpi = STATION_ROWS_PER_PAGE, STATION_COLUMNS_PER_PAGE, PAGE_DPI
+        fig, axes = plt.subplots(
+            rows, columns, figsize=(4.0 * columns, 3.0 * rows), squeeze=False
+        )
+    axes = axes.ravel()
+
+    # The lines are created once and only their data is replaced for each plot
+    control_lines = [ax.plot([], [], label="Control")[0] for ax in axes]
+    test_lines = [ax.plot([], [], label="Test")[0] for ax in axes]
+    for ax in axes:
+        ax.set_xlabel("Time (days)")
+        ax.set_ylabel(var_name)
+        ax.grid(True)
+        ax.legend(loc="upper right")
+        # The titles are set for each plot, a placeholder reserves their space
+        ax.set_title("Station")
+    fig.tight_layout(rect=(0, 0, 1, 0.96) if mode != "individual" else None)
+
+    files = []
+    pdf = PdfPages(pdf_file) if pdf_file else None
+    try:
+        for page, group in enumerate(groups):
+            for ax_index, ax in enumerate(axes):
+                if ax_index >= len(group):
+                    ax.set_visible(False)
+                    continue
+                ax.set_visible(True)
+                station = group[ax_index]
+                column = index[station]
+                control_lines[ax_index].set_data(control_time, control_values[:, column])
+                test_lines[ax_index].set_data(test_time, test_values[:, column])
+                ax.relim()
+                ax.autoscale_view()
+                if mode == "individual":
+                    ax.set_title(f"Station {station}, {var_name}, Test: {test_name}")
+                else:
+                    ax.set_title(f"Station {station}")
+
+            if mode == "individual":
+                filename = os.path.join(
+                    output_directory, f"station_{group[0]}_{var_name}.png"
+                )
+            else:
+                fig.suptitle(
+                    f"Stations {group[0]}-{group[-1]}, {var_name}, Test: {test_name}"
+                )
+                filename = os.path.join(
+                    output_directory,
+                    f"stations_{var_name}_{group[0]:05d}-{group[-1]:05d}.png",
+                )
+
+            if pdf is not None:
+                pdf.savefig(fig)
+            else:
+                # The title of an individual plot names the test and can be wider
+                # than the axes, so the figure is cropped to its contents
+                fig.savefig(
+                    filename,
+                    dpi=dpi,
+                    bbox_inches="tight" if mode == "individual" else None,
+                    pil_kwargs={"compress_level": 1},
+                )
+                files.append(filename)
+    finally:
+        if pdf is not None:
+            pdf.close()
+            files.append(pdf_file)
+        plt.close(fig)
+
+    return files
@@ -0,0 +1,184 @@
+import logging
+import threading
+from typing import Optional
+
+from .resources import process_tree
+
+logger = logging.getLogger(__name__)
+
+
+class ModelTimeoutError(RuntimeError):
+    """
+    Raised when the watchdog kills a stalled or abnormally slow model run
+    """
+
+
+def kill_process_tree(pid: int, grace_period: float = 10.0) -> None:
+    """
+    Terminate a process and all of its descendants (i.e. mpirun and the MPI ranks)
+
+    Args:
+        pid: Process id at the root of the tree
+        grace_period: Seconds to wait after SIGTERM before sending SIGKILL
+    """
+    import os
+    import signal
+    import time
+
+    pids = process_tree(pid) if os.path.isdir("/proc") else [pid]
+
+    def send(sig) -> None:
+        try:
+            os.killpg(os.getpgid(pid), sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        for p in pids:
+            try:
+                os.kill(p, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    send(signal.SIGTERM)
+    deadline = time.monotonic() + grace_period
+    while time.monotonic() < deadline:
+        if not any(os.path.exists(f"/proc/{p}") for p in pids):
+            return
+        time.sleep(0.5)
+    send(signal.SIGKILL)
+
+
+class ModelWatchdog:
+    """
+    Watches the progress of a model run and kills the process tree if no
+    progress is reported within the stall timeout, or if the projected runtime
+    exceeds a multiple of the historical runtime
+    """
+
+    # Minimum percent complete before the projected runtime is trusted
+    MIN_PROJECTION_PERCENT = 5.0
+
+    def __init__(
+        self,
+        pid: int,
+        stall_timeout: Optional[float],
+        expected_runtime: Optional[float] = None,
+        runtime_factor: Optional[float] = None,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Initialize the watchdog
+
+        Args:
+            pid: Process id of the model run
+            stall_timeout: Seconds without progress before the run is killed (None to disable)
+            expected_runtime: Historical runtime of the model in seconds (optional)
+            runtime_factor: Multiple of the historical runtime allowed before the run
+                is killed (optional)
+            poll_interval: Seconds between checks
+        """
+        import time
+
+        self.__pid = pid
+        self.__stall_timeout = stall_timeout
+        self.__expected_runtime = expected_runtime
+        self.__runtime_factor = runtime_factor
+        self.__poll_interval = poll_interval
+        self.__start_time = time.monotonic()
+        self.__last_progress_time = self.__start_time
+        self.__percent = 0.0
+        self.__reason = None
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+
+    @property
+    def timed_out(self) -> bool:
+        """
+        True if the watchdog killed the model run
+        """
+        return self.__reason is not None
+
+    @property
+    def reason(self) -> Optional[str]:
+        """
+        Reason the model run was killed, or None
+        """
+        return self.__reason
+
+    def start(self) -> None:
+        """
+        Start watching the model run in a background thread
+        """
+        if not self.__stall_timeout and not (
+            self.__expected_runtime and self.__runtime_factor
+        ):
+            return
+        self.__thread = threading.Thread(target=self.__watch, daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop watching the model run
+        """
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def progress(self, percent: float) -> None:
+        """
+        Report progress of the model run
+
+        Args:
+            percent: Percent complete reported by the model
+        """
+        import time
+
+        with self.__lock:
+            self.__last_progress_time = time.monotonic()
+            self.__percent = max(self.__percent, percent)
+
+    def __watch(self) -> None:
+        """
+        Check the model progress until stopped or the run is killed
+        """
+        while not self.__stop_event.wait(self.__poll_interval):
+            reason = self.__check()
+            if reason is not None:
+                self.__reason = reason
+                logger.error(f"Watchdog killing model run: {reason}")
+                kill_process_tree(self.__pid)
+                return
+
+    def __check(self) -> Optional[str]:
+        """
+        Check if the model run should be killed
+
+        Returns:
+            Reason the run should be killed, or None
+        """
+        import time
+
+        now = time.monotonic()
+        with self.__lock:
+            stalled_time = now - self.__last_progress_time
+            percent = self.__percent
+
+        if self.__stall_timeout and stalled_time > self.__stall_timeout:
+            return f"no progress reported for {stalled_time:.0f} seconds"
+
+        if (
+            self.__expected_runtime
+            and self.__runtime_factor
+            and percent >= self.MIN_PROJECTION_PERCENT
+        ):
+            elapsed = now - self.__start_time
+            projected = elapsed * 100.0 / percent
+            limit = self.__expected_runtime * self.__runtime_factor
+            if projected > limit:
+                return (
+                    f"projected runtime {projected:.0f}s exceeds {self.__runtime_factor}x "
+                    f"the historical runtime of {self.__expected_runtime:.0f}s"
+                )
+
+        return None
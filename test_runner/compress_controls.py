@@ -0,0 +1,267 @@
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s :: %(levelname)s :: %(filename)s :: %(funcName)s :: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+
+
+def control_files(test_root: str, test_yaml: dict, tests: list) -> list:
+    """
+    Get the control output files of a set of tests
+
+    Args:
+        test_root: Root directory for the tests
+        test_yaml: Dictionary from the test yaml file
+        tests: Names of the tests
+
+    Returns:
+        List of control files as stored (plain or compressed)
+    """
+    import os
+
+    from adcirc_test.compression import find_output_file
+
+    files = []
+    for test_name in tests:
+        test = test_yaml["tests"][test_name]
+        test_directory = os.path.join(test_root, test["path"])
+        for directory, subdirectories, _ in os.walk(test_directory):
+            subdirectories.sort()
+            if os.path.basename(directory) != "control":
+                continue
+            for file in test["output_files"]:
+                control_file = find_output_file(os.path.join(directory, file))
+                if control_file:
+                    files.append(control_file)
+    return files
+
+
+def compress_controls(files: list, args) -> None:
+    """
+    Compress control files in place. Ascii files are replaced by a compressed
+    copy once its decompressed content is verified, netcdf files are rewritten
+    with deflate and shuffle.
+
+    Args:
+        files: Control files to compress
+        args: Parsed command line arguments
+    """
+    import os
+
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.comparison import file_checksum
+    from adcirc_test.compression import compress_file, deflate_netcdf, is_compressed
+
+    total_before = 0
+    total_after = 0
+    for control_file in files:
+        size = os.path.getsize(control_file)
+        if control_file.endswith(".nc"):
+            if not deflate_netcdf(
+                control_file, args.netcdf_level, AdcircTest.ADCIRC_DROP_VARIABLES_LIST
+            ):
+                continue
+            output_file = control_file
+        elif is_compressed(control_file):
+            logger.info(f"Already compressed: {control_file}")
+            continue
+        else:
+            output_file = compress_file(control_file, args.format, args.level)
+            if file_checksum(output_file) != file_checksum(control_file):
+                os.remove(output_file)
+                msg = f"Verification of {output_file} failed"
+                raise RuntimeError(msg)
+            if not args.keep:
+                os.remove(control_file)
+
+        compressed_size = os.path.getsize(output_file)
+        total_before += size
+        total_after += compressed_size
+        logger.info(
+            f"Compressed {control_file}: {size / 1e6:.2f} MB -> {compressed_size / 1e6:.2f} MB"
+        )
+
+    if total_before:
+        logger.info(
+            f"Compressed {total_before / 1e6:.2f} MB of control files to "
+            f"{total_after / 1e6:.2f} MB ({total_before / total_after:.1f}x)"
+        )
+
+
+def decompress_controls(files: list, args) -> None:
+    """
+    Decompress compressed ascii control files in place
+
+    Args:
+        files: Control files to decompress
+        args: Parsed command line arguments
+    """
+    import os
+
+    from adcirc_test.compression import decompress_file, is_compressed
+
+    for control_file in files:
+        if not is_compressed(control_file):
+            continue
+        output_file = decompress_file(control_file)
+        if not args.keep:
+            os.remove(control_file)
+        logger.info(f"Decompressed {control_file} to {output_file}")
+
+
+def benchmark(files: list, args) -> None:
+    """
+    Measure the read throughput of ascii output files stored as plain text and
+    in each compression format. Compressed copies are written to a temporary
+    directory. Two reads are timed: streaming the raw bytes, and parsing every
+    snap as the comparison and the plots do.
+
+    Args:
+        files: Plain ascii output files to benchmark
+        args: Parsed command line arguments
+    """
+    import os
+    import shutil
+    import tempfile
+    import time
+
+    from adcirc_test.compression import (
+        COMPRESSION_FORMATS,
+        compress_file,
+        is_compressed,
+        open_binary,
+    )
+    from adcirc_test.session import AsciiOutput
+
+    def best_time(function) -> float:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def stream(filename: str) -> None:
+        with open_binary(filename) as f:
+            while f.read(1024 * 1024):
+                pass
+
+    formats = ["plain"]
+    for compression in COMPRESSION_FORMATS:
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                probe = os.path.join(directory, "probe")
+                open(probe, "w").close()
+                compress_file(probe, compression)
+            formats.append(compression)
+        except ImportError as e:
+            logger.warning(f"Skipping {compression}: {e}")
+
+    for filename in files:
+        if filename.endswith(".nc") or is_compressed(filename):
+            logger.info(f"Skipping {filename}: the benchmark needs a plain ascii file")
+            continue
+        size_mb = os.path.getsize(filename) / 1e6
+        logger.info(f"Read throughput for {filename} ({size_mb:.2f} MB uncompressed):")
+        with tempfile.TemporaryDirectory() as directory:
+            plain_file = os.path.join(directory, os.path.basename(filename))
+            shutil.copy(filename, plain_file)
+            for compression in formats:
+                if compression == "plain":
+                    candidate = plain_file
+                else:
+                    candidate = compress_file(plain_file, compression, args.level)
+                stored_mb = os.path.getsize(candidate) / 1e6
+                stream_time = best_time(lambda: stream(candidate))
+                parse_time = best_time(lambda: AsciiOutput(candidate))
+                logger.info(
+                    f"  {compression:>5}: stored={stored_mb:8.2f} MB "
+                    f"ratio={size_mb / stored_mb:5.1f}x "
+                    f"stream={size_mb / stream_time:8.1f} MB/s "
+                    f"parse={size_mb / parse_time:6.1f} MB/s ({parse_time:.3f} s)"
+                )
+
+
+def compress_controls_main():
+    """
+    Main entrypoint for compressing the control solutions of the test suite
+    """
+    import argparse
+    import os
+
+    import yaml
+
+    from adcirc_test.compression import COMPRESSION_FORMATS
+
+    parser = argparse.ArgumentParser(
+        description="Compress, decompress, or benchmark ADCIRC control solutions"
+    )
+    parser.add_argument(
+        "action",
+        choices=["compress", "decompress", "benchmark"],
+        help="Compress or decompress the control files of the tests, or benchmark reading them",
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="Files to process instead of the control files of the tests in the test yaml",
+    )
+    parser.add_argument(
+        "--test-yaml",
+        type=str,
+        help="Test yaml file (default: test_list.yaml)",
+        default="test_list.yaml",
+    )
+    parser.add_argument(
+        "--test-root", type=str, help="Root directory for tests (default: .)", default="."
+    )
+    parser.add_argument("--test", type=str, help="Only process this test", required=False)
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=list(COMPRESSION_FORMATS),
+        help="Compression format of the ascii files (default: zst)",
+        default="zst",
+    )
+    parser.add_argument(
+        "--level",
+        type=int,
+        help="Compression level of the ascii files (default: 19 for zst, 9 for gz)",
+    )
+    parser.add_argument(
+        "--netcdf-level", type=int, help="Deflate level of the netcdf files (default: 4)", default=4
+    )
+    parser.add_argument(
+        "--keep",
+        action="store_true",
+        help="Keep the original ascii files next to the converted ones",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        help="Number of timed reads in the benchmark, the fastest is reported (default: 3)",
+        default=3,
+    )
+    args = parser.parse_args()
+
+    if args.files:
+        files = args.files
+    else:
+        with open(os.path.join(args.test_root, args.test_yaml)) as f:
+            test_yaml = yaml.safe_load(f)
+        tests = [args.test] if args.test else list(test_yaml["tests"])
+        files = control_files(args.test_root, test_yaml, tests)
+
+    if args.action == "compress":
+        compress_controls(files, args)
+    elif args.action == "decompress":
+        decompress_controls(files, args)
+    else:
+        benchmark(files, args)
+
+
+if __name__ == "__main__":
+    compress_controls_main()
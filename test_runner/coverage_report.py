@@ -0,0 +1,51 @@
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s :: %(levelname)s :: %(filename)s :: %(funcName)s :: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+
+
+def coverage_report():
+    """
+    Main entrypoint for the coverage report of a build directory. The coverage
+    data left in the build directory by a run of the suite is captured for each
+    target in parallel and merged into a single tracefile and html report. Runs
+    using test_runner.py --coverage collect the coverage of each test instead.
+    """
+    import argparse
+    import os
+
+    from adcirc_test.coverage import capture_build_directory
+
+    parser = argparse.ArgumentParser(description="ADCIRC Coverage Report")
+    parser.add_argument(
+        "build_directory", type=str, help="Build directory of the coverage build"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Directory for the tracefiles and the html report (default: adcirc.cov)",
+        default="adcirc.cov",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of lcov processes run at the same time (default: number of cpus)",
+        default=None,
+    )
+    args = parser.parse_args()
+
+    tracefile = capture_build_directory(
+        args.build_directory,
+        args.output_dir,
+        args.workers if args.workers else os.cpu_count() or 1,
+    )
+    if tracefile is None:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    coverage_report()
@@ -0,0 +1,26 @@
+def harness_client():
+    """
+    Main entrypoint for the harness client. The arguments are those of
+    test_runner.py. The run is sent to the harness daemon when one is listening
+    and otherwise test_runner.py is run directly, so the client can always be used
+    in place of test_runner.py. Only the standard library is imported so that the
+    client starts quickly.
+    """
+    import os
+    import sys
+
+    from adcirc_test.daemon import default_socket_path, run_remote
+
+    argv = sys.argv[1:]
+    exit_code = run_remote(
+        default_socket_path(), argv, os.getcwd(), dict(os.environ), sys.stdout
+    )
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+    runner = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_runner.py")
+    os.execv(sys.executable, [sys.executable, runner, *argv])
+
+
+if __name__ == "__main__":
+    harness_client()
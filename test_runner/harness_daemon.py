@@ -0,0 +1,80 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def harness_daemon():
+    """
+    Main entrypoint for the harness daemon. The daemon imports the harness once
+    and runs test_runner.py requests sent by harness_client.py, keeping the parsed
+    test yaml files, control files, meshes and plot geometry in memory between runs.
+    """
+    import argparse
+    import os
+    import signal
+
+    # Import the harness and its plotting dependencies before the first request
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+    import test_runner
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.daemon import HarnessDaemon, HarnessState, default_socket_path
+
+    parser = argparse.ArgumentParser(description="ADCIRC Test Suite Harness Daemon")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        help="Path of the Unix socket (default: $ADCIRC_HARNESS_SOCKET or a socket in the temporary directory)",
+        default=None,
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        help="Seconds without requests before the daemon exits, 0 to never exit (default: 3600)",
+        default=3600.0,
+    )
+    parser.add_argument(
+        "--max-cache-mb",
+        type=float,
+        help="Maximum size on disk of the control files and meshes held in memory (default: 2048)",
+        default=2048.0,
+    )
+    args = parser.parse_args()
+
+    state = HarnessState(
+        AdcircTest.ADCIRC_DROP_VARIABLES_LIST, int(args.max_cache_mb * 1024 * 1024)
+    )
+    runner_directory = os.path.dirname(os.path.abspath(__file__))
+
+    daemon = HarnessDaemon(
+        args.socket if args.socket else default_socket_path(),
+        lambda argv: test_runner.adcirc_testsuite_runner(argv, state),
+        idle_timeout=args.idle_timeout if args.idle_timeout > 0 else None,
+        watched_directories=[
+            runner_directory,
+            os.path.join(runner_directory, "adcirc_test"),
+        ],
+    )
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Remove the socket when the daemon is killed
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        logger.info("Harness daemon interrupted")
+    finally:
+        statistics = state.warm_cache.statistics
+        logger.info(
+            f"Warm cache: {statistics['hits']} hits, {statistics['misses']} misses"
+        )
+
+
+if __name__ == "__main__":
+    harness_daemon()
@@ -0,0 +1,213 @@
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s :: %(levelname)s :: %(filename)s :: %(funcName)s :: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+
+
+def parse_node_count(value: str) -> int:
+    """
+    Parse a node count, allowing k and m suffixes (i.e. 250k, 1m)
+
+    Args:
+        value: Node count
+
+    Returns:
+        Number of nodes
+    """
+    import argparse
+
+    multipliers = {"k": 1_000, "m": 1_000_000}
+    text = value.strip().lower()
+    try:
+        if text and text[-1] in multipliers:
+            return int(float(text[:-1]) * multipliers[text[-1]])
+        return int(text)
+    except ValueError:
+        msg = f"Invalid node count: {value}"
+        raise argparse.ArgumentTypeError(msg) from None
+
+
+def node_count_label(node_count: int) -> str:
+    """
+    Get a short label for a node count (i.e. 1m, 250k)
+
+    Args:
+        node_count: Number of nodes
+
+    Returns:
+        Label
+    """
+    if node_count >= 1_000_000 and node_count % 1_000_000 == 0:
+        return f"{node_count // 1_000_000}m"
+    if node_count >= 1_000 and node_count % 1_000 == 0:
+        return f"{node_count // 1_000}k"
+    return str(node_count)
+
+
+def run_directories(case_directory: str) -> list:
+    """
+    Get the run directories of a case, i.e. the case directory itself or the
+    cold start and hot start directories of a hot start case
+
+    Args:
+        case_directory: Directory of the case
+
+    Returns:
+        List of directories relative to the case directory holding a mesh
+    """
+    import os
+
+    directories = []
+    for directory, subdirectories, files in os.walk(case_directory):
+        subdirectories[:] = sorted(d for d in subdirectories if d != "control")
+        if "fort.14" in files and "fort.15" in files:
+            directories.append(os.path.relpath(directory, case_directory))
+    return directories
+
+
+def scale_case(args) -> None:
+    """
+    Write a refined copy of a case and its test yaml entry
+
+    Args:
+        args: Parsed command line arguments
+    """
+    import copy
+    import os
+    import shutil
+
+    import yaml
+
+    from adcirc_test.scaling import divisions_for_node_count, scale_run_directory
+
+    with open(args.test_yaml) as f:
+        test_yaml = yaml.safe_load(f)
+    if args.case not in test_yaml["tests"]:
+        msg = f"Test {args.case} not found in {args.test_yaml}"
+        raise ValueError(msg)
+    entry = test_yaml["tests"][args.case]
+    if entry.get("model", "adcirc") != "adcirc":
+        msg = f"Only adcirc cases can be scaled, {args.case} is {entry['model']}"
+        raise ValueError(msg)
+
+    test_root = args.test_root if args.test_root else os.path.dirname(os.path.abspath(args.test_yaml))
+    case_directory = os.path.join(test_root, entry["path"])
+    directories = run_directories(case_directory)
+    if not directories:
+        msg = f"No fort.14 and fort.15 found in {case_directory}"
+        raise ValueError(msg)
+
+    if args.divisions is not None:
+        divisions = args.divisions
+    else:
+        divisions, node_count = divisions_for_node_count(
+            os.path.join(case_directory, directories[0], "fort.14"), args.nodes
+        )
+        logger.info(f"Splitting each edge into {divisions} segments gives {node_count} nodes")
+
+    if args.name:
+        name = args.name
+    elif args.nodes is not None:
+        name = f"{args.case}-scaled-{node_count_label(args.nodes)}"
+    else:
+        name = f"{args.case}-scaled-x{divisions}"
+    output_root = args.output_root if args.output_root else os.path.join(test_root, "scaled")
+    output_directory = os.path.join(output_root, name)
+    if os.path.exists(output_directory):
+        msg = f"{output_directory} already exists"
+        raise FileExistsError(msg)
+
+    try:
+        for directory in directories:
+            node_count = scale_run_directory(
+                os.path.normpath(os.path.join(case_directory, directory)),
+                os.path.normpath(os.path.join(output_directory, directory)),
+                divisions,
+            )
+    except Exception:
+        shutil.rmtree(output_directory, ignore_errors=True)
+        raise
+    logger.info(f"Wrote {name} with {node_count} nodes to {output_directory}")
+
+    new_entry = copy.deepcopy(entry)
+    new_entry["path"] = os.path.relpath(output_directory, test_root)
+    new_entry.pop("core", None)
+    if args.ncpu is not None:
+        new_entry["parallel"] = args.ncpu > 1
+        new_entry["ncpu"] = args.ncpu
+
+    output_yaml = args.output_yaml if args.output_yaml else os.path.join(test_root, "test_list_scaled.yaml")
+    scaled_yaml = {"tests": {}}
+    if os.path.exists(output_yaml):
+        with open(output_yaml) as f:
+            scaled_yaml = yaml.safe_load(f) or scaled_yaml
+    scaled_yaml.setdefault("tests", {})[name] = new_entry
+    with open(output_yaml, "w") as f:
+        yaml.safe_dump(scaled_yaml, f, sort_keys=False)
+    logger.info(f"Added {name} to {output_yaml}")
+
+
+def scale_case_main():
+    """
+    Main entrypoint for generating refined copies of the test cases
+    """
+    import argparse
+    import os
+
+    repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    parser = argparse.ArgumentParser(
+        description="Generate a refined copy of an ADCIRC test case at a target node count"
+    )
+    parser.add_argument("case", type=str, help="Name of the test case in the test yaml file")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument(
+        "--nodes",
+        type=parse_node_count,
+        help="Smallest node count of the refined mesh, i.e. 250k or 1m",
+    )
+    size.add_argument(
+        "--divisions",
+        type=int,
+        help="Number of segments each element edge is split into, giving divisions**2 elements per element",
+    )
+    parser.add_argument(
+        "--test-yaml",
+        type=str,
+        help="Test yaml file (default: test_list.yaml)",
+        default=os.path.join(repository_root, "test_list.yaml"),
+    )
+    parser.add_argument(
+        "--test-root",
+        type=str,
+        help="Root directory for tests (default: the directory of the test yaml file)",
+    )
+    parser.add_argument(
+        "--name",
+        type=str,
+        help="Name of the new case (default: <case>-scaled-<nodes>)",
+    )
+    parser.add_argument(
+        "--output-root",
+        type=str,
+        help="Directory where the new case is written (default: <test root>/scaled)",
+    )
+    parser.add_argument(
+        "--output-yaml",
+        type=str,
+        help="Test yaml file the new case is added to (default: <test root>/test_list_scaled.yaml)",
+    )
+    parser.add_argument(
+        "--ncpu", type=int, help="Number of cpus of the new case (default: same as the case)"
+    )
+    args = parser.parse_args()
+
+    scale_case(args)
+
+
+if __name__ == "__main__":
+    scale_case_main()
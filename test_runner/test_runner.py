@@ -1,4 +1,5 @@
 import logging
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -8,14 +9,134 @@ logging.basicConfig(
 )
 
 
-def adcirc_testsuite_runner():
+def write_resource_report(filename: str, report: dict) -> None:
+    """
+    Write the resource usage of the tests run so far to a json file
+
+    Args:
+        filename: Name of the json file
+        report: Dictionary of resource usage keyed by test name
+    """
+    import json
+
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def update_test_history(history, test_name: str, usage: dict) -> None:
+    """
+    Add the model runtimes and the peak memory of a passed test to the history
+
+    Args:
+        history: TestHistory object
+        test_name: Name of the test
+        usage: Resource usage dictionary from AdcircTest.resource_usage()
+    """
+    from adcirc_test.memory import measured_memory
+
+    for phase, steps in usage.items():
+        if "model" in steps:
+            history.add(test_name, phase, "model_runtime_s", steps["model"]["wall_time_s"])
+            peak, prep_peak = measured_memory(steps)
+            history.add(test_name, phase, "peak_memory_mb", peak)
+            history.add(test_name, phase, "prep_memory_mb", prep_peak)
+    history.save()
+
+
+def adcirc_source_directory(args) -> Optional[str]:
+    """
+    Get the root of the ADCIRC source tree
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Directory from --adcirc-source, the parent of the --coverage build
+        directory, or None
+    """
+    import os
+
+    if args.adcirc_source:
+        return args.adcirc_source
+    if args.coverage:
+        return os.path.dirname(os.path.abspath(args.coverage))
+    return None
+
+
+def select_impacted_tests(args, all_test_info: dict, test_list: list) -> list:
+    """
+    Select the tests affected by the changed ADCIRC source files using the
+    impact map, plus the core tests
+
+    Args:
+        args: Parsed command line arguments
+        all_test_info: Dictionary from the test yaml file
+        test_list: List of test names that can be run
+
+    Returns:
+        List of test names to run
+    """
+    import os
+    from adcirc_test.impact import ImpactMap, git_changed_lines
+
+    if not args.impact_map or not os.path.exists(args.impact_map):
+        logger.warning("No impact map is available, running every test")
+        return test_list
+
+    if args.changed_since:
+        source_directory = adcirc_source_directory(args)
+        if not source_directory:
+            msg = "--changed-since requires --adcirc-source"
+            raise ValueError(msg)
+        changes = git_changed_lines(source_directory, args.changed_since)
+    else:
+        changes = {file: None for file in args.changed_files}
+
+    core_tests = [t for t in test_list if all_test_info["tests"][t].get("core", False)]
+    selected = ImpactMap(args.impact_map).select(test_list, changes, core_tests)
+    logger.info(
+        f"Selected {len(selected)} of {len(test_list)} tests for {len(changes)} changed files "
+        f"({len(core_tests)} core tests)"
+    )
+    for test_name in selected:
+        logger.debug(f"  {test_name}")
+    return selected
+
+
+def update_impact_map(filename: str, tracefiles: dict, source_directory: Optional[str]) -> None:
+    """
+    Update the impact map with the coverage of the tests run
+
+    Args:
+        filename: Name of the impact map json file
+        tracefiles: Dictionary of lcov tracefiles keyed by test name
+        source_directory: Root of the ADCIRC source tree (optional)
+    """
+    from adcirc_test.impact import ImpactMap
+
+    impact_map = ImpactMap(filename)
+    for test_name, tracefile in tracefiles.items():
+        impact_map.update(test_name, tracefile, source_directory)
+    impact_map.save()
+    logger.info(f"Updated the impact map {filename} with {len(tracefiles)} tests")
+
+
+def adcirc_testsuite_runner(argv: Optional[List[str]] = None, state=None):
     """
     Main entrypoint for running the ADCIRC test suite
+
+    Args:
+        argv: Command line arguments (default: sys.argv)
+        state: HarnessState holding data kept warm by the harness daemon (optional)
     """
     import argparse
     import yaml
     import os
-    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.coverage import CoverageCollector
+    from adcirc_test.memory import parse_memory
+    from adcirc_test.profiling import HarnessProfiler
+    from adcirc_test.raster import RENDERERS
+    from adcirc_test.stationplots import STATION_PLOT_MODES
 
     parser = argparse.ArgumentParser(description="ADCIRC Test Suite Runner")
     parser.add_argument(
@@ -33,9 +154,218 @@ def adcirc_testsuite_runner():
     parser.add_argument(
         "--continue-on-failure", action="store_true", help="Continue on failure"
     )
+    parser.add_argument(
+        "--resource-report",
+        type=str,
+        help="Write the per-test cpu and memory usage to this json file",
+        required=False,
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profile each phase of the harness with cProfile and tracemalloc",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        help="Directory for the profile output (default: profile)",
+        default="profile",
+    )
+    parser.add_argument(
+        "--smoke",
+        action="store_true",
+        help="Run truncated simulations in a sandbox and compare the leading output snaps",
+    )
+    parser.add_argument(
+        "--smoke-fraction",
+        type=float,
+        help="Fraction of the run length simulated in smoke mode (default: 0.1)",
+        default=0.1,
+    )
+    parser.add_argument(
+        "--sandbox-dir",
+        type=str,
+        help="Directory where sandboxes are created (default: temporary directory)",
+        required=False,
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        type=float,
+        help="Kill a model run that reports no progress for this many seconds, 0 to disable (default: 1800)",
+        default=1800.0,
+    )
+    parser.add_argument(
+        "--runtime-history",
+        type=str,
+        help="Json file holding the model runtimes and peak memory of previous runs",
+        required=False,
+    )
+    parser.add_argument(
+        "--runtime-factor",
+        type=float,
+        help="Kill a model run projected to take longer than this multiple of its historical runtime (default: 5)",
+        default=5.0,
+    )
+    parser.add_argument(
+        "--station-plots",
+        type=str,
+        choices=STATION_PLOT_MODES,
+        help="Write one png per station, pages of stations or a single pdf (default: individual)",
+        default="individual",
+    )
+    parser.add_argument(
+        "--plot-workers",
+        type=int,
+        help="Number of processes used to render the station plots (default: 1)",
+        default=1,
+    )
+    parser.add_argument(
+        "--failing-stations-only",
+        action="store_true",
+        help="Only plot the stations that differ from the control by more than the tolerance",
+    )
+    parser.add_argument(
+        "--no-checksum",
+        action="store_true",
+        help="Always compare the output files numerically, even when they are bit-identical to the control",
+    )
+    parser.add_argument(
+        "--bin-b",
+        type=str,
+        help="Second ADCIRC binary directory. Each test is run with both builds in separate sandboxes and "
+        "the runtimes and outputs of the builds are compared",
+        required=False,
+    )
+    parser.add_argument(
+        "--ab-report",
+        type=str,
+        help="Write the A/B speedups and output comparisons to this json file",
+        required=False,
+    )
+    parser.add_argument(
+        "--control-url",
+        type=str,
+        help="Base url of the <test>.control.tar.gz tarballs fetched when a control fingerprint cannot decide a test",
+        default=None,
+    )
+    parser.add_argument(
+        "--coverage",
+        type=str,
+        help="Build directory of a coverage build (--coverage compiler flag). The coverage of each test "
+        "is captured with lcov and merged into a report",
+        required=False,
+    )
+    parser.add_argument(
+        "--coverage-dir",
+        type=str,
+        help="Directory for the coverage data and reports (default: coverage)",
+        default="coverage",
+    )
+    parser.add_argument(
+        "--coverage-workers",
+        type=int,
+        help="Number of lcov processes run at the same time (default: number of cpus)",
+        default=None,
+    )
+    parser.add_argument(
+        "--impact-map",
+        type=str,
+        help="Json file mapping each test to the ADCIRC source files and routines it executes. It is updated "
+        "by --coverage runs and used by --changed-files and --changed-since",
+        required=False,
+    )
+    parser.add_argument(
+        "--changed-files",
+        type=str,
+        nargs="+",
+        help="With --all, only run the tests that execute these ADCIRC source files (relative to the source "
+        "tree) and the core tests",
+        required=False,
+    )
+    parser.add_argument(
+        "--changed-since",
+        type=str,
+        help="With --all, only run the tests that execute the routines changed since this git revision of the "
+        "ADCIRC source tree and the core tests",
+        required=False,
+    )
+    parser.add_argument(
+        "--adcirc-source",
+        type=str,
+        help="Root of the ADCIRC source tree (default: parent of the --coverage build directory)",
+        required=False,
+    )
+    parser.add_argument(
+        "--renderer",
+        type=str,
+        choices=RENDERERS,
+        help="Draw the max/min maps with filled contours or as raster images (default: contour)",
+        default="contour",
+    )
+    parser.add_argument(
+        "--raster-resolution",
+        type=int,
+        help="Number of pixels along the longest side of the raster images (default: 1000)",
+        default=1000,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory for data cached between runs, i.e. the mesh geometry used by the plots (default: .cache)",
+        default=".cache",
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        action="store_true",
+        help="Bind adcprep and the model to cpus, on a single NUMA node when possible, that no other test "
+        "run through the same slot directory holds",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        help="With --pin-cpus, number of cpu slots shared by the concurrent runs (default: the cpus this "
+        "process may use)",
+        required=False,
+    )
+    parser.add_argument(
+        "--slot-dir",
+        type=str,
+        help="With --pin-cpus, directory of the lock files of the cpu slots (default: in the temporary "
+        "directory)",
+        required=False,
+    )
+    parser.add_argument(
+        "--prep-ahead",
+        type=int,
+        help="Number of upcoming parallel tests whose adcprep runs in the background while the current test runs "
+        "(default: 2 with --pin-cpus, otherwise 0, which runs adcprep just before each model run)",
+        default=None,
+    )
+    parser.add_argument(
+        "--hotstart-only",
+        action="store_true",
+        help="Only run the hot start of the hot start tests, taking the cold start from the hot start cache when "
+        "it holds one for the same executables and inputs. Implies --hotstart-cache",
+    )
+    parser.add_argument(
+        "--hotstart-cache",
+        type=str,
+        nargs="?",
+        const="",
+        help="Cache the hot start files of passed cold starts in this directory (default when given without a "
+        "directory: <cache-dir>/hotstart). Off by default",
+        required=False,
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=parse_memory,
+        help="Memory shared by the tests of the runners using the same --slot-dir (i.e. 64G). A test only starts "
+        "when its estimated peak memory fits next to the running tests",
+        required=False,
+    )
     parser.add_argument("-v", "--verbose", action="store_true", help="Verbose output")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.verbose:
         logger.setLevel(logging.DEBUG)
@@ -46,47 +376,432 @@ def adcirc_testsuite_runner():
         msg = "Either --all or --test must be specified"
         raise ValueError(msg)
 
-    if not os.path.exists(args.bin):
-        msg = f"ADCIRC binary directory {args.bin} does not exist"
-        raise FileNotFoundError(msg)
+    if args.smoke and not 0.0 < args.smoke_fraction <= 1.0:
+        msg = "The smoke fraction must be in the range (0, 1]"
+        raise ValueError(msg)
 
-    all_test_info = yaml.safe_load(open(args.test_yaml))
+    if (args.changed_files or args.changed_since) and not args.all:
+        msg = "--changed-files and --changed-since select tests from --all"
+        raise ValueError(msg)
+
+    if args.coverage and args.bin_b:
+        msg = "Coverage cannot be collected in A/B mode"
+        raise ValueError(msg)
+
+    if args.hotstart_only and (args.smoke or args.bin_b):
+        msg = "--hotstart-only cannot be used in smoke or A/B mode"
+        raise ValueError(msg)
+
+    for binary_directory in [args.bin, args.bin_b]:
+        if binary_directory and not os.path.exists(binary_directory):
+            msg = f"ADCIRC binary directory {binary_directory} does not exist"
+            raise FileNotFoundError(msg)
+
+    if state:
+        all_test_info = state.test_yaml(args.test_yaml)
+    else:
+        all_test_info = yaml.safe_load(open(args.test_yaml))
 
     test_list = []
     if args.all:
-        test_list = all_test_info["tests"]
+        test_list = list(all_test_info["tests"])
+        if args.changed_files or args.changed_since:
+            test_list = select_impacted_tests(args, all_test_info, test_list)
     else:
         if args.test not in all_test_info["tests"]:
             msg = f"Test {args.test} not found in {args.test_yaml}"
             raise ValueError(msg)
         test_list.append(args.test)
 
-    any_failure = False
-    for i, test_name in enumerate(test_list):
+    if args.hotstart_only:
+        test_list = [t for t in test_list if all_test_info["tests"][t].get("hotstart", False)]
+        if not test_list:
+            msg = "--hotstart-only selects the hot start tests, none were selected"
+            raise ValueError(msg)
+
+    if args.profile:
+        profiler = HarnessProfiler(args.profile_dir)
+    else:
+        profiler = None
+
+    if args.coverage:
+        coverage = CoverageCollector(
+            args.coverage,
+            args.coverage_dir,
+            args.coverage_workers if args.coverage_workers else os.cpu_count() or 1,
+        )
+    else:
+        coverage = None
+
+    try:
+        any_failure = run_tests(
+            args, all_test_info, test_list, profiler, state, coverage
+        )
+    finally:
+        if profiler:
+            profiler.write_summary()
+        if coverage:
+            coverage.finish()
+            if args.impact_map:
+                update_impact_map(
+                    args.impact_map, coverage.tracefiles(), adcirc_source_directory(args)
+                )
+
+    if any_failure:
+        raise ValueError("One or more tests failed")
+
+
+def run_tests(
+    args, all_test_info: dict, test_list: list, profiler, state=None, coverage=None
+) -> bool:
+    """
+    Run the selected tests
+
+    Args:
+        args: Parsed command line arguments
+        all_test_info: Dictionary from the test yaml file
+        test_list: List of test names to run
+        profiler: HarnessProfiler used to profile the tests, or None
+        state: HarnessState holding data kept warm by the harness daemon (optional)
+        coverage: CoverageCollector capturing the coverage of each test (optional)
+
+    Returns:
+        True if any test failed, False otherwise
+    """
+    import contextlib
+    import functools
+    import tempfile
+    import os
+    from adcirc_test.abcompare import (
+        AB_BUILDS,
+        format_ab_summary,
+        summarize_ab_test,
+        write_ab_report,
+    )
+    from adcirc_test.adcirctest import AdcircTest, AdcircTestOptions
+    from adcirc_test.geometry import MeshGeometryCache
+    from adcirc_test.history import TestHistory
+    from adcirc_test.hotstart_cache import HotstartCache
+    from adcirc_test.memory import MemoryBudget, memory_estimate
+    from adcirc_test.pipeline import PrepPipeline
+    from adcirc_test.resources import format_resource_summary
+    from adcirc_test.slots import RankSlotPool, numa_cpu_sets
+
+    if args.bin_b:
+        builds = [("a", args.bin), ("b", args.bin_b)]
+    else:
+        builds = [(None, args.bin)]
 
-        if len(test_list) > 1:
-            logger.info(f"Running test {i+1} of {len(test_list)}: {test_name}")
+    # A/B runs need a sandbox for each build so the outputs can be compared
+    if args.smoke or args.bin_b:
+        if args.sandbox_dir:
+            sandbox_root = args.sandbox_dir
         else:
-            logger.info(f"Running test: {test_name}")
+            prefix = "adcirc_ab_" if args.bin_b else "adcirc_smoke_"
+            sandbox_root = tempfile.mkdtemp(prefix=prefix)
+    else:
+        sandbox_root = None
+    smoke_fraction = args.smoke_fraction if args.smoke else None
+
+    @contextlib.contextmanager
+    def sandbox_root_cleanup():
+        """
+        Remove the temporary sandbox root at the end of the run. The root is
+        kept when it holds the sandboxes of failed tests.
+        """
+        try:
+            yield
+        finally:
+            if sandbox_root and not args.sandbox_dir and os.path.isdir(sandbox_root):
+                for build, _ in builds:
+                    if build and os.path.isdir(os.path.join(sandbox_root, build)):
+                        if not os.listdir(os.path.join(sandbox_root, build)):
+                            os.rmdir(os.path.join(sandbox_root, build))
+                if os.listdir(sandbox_root):
+                    logger.info(f"Sandboxes of the failed tests are kept in {sandbox_root}")
+                else:
+                    os.rmdir(sandbox_root)
+
+    # Runtimes of truncated smoke runs and of other builds are not representative
+    if args.runtime_history and not args.smoke and not args.bin_b:
+        history = TestHistory(args.runtime_history)
+    else:
+        history = None
+
+    # Tests are admitted when their memory estimate fits in the budget shared
+    # by the runners started with the same slot directory
+    if args.max_memory:
+        memory_budget = MemoryBudget(args.max_memory, args.slot_dir)
+        memory_history = history
+        if memory_history is None and args.runtime_history:
+            memory_history = TestHistory(args.runtime_history)
+    else:
+        memory_budget = None
+        memory_history = None
+
+    if state:
+        geometry_cache = state.geometry_cache(os.path.join(args.cache_dir, "geometry"))
+        warm_cache = state.warm_cache
+    else:
+        geometry_cache = MeshGeometryCache(os.path.join(args.cache_dir, "geometry"))
+        warm_cache = None
+
+    # Caching hashes the inputs and copies the hot start files of every passed
+    # cold start, so it is only done on request
+    if args.hotstart_cache is not None or args.hotstart_only:
+        hotstart_cache = HotstartCache(
+            args.hotstart_cache
+            if args.hotstart_cache
+            else os.path.join(args.cache_dir, "hotstart")
+        )
+    else:
+        hotstart_cache = None
+
+    # Runner processes started with the same slot directory share the cpus
+    if args.pin_cpus:
+        topology = numa_cpu_sets()
+        cpu_count = args.cpus if args.cpus else sum(len(cpus) for _, cpus in topology)
+        cpu_pool = RankSlotPool(cpu_count, args.slot_dir, topology=topology)
+    else:
+        cpu_pool = None
+
+    # Without a cpu pool a background adcprep competes with the ranks of the
+    # running model and distorts its timings, so it is only on by default with one
+    if args.prep_ahead is None:
+        prep_ahead = 2 if cpu_pool is not None else 0
+    else:
+        prep_ahead = args.prep_ahead
+        if prep_ahead > 0 and cpu_pool is None:
+            logger.warning(
+                "Background adcprep runs without --pin-cpus compete with the running model "
+                "for cpus, so the model runtimes are not comparable between runs"
+            )
+
+    any_failure = False
+    resource_report = {}
+    ab_results = {}
+
+    def create_test(test_name: str, build: Optional[str], binary_directory: str):
+        """
+        Create a test ready to run, in its sandbox when sandboxes are used
+
+        Args:
+            test_name: Name of the test
+            build: Build of an A/B run (a, b) or None
+            binary_directory: Path to the ADCIRC binary directory
+
+        Returns:
+            AdcircTest object with a clean test directory
+        """
+        expected_runtimes = {}
+        if history:
+            for phase in ["coldstart", "hotstart"]:
+                runtime = history.get(test_name, phase, "model_runtime_s")
+                if runtime is not None:
+                    expected_runtimes[phase] = runtime
 
-        test_data = all_test_info["tests"][test_name]
         this_test = AdcircTest(
-            test_name, test_data, args.bin, args.test_root, args.tolerance, args.verbose
+            test_name,
+            all_test_info["tests"][test_name],
+            binary_directory,
+            args.test_root,
+            args.tolerance,
+            args.verbose,
+            options=AdcircTestOptions(
+                profiler=profiler,
+                smoke_fraction=smoke_fraction,
+                stall_timeout=args.stall_timeout if args.stall_timeout > 0 else None,
+                expected_runtimes=expected_runtimes,
+                runtime_factor=(
+                    args.runtime_factor if args.runtime_factor > 0 else None
+                ),
+                environment=coverage.environment(test_name) if coverage else None,
+                cpu_pool=cpu_pool,
+                pin_cpus=args.pin_cpus,
+                hotstart_cache=hotstart_cache,
+                hotstart_only=args.hotstart_only,
+                checksum=not args.no_checksum,
+                control_url=args.control_url,
+                warm_cache=warm_cache,
+                station_plot_mode=args.station_plots,
+                plot_workers=args.plot_workers,
+                failing_stations_only=args.failing_stations_only,
+                geometry_cache=geometry_cache,
+                renderer=args.renderer,
+                raster_resolution=args.raster_resolution,
+            ),
         )
 
+        if sandbox_root:
+            this_test.create_sandbox(
+                os.path.join(sandbox_root, build) if build else sandbox_root
+            )
+
         this_test.clean()
-        status = this_test.run()
-        this_test.plot(status)
-        if not status["overall"]["passed"]:
-            any_failure = True
-            msg = f"Test {test_name} failed"
-            if not args.continue_on_failure:
-                raise ValueError(msg)
+        return this_test
+
+    def test_memory(test_name: str) -> Tuple[float, float]:
+        """
+        Get the memory estimate of a test, see memory_estimate
+        """
+        test_data = all_test_info["tests"][test_name]
+        return memory_estimate(
+            test_name,
+            os.path.join(args.test_root, test_data["path"]),
+            test_data,
+            memory_history,
+        )
+
+    def job_name(test_name: str, build: Optional[str]) -> str:
+        """
+        Get the name of a test and build used in the reports, i.e. quarterannular[A]
+        """
+        return f"{test_name}[{build.upper()}]" if build else test_name
+
+    # Tests and builds in run order, used to prepare the upcoming tests ahead
+    jobs = [
+        (test_name, build, binary_directory)
+        for i, test_name in enumerate(test_list)
+        for build, binary_directory in (builds if i % 2 == 0 else builds[::-1])
+    ]
+    job_index = 0
+
+    with sandbox_root_cleanup(), PrepPipeline(prep_ahead) as pipeline:
+        for i, test_name in enumerate(test_list):
+
+            if len(test_list) > 1:
+                logger.info(f"Running test {i+1} of {len(test_list)}: {test_name}")
             else:
-                logger.error(msg)
+                logger.info(f"Running test: {test_name}")
 
-    if any_failure:
-        raise ValueError("One or more tests failed")
+            # The builds run one after the other, alternating which goes first so
+            # that neither always runs on a warmer machine
+            test_builds = builds if i % 2 == 0 else builds[::-1]
+
+            # Wait until the memory of the test fits next to the running tests
+            if memory_budget:
+                reservation = memory_budget.reserve(test_name, test_memory(test_name)[0])
+            else:
+                reservation = contextlib.nullcontext()
+
+            with reservation:
+                tests = {}
+                statuses = {}
+                for build, binary_directory in test_builds:
+                    if build:
+                        logger.info(
+                            f"Running build {build.upper()} of test {test_name}: {binary_directory}"
+                        )
+
+                    # Start the prep of the next parallel tests while this one runs
+                    upcoming = [
+                        job
+                        for job in jobs[job_index + 1 :]
+                        if all_test_info["tests"][job[0]].get("parallel", False)
+                    ]
+                    for job in upcoming[: pipeline.depth]:
+                        name = job_name(*job[:2])
+                        release = None
+                        # The prep only starts when its memory fits right away
+                        if memory_budget and not pipeline.submitted(name):
+                            prep_reservation = memory_budget.reserve(
+                                f"{name} adcprep", test_memory(job[0])[1], wait=False
+                            )
+                            if prep_reservation is None:
+                                continue
+                            release = prep_reservation.release
+                        # A test that cannot be set up fails in its own turn
+                        try:
+                            pipeline.submit(name, functools.partial(create_test, *job), release)
+                        except Exception as e:
+                            logger.warning(f"Could not prepare {name} ahead: {e}")
+
+                    # Errors of a test are reported as its failure so that the
+                    # other tests still run
+                    this_test = None
+                    try:
+                        this_test = pipeline.take(job_name(test_name, build))
+                        if this_test is None:
+                            this_test = create_test(test_name, build, binary_directory)
+                        status = this_test.run()
+                        if coverage:
+                            coverage.capture(test_name)
+                        this_test.plot(status)
+                    except Exception as e:
+                        logger.exception(f"Test {job_name(test_name, build)} raised an error")
+                        status = {"overall": {"passed": False}, "error": str(e)}
+                    finally:
+                        job_index += 1
+                        if this_test is not None:
+                            this_test.release()
+
+                    statuses[build] = status
+                    if this_test is None:
+                        continue
+                    tests[build] = this_test
+
+                    report_name = job_name(test_name, build)
+                    resource_report[report_name] = this_test.resource_usage()
+                    for line in format_resource_summary(
+                        report_name, resource_report[report_name]
+                    ):
+                        logger.info(line)
+                    if args.resource_report:
+                        write_resource_report(args.resource_report, resource_report)
+
+                if args.bin_b and len(tests) == len(builds):
+                    outputs = tests["a"].compare_outputs(tests["b"])
+                    ab_results[test_name] = summarize_ab_test(
+                        {build: tests[build].resource_usage() for build in AB_BUILDS},
+                        statuses,
+                        outputs,
+                    )
+                    for line in format_ab_summary({test_name: ab_results[test_name]}):
+                        logger.info(line)
+                    if args.ab_report:
+                        write_ab_report(args.ab_report, ab_results)
+                    outputs_differ = ab_results[test_name]["output_counts"]["different"] > 0
+                else:
+                    outputs_differ = False
+
+                # Sandboxes of failed tests and of builds with different outputs are kept
+                # for inspection
+                for build, this_test in tests.items():
+                    if (
+                        sandbox_root
+                        and statuses[build]["overall"]["passed"]
+                        and not outputs_differ
+                    ):
+                        this_test.remove_sandbox()
+
+            if history and statuses[None]["overall"]["passed"]:
+                update_test_history(history, test_name, resource_report[test_name])
+
+            for build, status in statuses.items():
+                if status["overall"]["passed"]:
+                    continue
+                any_failure = True
+                name = f"{test_name} (build {build.upper()})" if build else test_name
+                if "error" in status:
+                    msg = f"Test {name} failed with an error: {status['error']}"
+                elif any(
+                    status[phase].get("timed_out", False)
+                    for phase in ["coldstart", "hotstart"]
+                    if phase in status
+                ):
+                    msg = f"Test {name} timed out"
+                else:
+                    msg = f"Test {name} failed"
+                if not args.continue_on_failure:
+                    raise ValueError(msg)
+                else:
+                    logger.error(msg)
+
+    if len(ab_results) > 1:
+        for line in format_ab_summary(ab_results):
+            logger.info(line)
+
+    return any_failure
 
 
 if __name__ == "__main__":
@@ -0,0 +1,492 @@
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s :: %(levelname)s :: %(filename)s :: %(funcName)s :: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+
+# Statuses of the output files that replace their control file
+PROMOTED_STATUSES = ["new", "different"]
+
+# Signature at the start of netcdf4 (hdf5) files
+HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+def phase_directories(test: dict) -> dict:
+    """
+    Get the run directory of each phase of a test
+
+    Args:
+        test: Test yaml dictionary
+
+    Returns:
+        Dictionary of directories relative to the test directory keyed by phase
+        (coldstart, hotstart)
+    """
+    if test.get("hotstart", False):
+        return {"coldstart": "01_cs", "hotstart": "02_hs"}
+    return {"coldstart": "."}
+
+
+def classify_output(
+    output_file: str, control_file: Optional[str], threshold: float
+) -> Tuple[str, Optional[float]]:
+    """
+    Compare an output file with its control file
+
+    Args:
+        output_file: Name of the output file
+        control_file: Name of the control file as stored, or None if there is none
+        threshold: Largest absolute difference that leaves the control unchanged
+
+    Returns:
+        Tuple of the status (missing, new, identical, within_threshold, different)
+        and the maximum difference, which is None when the values were not compared
+        or the files differ in structure (i.e. in their headers or snap times)
+    """
+    import os
+
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.comparison import files_identical, max_difference
+
+    if not os.path.exists(output_file):
+        return "missing", None
+    if control_file is None:
+        return "new", None
+    if files_identical(control_file, output_file, AdcircTest.ADCIRC_DROP_VARIABLES_LIST):
+        return "identical", 0.0
+    try:
+        difference = max_difference(
+            control_file, output_file, AdcircTest.ADCIRC_DROP_VARIABLES_LIST
+        )
+    except ValueError as e:
+        logger.warning(f"Cannot compare {output_file} with {control_file}: {e}")
+        difference = None
+    if difference is not None and difference <= threshold:
+        return "within_threshold", difference
+    return "different", difference
+
+
+def is_netcdf4(filename: str) -> bool:
+    """
+    Check if a netcdf file is stored in netcdf4 (hdf5) format
+
+    Args:
+        filename: Name of the file
+
+    Returns:
+        True if the file is a netcdf4 file
+    """
+    with open(filename, "rb") as f:
+        return f.read(len(HDF5_SIGNATURE)) == HDF5_SIGNATURE
+
+
+def promote_output(
+    output_file: str, control_directory: str, control_file: Optional[str]
+) -> str:
+    """
+    Replace a control file with an output file. The new control keeps the storage
+    of the one it replaces: compressed ascii files are compressed in the same
+    format, and netcdf4 files are deflated (see compress_controls.py).
+
+    Args:
+        output_file: Name of the output file
+        control_directory: Control directory of the run
+        control_file: Name of the control file as stored, or None if there is none
+
+    Returns:
+        Name of the new control file
+    """
+    import os
+    import shutil
+
+    from adcirc_test.adcirctest import AdcircTest
+    from adcirc_test.compression import (
+        COMPRESSION_FORMATS,
+        compress_file,
+        deflate_netcdf,
+        is_compressed,
+    )
+
+    os.makedirs(control_directory, exist_ok=True)
+    destination = os.path.join(control_directory, os.path.basename(output_file))
+    deflate = (
+        control_file is not None and control_file.endswith(".nc") and is_netcdf4(control_file)
+    )
+
+    temp_file = f"{destination}.{os.getpid()}.tmp"
+    shutil.copyfile(output_file, temp_file)
+    os.replace(temp_file, destination)
+
+    if control_file is not None and is_compressed(control_file):
+        compression = next(
+            name for name, suffix in COMPRESSION_FORMATS.items() if control_file.endswith(suffix)
+        )
+        compressed_file = compress_file(destination, compression)
+        os.remove(destination)
+        destination = compressed_file
+    elif deflate:
+        deflate_netcdf(destination, drop_variables=AdcircTest.ADCIRC_DROP_VARIABLES_LIST)
+
+    # An uncompressed control takes precedence over compressed ones, so stale
+    # copies in other formats are removed
+    if control_file is not None and control_file != destination:
+        os.remove(control_file)
+    return destination
+
+
+def regenerate_test(test_name: str, test: dict, args, sandbox_root: Optional[str]) -> dict:
+    """
+    Run a test in a sandbox and promote the output files that differ from their
+    control by more than the threshold. Runs in a worker process, since the
+    model runs change the working directory of the process.
+
+    Args:
+        test_name: Name of the test
+        test: Test yaml dictionary
+        args: Parsed command line arguments
+        sandbox_root: Directory where the sandbox is created, or None to use the
+            outputs already in the test directory
+
+    Returns:
+        Dictionary with the status of the test and of each output file by phase
+    """
+    import os
+
+    from adcirc_test.adcirctest import AdcircTest, AdcircTestOptions
+    from adcirc_test.compression import find_output_file
+    from adcirc_test.slots import RankSlotPool
+
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    source_directory = os.path.join(args.test_root, test["path"])
+    result = {"status": "unchanged", "phases": {}}
+
+    if sandbox_root is not None:
+        this_test = AdcircTest(
+            test_name,
+            test,
+            args.bin,
+            args.test_root,
+            args.threshold,
+            args.verbose,
+            options=AdcircTestOptions(
+                stall_timeout=args.stall_timeout if args.stall_timeout > 0 else None,
+                cpu_pool=RankSlotPool(
+                    args.cpus if args.cpus else os.cpu_count() or 1, args.slot_dir
+                ),
+                compare=False,
+            ),
+        )
+        run_directory = this_test.create_sandbox(sandbox_root)
+        this_test.clean()
+        try:
+            for phase in this_test.phases():
+                status = this_test.run_phase(phase)
+                if not status["complete"]:
+                    result["status"] = "failed"
+                    result["reason"] = status.get("reason", f"The {phase} did not complete")
+                    break
+        except Exception as e:
+            logger.error(f"Test {test_name} failed to run: {e}")
+            result["status"] = "failed"
+            result["reason"] = str(e)
+        if result["status"] == "failed":
+            result["sandbox"] = run_directory
+            return result
+    else:
+        run_directory = source_directory
+
+    promotions = []
+    missing = []
+    for phase, directory in phase_directories(test).items():
+        control_directory = os.path.normpath(
+            os.path.join(source_directory, directory, "control")
+        )
+        files = {}
+        for file in test["output_files"]:
+            output_file = os.path.join(run_directory, directory, file)
+            control_file = find_output_file(os.path.join(control_directory, file))
+            status, difference = classify_output(output_file, control_file, args.threshold)
+            files[file] = {"status": status, "max_difference": difference, "promoted": False}
+            if status in PROMOTED_STATUSES:
+                promotions.append((files[file], output_file, control_directory, control_file))
+            elif status == "missing":
+                logger.error(f"Test {test_name} did not write {file} in the {phase}")
+                missing.append(f"{phase} {file}")
+        result["phases"][phase] = files
+
+    # A run that did not write all of its outputs is not trusted to update any
+    # of the control files
+    if missing:
+        result["status"] = "failed"
+        result["reason"] = f"{len(missing)} declared output files missing ({', '.join(missing)})"
+        if sandbox_root is not None:
+            result["sandbox"] = run_directory
+        return result
+
+    if not args.dry_run:
+        for status, output_file, control_directory, control_file in promotions:
+            new_control = promote_output(output_file, control_directory, control_file)
+            status["promoted"] = True
+            logger.info(f"Updated control file {new_control} ({status['status']})")
+
+    if any(
+        status["status"] in PROMOTED_STATUSES
+        for files in result["phases"].values()
+        for status in files.values()
+    ):
+        result["status"] = "updated"
+
+    if sandbox_root is not None:
+        this_test.remove_sandbox()
+    return result
+
+
+def format_summary(results: dict, dry_run: bool) -> list:
+    """
+    Format the summary of a regeneration
+
+    Args:
+        results: Results of regenerate_test keyed by test name
+        dry_run: If the control files were left unchanged
+
+    Returns:
+        List of lines of the summary
+    """
+    verb = "would be updated" if dry_run else "updated"
+    lines = []
+    for test_name, result in results.items():
+        if result["status"] == "failed":
+            lines.append(f"{test_name}: failed, {result['reason']}")
+            continue
+        files = [
+            (phase, file, status)
+            for phase, phase_files in result["phases"].items()
+            for file, status in phase_files.items()
+        ]
+        changed = [f for f in files if f[2]["status"] in PROMOTED_STATUSES]
+        lines.append(f"{test_name}: {len(changed)} {verb}, {len(files) - len(changed)} unchanged")
+        for phase, file, status in changed:
+            if status["status"] == "new":
+                detail = "no control file"
+            elif status["max_difference"] is None:
+                detail = "structure differs"
+            else:
+                detail = f"max difference {status['max_difference']:.6g}"
+            lines.append(f"  {phase} {file}: {detail}")
+
+    counts = {}
+    for result in results.values():
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    lines.append(
+        f"{len(results)} tests: {counts.get('updated', 0)} {verb}, "
+        f"{counts.get('unchanged', 0)} unchanged, {counts.get('failed', 0)} failed"
+    )
+    return lines
+
+
+def update_solutions(args, test_yaml: dict, tests: list) -> bool:
+    """
+    Regenerate the control solutions of a set of tests, running the tests in
+    parallel
+
+    Args:
+        args: Parsed command line arguments
+        test_yaml: Dictionary from the test yaml file
+        tests: Names of the tests
+
+    Returns:
+        True if every test ran, False otherwise
+    """
+    import concurrent.futures
+    import json
+    import os
+    import shutil
+    import tempfile
+
+    if args.existing:
+        sandbox_root = None
+    elif args.sandbox_dir:
+        sandbox_root = args.sandbox_dir
+    else:
+        sandbox_root = tempfile.mkdtemp(prefix="adcirc_regenerate_")
+
+    results = {}
+    jobs = args.jobs if args.jobs else os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                regenerate_test, test_name, test_yaml["tests"][test_name], args, sandbox_root
+            ): test_name
+            for test_name in tests
+        }
+        for future in concurrent.futures.as_completed(futures):
+            test_name = futures[future]
+            try:
+                results[test_name] = future.result()
+            except Exception as e:
+                logger.error(f"Regenerating test {test_name} failed: {e}")
+                results[test_name] = {"status": "failed", "reason": str(e), "phases": {}}
+            logger.info(f"Finished test {test_name}: {results[test_name]['status']}")
+
+    results = {test_name: results[test_name] for test_name in tests}
+    for line in format_summary(results, args.dry_run):
+        logger.info(line)
+
+    with open(args.summary, "w") as f:
+        json.dump(
+            {
+                "bin": None if args.existing else args.bin,
+                "threshold": args.threshold,
+                "dry_run": args.dry_run,
+                "tests": results,
+            },
+            f,
+            indent=2,
+        )
+    logger.info(f"Wrote the summary to {args.summary}")
+
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    if sandbox_root is not None and not failed and not args.sandbox_dir:
+        shutil.rmtree(sandbox_root, ignore_errors=True)
+    elif failed and sandbox_root is not None:
+        logger.info(f"Sandboxes of the failed tests are kept in {sandbox_root}")
+    return not failed
+
+
+def update_solutions_main(argv: Optional[list] = None):
+    """
+    Main entrypoint for regenerating the control solutions of the test suite
+    """
+    import argparse
+    import fnmatch
+    import os
+    import sys
+
+    import yaml
+
+    parser = argparse.ArgumentParser(
+        description="Regenerate the ADCIRC control solutions of selected tests, updating "
+        "only the output files that differ from their control"
+    )
+    parser.add_argument("tests", nargs="*", help="Names of the tests to regenerate")
+    parser.add_argument("--all", action="store_true", help="Regenerate all tests")
+    parser.add_argument(
+        "--match",
+        action="append",
+        default=[],
+        help="Regenerate the tests whose name matches a shell pattern, i.e. '*-parallel' "
+        "(may be repeated)",
+    )
+    parser.add_argument(
+        "--model",
+        action="append",
+        default=[],
+        help="Regenerate the tests of a model in the test yaml, i.e. adcirc (may be repeated)",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--bin", type=str, help="Path to the ADCIRC binary directory")
+    source.add_argument(
+        "--existing",
+        action="store_true",
+        help="Use the outputs already in the test directories (i.e. left by the test runner) "
+        "instead of running the tests",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="Largest absolute difference from the control that leaves it unchanged "
+        "(default: 1e-5, the tolerance of the suite)",
+        default=1e-5,
+    )
+    parser.add_argument(
+        "--test-yaml",
+        type=str,
+        help="Test yaml file (default: test_list.yaml)",
+        default="test_list.yaml",
+    )
+    parser.add_argument(
+        "--test-root", type=str, help="Root directory for tests (default: .)", default="."
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of tests run at the same time (default: the number of cpus)",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        help="Number of MPI ranks running at the same time, shared with other runners "
+        "using the same --slot-dir (default: the number of cpus)",
+    )
+    parser.add_argument(
+        "--slot-dir",
+        type=str,
+        help="Directory of the cpu slot lock files (default: a per-user directory in /tmp)",
+    )
+    parser.add_argument(
+        "--sandbox-dir",
+        type=str,
+        help="Directory where the tests are run (default: a temporary directory)",
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        type=float,
+        help="Kill a model run that reports no progress for this many seconds, 0 to disable "
+        "(default: 1800)",
+        default=1800.0,
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        help="Json file where the summary of the changes is written "
+        "(default: update_solutions.json)",
+        default="update_solutions.json",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the control files that would change without changing them",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Verbose output")
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+
+    if args.bin and not os.path.exists(args.bin):
+        msg = f"ADCIRC binary directory {args.bin} does not exist"
+        raise FileNotFoundError(msg)
+
+    with open(os.path.join(args.test_root, args.test_yaml)) as f:
+        test_yaml = yaml.safe_load(f)
+
+    for test_name in args.tests:
+        if test_name not in test_yaml["tests"]:
+            msg = f"Test {test_name} not found in {args.test_yaml}"
+            raise ValueError(msg)
+
+    tests = [
+        test_name
+        for test_name, test in test_yaml["tests"].items()
+        if args.all
+        or test_name in args.tests
+        or any(fnmatch.fnmatchcase(test_name, pattern) for pattern in args.match)
+        or test.get("model") in args.model
+    ]
+    if not tests:
+        msg = "No tests selected, give test names, --match, --model or --all"
+        raise ValueError(msg)
+    logger.info(f"Regenerating the control solutions of {len(tests)} tests")
+
+    if not update_solutions(args, test_yaml, tests):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    update_solutions_main()
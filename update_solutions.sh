@@ -1,25 +1,15 @@
 #!/bin/bash
 
-types=("adcirc" ) # "adcirc-swan")
+#...Regenerate the control solutions of the selected tests. With no arguments,
+#   the outputs left in the adcirc test directories by an earlier run of the
+#   test runner replace the control files that differ from them. See
+#   test_runner/update_solutions.py --help for the options.
 
-for T in ${types[@]}
-do
-    for SIMDIR in $(ls $T)
-    do
-        if [ -d adcirc/$SIMDIR/01_cs ] ; then
-            cold_files=$(ls adcirc/$SIMDIR/01_cs/control)
-    	    hot_files=$(ls adcirc/$SIMDIR/02_hs/control)
-    	    cd adcirc/$SIMDIR/01_cs
-    	    mv $cold_files control/.
-    	    cd ..
-    	    cd 02_hs
-    	    mv $hot_files control/.
-    	    cd ../../..
-        else
-            files=$(ls adcirc/$SIMDIR/control)
-    	    cd adcirc/$SIMDIR
-    	    mv $files control/.
-    	    cd ../..
-        fi
-    done
-done
+TESTHOME=$(cd "$(dirname "$0")" && pwd)
+
+if [ $# -eq 0 ] ; then
+    set -- --existing --model adcirc
+fi
+
+#...Tests are found relative to the repository unless --test-root is given
+exec python3 "$TESTHOME/test_runner/update_solutions.py" --test-root "$TESTHOME" "$@"